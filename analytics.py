@@ -0,0 +1,159 @@
+from datetime import date, datetime, time, timedelta
+from fastapi import HTTPException
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session
+import archive
+import availability
+import config
+from models import Doctor, Treatment
+from models import DailyDoctorAppointments, DailyTreatmentUses, AnalyticsDirtyDay
+from schemas import DoctorUtilization, SpecialtyDailyCount, TreatmentFrequency
+
+# Clinic analytics: doctor utilization, appointments per specialty per day and treatment frequency.
+# All aggregation is GROUP BY in the database. Ranges of up to ANALYTICS_RAW_MAX_DAYS days aggregate
+# Appointments directly; longer ones read the DailyDoctorAppointments / DailyTreatmentUses rollups,
+# which hold one row per (day, doctor) and (day, treatment). Appointment writes in crud.py only mark
+# their days in AnalyticsDirtyDays; a dirty day is re-aggregated the next time a rollup covering it
+# is read, so writes stay cheap and a yearly dashboard sums a few hundred thousand rollup rows at most.
+# Days older than the archive horizon are aggregated from the archive tables as well (see archive.py).
+
+# Dirty days re-aggregated per statement
+REFRESH_BATCH_DAYS = 100
+
+def _day(column):
+    return func.date(column)
+
+def _within(days: list):
+    """[start, end) AppointmentDate ranges covering each of the given days."""
+    return [(datetime.combine(day, time.min), datetime.combine(day + timedelta(days=1), time.min)) for day in days]
+
+def _between(start: date, end: date):
+    return [(datetime.combine(start, time.min), datetime.combine(end, time.min))]
+
+def _in_ranges(column, ranges: list):
+    """`column` within any of the ranges, as comparisons the date index can serve."""
+    return or_(*(and_(column >= low, column < high) for low, high in ranges))
+
+def _doctor_counts(db: Session, ranges: list):
+    """(Day, DoctorID, Appointments) aggregated from the appointments in `ranges`; the shape of DailyDoctorAppointments."""
+    rows = archive.union(db, ranges[0][0], lambda appointments, links: (
+        select(_day(appointments.c.AppointmentDate).label("Day"), appointments.c.DoctorID)
+        .where(appointments.c.DoctorID.isnot(None), _in_ranges(appointments.c.AppointmentDate, ranges))
+    ))
+    return select(rows.c.Day, rows.c.DoctorID, func.count().label("Appointments")).group_by(rows.c.Day, rows.c.DoctorID)
+
+def _treatment_counts(db: Session, ranges: list):
+    """(Day, TreatmentID, Uses) aggregated from the treatment links in `ranges`; the shape of DailyTreatmentUses."""
+    rows = archive.union(db, ranges[0][0], lambda appointments, links: (
+        select(_day(appointments.c.AppointmentDate).label("Day"), links.c.TreatmentID)
+        .join(links, links.c.AppointmentID == appointments.c.AppointmentID)
+        .where(_in_ranges(appointments.c.AppointmentDate, ranges))
+    ))
+    return select(rows.c.Day, rows.c.TreatmentID, func.count().label("Uses")).group_by(rows.c.Day, rows.c.TreatmentID)
+
+# ----------------- Rollup maintenance -----------------
+
+def refresh_rollups(db: Session, start: date = None, end: date = None):
+    """Re-aggregate the dirty days in [start, end) (all of them by default) and commit.
+
+    The dirty rows are read with FOR UPDATE and deleted before re-aggregating, so a write that
+    marks one of these days concurrently either finishes first (and is counted) or marks it again.
+    """
+    dirty = select(AnalyticsDirtyDay.Day)
+    if start is not None:
+        dirty = dirty.where(AnalyticsDirtyDay.Day >= start)
+    if end is not None:
+        dirty = dirty.where(AnalyticsDirtyDay.Day < end)
+    days = db.scalars(dirty.with_for_update()).all()
+    if not days:
+        return
+
+    for offset in range(0, len(days), REFRESH_BATCH_DAYS):
+        batch = sorted(days[offset:offset + REFRESH_BATCH_DAYS])
+        db.execute(AnalyticsDirtyDay.__table__.delete().where(AnalyticsDirtyDay.Day.in_(batch)))
+        for rollup, counts in ((DailyDoctorAppointments, _doctor_counts), (DailyTreatmentUses, _treatment_counts)):
+            table = rollup.__table__
+            db.execute(table.delete().where(table.c.Day.in_(batch)))
+            query = counts(db, _within(batch))
+            db.execute(table.insert().from_select([column.name for column in query.selected_columns], query))
+    db.commit()
+
+def backfill_rollups(db: Session):
+    """Mark every day that has appointments dirty when the rollups are empty, e.g. on first start."""
+    if db.query(DailyDoctorAppointments.Day).first() is not None or db.query(AnalyticsDirtyDay.Day).first() is not None:
+        return
+    days = archive.union(db, None, lambda appointments, links: select(_day(appointments.c.AppointmentDate).label("Day")))
+    db.execute(AnalyticsDirtyDay.__table__.insert().from_select(["Day"], select(days.c.Day).distinct()))
+    db.commit()
+
+# ----------------- Queries -----------------
+
+def _check_range(start: date, end: date):
+    if end <= start:
+        raise HTTPException(status_code=400, detail="'to' must be after 'from'")
+
+def _source(db: Session, start: date, end: date, rollup, counts):
+    """Per-day rows for [start, end): straight from the raw tables for short ranges, else from the rollup."""
+    if (end - start).days <= config.ANALYTICS_RAW_MAX_DAYS:
+        return counts(db, _between(start, end)).subquery()
+    refresh_rollups(db, start, end)
+    return select(rollup).where(rollup.Day >= start, rollup.Day < end).subquery()
+
+def doctor_utilization(db: Session, start: date, end: date, specialty: str = None):
+    """Appointments, booked minutes and the booked share of working hours for each doctor over [start, end)."""
+    _check_range(start, end)
+    days = _source(db, start, end, DailyDoctorAppointments, _doctor_counts)
+    totals = (
+        select(days.c.DoctorID, func.sum(days.c.Appointments).label("Appointments"))
+        .group_by(days.c.DoctorID)
+        .subquery()
+    )
+    query = (
+        select(Doctor.DoctorID, Doctor.FullName, Doctor.Specialty, Doctor.AvailabilityHours, totals.c.Appointments)
+        .outerjoin(totals, totals.c.DoctorID == Doctor.DoctorID)
+        .order_by(Doctor.DoctorID)
+    )
+    if specialty is not None:
+        query = query.where(Doctor.Specialty == specialty)
+
+    results = []
+    for row in db.execute(query):
+        template = availability.parse_availability(row.AvailabilityHours or config.DEFAULT_AVAILABILITY_HOURS)
+        available = availability.working_minutes(template, start, end)
+        booked = (row.Appointments or 0) * config.APPOINTMENT_DURATION_MINUTES
+        results.append(DoctorUtilization(
+            DoctorID=row.DoctorID,
+            FullName=row.FullName,
+            Specialty=row.Specialty,
+            Appointments=row.Appointments or 0,
+            BookedMinutes=booked,
+            AvailableMinutes=available,
+            Utilization=round(booked / available, 4) if available else None
+        ))
+    return results
+
+def specialty_daily(db: Session, start: date, end: date):
+    """Appointments per specialty per day over [start, end), ordered by day then specialty."""
+    _check_range(start, end)
+    days = _source(db, start, end, DailyDoctorAppointments, _doctor_counts)
+    query = (
+        select(days.c.Day, Doctor.Specialty, func.sum(days.c.Appointments).label("Appointments"))
+        .join(Doctor, Doctor.DoctorID == days.c.DoctorID)
+        .group_by(days.c.Day, Doctor.Specialty)
+        .order_by(days.c.Day, Doctor.Specialty)
+    )
+    return [SpecialtyDailyCount(Day=row.Day, Specialty=row.Specialty, Appointments=row.Appointments) for row in db.execute(query)]
+
+def treatment_frequency(db: Session, start: date, end: date, limit: int = 100):
+    """The `limit` treatments linked to the most appointments over [start, end)."""
+    _check_range(start, end)
+    days = _source(db, start, end, DailyTreatmentUses, _treatment_counts)
+    uses = func.sum(days.c.Uses)
+    query = (
+        select(days.c.TreatmentID, Treatment.Name, uses.label("Uses"))
+        .join(Treatment, Treatment.TreatmentID == days.c.TreatmentID)
+        .group_by(days.c.TreatmentID, Treatment.Name)
+        .order_by(uses.desc(), days.c.TreatmentID)
+        .limit(limit)
+    )
+    return [TreatmentFrequency(TreatmentID=row.TreatmentID, Name=row.Name, Uses=row.Uses) for row in db.execute(query)]
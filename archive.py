@@ -0,0 +1,175 @@
+import argparse
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import MetaData, func, inspect, select, text, union_all
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateIndex, CreateTable
+import config
+from models import (
+    Appointment, AppointmentArchive, Doctor, Patient, appointment_treatment_table, archived_appointment_treatment_table
+)
+
+# Hot/cold archival of finished appointments.
+# archive_appointments() moves appointments older than a cutoff, with their treatment links, from
+# Appointments / Appointment_Treatments to AppointmentsArchive / ArchivedAppointment_Treatments in
+# chunks of ARCHIVE_BATCH_SIZE, each in its own short transaction, so writers are never blocked for
+# long and an interrupted run simply resumes where it stopped. Deleting the hot rows cascades to
+# their links and summary rows; analytics rollups stay valid because they read both tables.
+#
+# The archive horizon is the date of the newest archived appointment. Reads whose range starts
+# after it touch only the hot tables; reads that reach back past it (or have no start) also read
+# the archive, so callers never need to know where a row lives. Those reads run the same query
+# against each pair of tables and merge the ordered results (or UNION ALL them before aggregating),
+# rather than joining UNION ALL views, which would keep the database from using the tables' indexes.
+#
+# An archived AppointmentID must never be handed out again. Appointments uses AUTOINCREMENT on SQLite
+# for that, but only databases created since then have it; `python archive.py --migrate-ids` rebuilds
+# an older Appointments table once (with the API stopped), and archiving refuses to run until it has.
+#
+# Usage: python archive.py [--older-than-days 365 | --before 2024-01-01] [--batch-size 1000] [--pause 0.1]
+#        python archive.py --migrate-ids
+
+# Columns shared by Appointments and AppointmentsArchive, in table order
+COLUMNS = [column.name for column in AppointmentArchive.__table__.c]
+LINK_COLUMNS = ["AppointmentID", "TreatmentID"]
+
+# Archive model of each archived model, and the treatment link table of each appointment model
+ARCHIVES = {Appointment: AppointmentArchive}
+LINKS = {Appointment: appointment_treatment_table, AppointmentArchive: archived_appointment_treatment_table}
+
+def archive_horizon(db: Session):
+    """AppointmentDate of the newest archived appointment (None when the archive is empty), once per session."""
+    if "archive_horizon" not in db.info:
+        db.info["archive_horizon"] = db.scalar(select(func.max(AppointmentArchive.AppointmentDate)))
+    return db.info["archive_horizon"]
+
+def reaches_archive(db: Session, start: datetime = None):
+    """Whether appointments from `start` on (all of them when None) may include archived ones."""
+    horizon = archive_horizon(db)
+    return horizon is not None and (start is None or start <= horizon)
+
+def appointment_models(db: Session, start: datetime = None):
+    """The appointment models a read from `start` on has to query: Appointments, plus the archive if needed."""
+    return [Appointment, AppointmentArchive] if reaches_archive(db, start) else [Appointment]
+
+def appointment_tables(db: Session, start: datetime = None):
+    """(appointments, treatment links) table pairs a core query over appointments from `start` on has to run against."""
+    return [(model.__table__, LINKS[model]) for model in appointment_models(db, start)]
+
+def union(db: Session, start: datetime, build):
+    """Subquery of the rows `build(appointments, links)` selects from every table pair needed from `start` on."""
+    queries = [build(appointments, links) for appointments, links in appointment_tables(db, start)]
+    return (queries[0] if len(queries) == 1 else union_all(*queries)).subquery()
+
+def needs_id_migration(db: Session) -> bool:
+    """Whether Appointments is a SQLite table created without AUTOINCREMENT, which could reuse archived IDs."""
+    if db.get_bind().dialect.name != "sqlite":
+        return False
+    sql = db.scalar(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'Appointments'"))
+    return sql is not None and "AUTOINCREMENT" not in sql.upper()
+
+def migrate_appointment_ids(engine: Engine):
+    """Rebuild a SQLite Appointments table with AUTOINCREMENT, continuing its IDs past every archived one.
+
+    SQLite cannot add AUTOINCREMENT to a table, so this follows its table rebuild procedure in one
+    transaction: with foreign keys off, copy the rows into a new table, drop the old one, rename the
+    copy into place and recreate its indexes. Rows referencing appointments keep their IDs.
+    """
+    hot, cold = Appointment.__table__, AppointmentArchive.__table__
+    metadata = MetaData()
+    for table in (Patient.__table__, Doctor.__table__):
+        table.to_metadata(metadata)
+    rebuilt = hot.to_metadata(metadata, name="Appointments_new")
+    with engine.connect() as conn:
+        last_id = max(
+            conn.scalar(select(func.max(hot.c.AppointmentID))) or 0,
+            (conn.scalar(select(func.max(cold.c.AppointmentID))) if inspect(conn).has_table(cold.name) else None) or 0
+        )
+    statements = [
+        CreateTable(rebuilt),  # Without its indexes, whose names are still taken
+        rebuilt.insert().from_select(COLUMNS, select(*(hot.c[name] for name in COLUMNS))),
+        'DROP TABLE "Appointments"',
+        'ALTER TABLE "Appointments_new" RENAME TO "Appointments"',
+        *(CreateIndex(index) for index in hot.indexes),
+        # Start the sequence past the newest ID either table has ever held
+        "DELETE FROM sqlite_sequence WHERE name = 'Appointments'",
+        f"INSERT INTO sqlite_sequence (name, seq) VALUES ('Appointments', {int(last_id)})"
+    ]
+    script = ";\n".join(str(statement) if isinstance(statement, str) else str(statement.compile(engine)) for statement in statements)
+    # pysqlite runs DDL outside its implicit transactions, so the rebuild goes through one script
+    # with its own BEGIN/COMMIT (and foreign keys have to be switched off outside a transaction)
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        try:
+            cursor.executescript(f"PRAGMA foreign_keys=OFF;\nBEGIN;\n{script};\nCOMMIT;")
+        except Exception:
+            if raw.driver_connection.in_transaction:
+                cursor.execute("ROLLBACK")
+            raise
+        finally:
+            cursor.execute("PRAGMA foreign_keys=ON")
+    finally:
+        raw.close()
+
+def archive_appointments(db: Session, cutoff: datetime, batch_size: int = config.ARCHIVE_BATCH_SIZE, pause: float = 0.0):
+    """Move appointments dated before `cutoff` to the archive, oldest first; returns how many were moved.
+
+    Each chunk copies up to `batch_size` appointments and their links with INSERT ... SELECT,
+    deletes them from the hot tables and commits, then sleeps `pause` seconds to let other writers in.
+    """
+    hot, cold = Appointment.__table__, AppointmentArchive.__table__
+    hot_links, cold_links = appointment_treatment_table, archived_appointment_treatment_table
+    moved = 0
+    while True:
+        ids = db.scalars(
+            select(hot.c.AppointmentID)
+            .where(hot.c.AppointmentDate < cutoff)
+            .order_by(hot.c.AppointmentDate, hot.c.AppointmentID)
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            break
+        db.execute(cold.insert().from_select(COLUMNS, select(*(hot.c[name] for name in COLUMNS)).where(hot.c.AppointmentID.in_(ids))))
+        db.execute(cold_links.insert().from_select(LINK_COLUMNS, select(hot_links).where(hot_links.c.AppointmentID.in_(ids))))
+        # Links and upcoming-summary rows go with the appointments (ON DELETE CASCADE)
+        db.execute(hot.delete().where(hot.c.AppointmentID.in_(ids)))
+        db.commit()
+        moved += len(ids)
+        if pause:
+            time.sleep(pause)
+    db.info.pop("archive_horizon", None)
+    return moved
+
+if __name__ == "__main__":
+    from database import SessionLocal, engine
+
+    parser = argparse.ArgumentParser(description="Move finished appointments to the archive tables in small batches.")
+    parser.add_argument("--older-than-days", type=int, default=config.ARCHIVE_AFTER_DAYS, help="archive appointments older than this")
+    parser.add_argument("--before", type=datetime.fromisoformat, help="archive appointments before this date instead")
+    parser.add_argument("--batch-size", type=int, default=config.ARCHIVE_BATCH_SIZE, help="appointments per transaction")
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between batches")
+    parser.add_argument("--migrate-ids", action="store_true", help="rebuild an older SQLite Appointments table with AUTOINCREMENT")
+    args = parser.parse_args()
+
+    if args.migrate_ids:
+        with SessionLocal() as db:
+            needed = needs_id_migration(db)
+        if needed:
+            migrate_appointment_ids(engine)
+        print("Migrated Appointments to AUTOINCREMENT IDs" if needed else "Appointments IDs need no migration")
+        raise SystemExit(0)
+
+    with SessionLocal() as db:
+        if needs_id_migration(db):
+            raise SystemExit("Appointments was created without AUTOINCREMENT; run python archive.py --migrate-ids first")
+
+    cutoff = args.before or datetime.combine(datetime.now().date() - timedelta(days=args.older_than_days), datetime.min.time())
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        moved = archive_appointments(db, cutoff, batch_size=args.batch_size, pause=args.pause)
+    finally:
+        db.close()
+    print(f"Archived {moved} appointments dated before {cutoff.isoformat()} in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,118 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+import crud
+import schemas
+
+# Async variants of the crud operations.
+# Each one runs the matching sync function from crud.py on the AsyncSession's connection
+# through `run_sync`, so the event loop is never blocked on database I/O while business rules
+# stay defined in one place. Results are converted to schemas inside the same call, because
+# lazy-loading ORM attributes after returning to the event loop is not allowed.
+
+async def _run(db: AsyncSession, fn, schema=None, **kwargs):
+    """Run a sync crud function on an AsyncSession and serialize its result with `schema`."""
+    def call(session):
+        result = fn(session, **kwargs)
+        if schema is None:
+            return result
+        if isinstance(result, list):
+            return [schema.model_validate(item) for item in result]
+        return schema.model_validate(result)
+    return await db.run_sync(call)
+
+# Patient CRUD Operations
+
+async def create_patient(db: AsyncSession, patient: schemas.PatientCreate):
+    """Create a new patient record in the database."""
+    return await _run(db, crud.create_patient, schemas.Patient, patient=patient)
+
+async def get_patient(db: AsyncSession, patient_id: int):
+    """Fetch a single patient by ID."""
+    return await _run(db, crud.get_patient, schemas.Patient, patient_id=patient_id)
+
+async def get_patients(db: AsyncSession, skip: int = 0, limit: int = 100, cursor: str = None):
+    """Fetch patients ordered by ID, paginated by offset or by a keyset cursor."""
+    return await _run(db, crud.get_patients, schemas.Patient, skip=skip, limit=limit, cursor=cursor)
+
+async def update_patient(db: AsyncSession, patient_id: int, patient: schemas.PatientUpdate):
+    """Update an existing patient's details by ID."""
+    return await _run(db, crud.update_patient, schemas.Patient, patient_id=patient_id, patient=patient)
+
+async def delete_patient(db: AsyncSession, patient_id: int):
+    """Delete a patient record by ID."""
+    return await _run(db, crud.delete_patient, patient_id=patient_id)
+
+# Doctor CRUD Operations
+
+async def create_doctor(db: AsyncSession, doctor: schemas.DoctorCreate):
+    """Create a new doctor record in the database."""
+    return await _run(db, crud.create_doctor, schemas.Doctor, doctor=doctor)
+
+async def get_doctor(db: AsyncSession, doctor_id: int):
+    """Fetch a single doctor by ID."""
+    return await _run(db, crud.get_doctor, schemas.Doctor, doctor_id=doctor_id)
+
+async def get_doctors(db: AsyncSession, skip: int = 0, limit: int = 100, cursor: str = None):
+    """Fetch doctors ordered by ID, paginated by offset or by a keyset cursor."""
+    return await _run(db, crud.get_doctors, schemas.Doctor, skip=skip, limit=limit, cursor=cursor)
+
+async def update_doctor(db: AsyncSession, doctor_id: int, doctor: schemas.DoctorUpdate):
+    """Update an existing doctor's details by ID."""
+    return await _run(db, crud.update_doctor, schemas.Doctor, doctor_id=doctor_id, doctor=doctor)
+
+async def delete_doctor(db: AsyncSession, doctor_id: int):
+    """Delete a doctor record by ID."""
+    return await _run(db, crud.delete_doctor, doctor_id=doctor_id)
+
+# Treatment CRUD Operations
+
+async def create_treatment(db: AsyncSession, treatment: schemas.TreatmentCreate):
+    """Create a new treatment record in the database."""
+    return await _run(db, crud.create_treatment, schemas.Treatment, treatment=treatment)
+
+async def get_treatment(db: AsyncSession, treatment_id: int):
+    """Fetch a single treatment by ID."""
+    return await _run(db, crud.get_treatment, schemas.Treatment, treatment_id=treatment_id)
+
+async def get_treatments(db: AsyncSession, skip: int = 0, limit: int = 100, cursor: str = None):
+    """Fetch treatments ordered by ID, paginated by offset or by a keyset cursor."""
+    return await _run(db, crud.get_treatments, schemas.Treatment, skip=skip, limit=limit, cursor=cursor)
+
+async def update_treatment(db: AsyncSession, treatment_id: int, treatment: schemas.TreatmentUpdate):
+    """Update an existing treatment record by ID."""
+    return await _run(db, crud.update_treatment, schemas.Treatment, treatment_id=treatment_id, treatment=treatment)
+
+async def delete_treatment(db: AsyncSession, treatment_id: int):
+    """Delete a treatment record by ID."""
+    return await _run(db, crud.delete_treatment, treatment_id=treatment_id)
+
+# Appointment CRUD Operations
+
+async def create_appointment(db: AsyncSession, appointment: schemas.AppointmentCreate):
+    """Create a new appointment record in the database."""
+    return await _run(db, crud.create_appointment, schemas.Appointment, appointment=appointment)
+
+async def get_appointment(db: AsyncSession, appointment_id: int):
+    """Fetch a single appointment by ID."""
+    return await _run(db, crud.get_appointment, schemas.Appointment, appointment_id=appointment_id)
+
+async def get_appointments(db: AsyncSession, skip: int = 0, limit: int = 100, cursor: str = None):
+    """Fetch appointments ordered by (AppointmentDate, AppointmentID), paginated by offset or cursor."""
+    return await _run(db, crud.get_appointments, schemas.Appointment, skip=skip, limit=limit, cursor=cursor)
+
+async def update_appointment(db: AsyncSession, appointment_id: int, appointment: schemas.AppointmentUpdate):
+    """Update an existing appointment record by ID."""
+    return await _run(db, crud.update_appointment, schemas.Appointment, appointment_id=appointment_id, appointment=appointment)
+
+async def delete_appointment(db: AsyncSession, appointment_id: int):
+    """Delete an appointment record by ID."""
+    return await _run(db, crud.delete_appointment, appointment_id=appointment_id)
+
+# Link Treatments to Appointment
+
+async def link_treatment_to_appointment(db: AsyncSession, appointment_id: int, treatment_ids: list):
+    """Link treatments to an appointment, given an appointment ID and list of treatment IDs."""
+    return await _run(db, crud.link_treatment_to_appointment, appointment_id=appointment_id, treatment_ids=treatment_ids)
+
+async def replace_appointment_treatments(db: AsyncSession, appointment_id: int, treatment_ids: list):
+    """Replace the set of treatments linked to an appointment."""
+    return await _run(db, crud.replace_appointment_treatments, appointment_id=appointment_id, treatment_ids=treatment_ids)
@@ -0,0 +1,127 @@
+from fastapi import APIRouter, Depends, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+import async_crud
+import crud
+import schemas
+from crud import set_next_cursor
+from database import get_async_db
+
+# Async route handlers, mounted under /async alongside the sync routes in main.py.
+# They mirror the sync CRUD routes but run on the event loop with an AsyncSession,
+# so they do not hold a threadpool worker while waiting on the database.
+router = APIRouter(prefix="/async", tags=["async"])
+
+# ----------------- Patient Routes -----------------
+
+@router.post("/patients/", response_model=schemas.Patient)
+async def create_patient(patient: schemas.PatientCreate, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.create_patient(db=db, patient=patient)
+
+@router.get("/patients/{patient_id}", response_model=schemas.Patient)
+async def get_patient(patient_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.get_patient(db=db, patient_id=patient_id)
+
+@router.get("/patients/", response_model=list[schemas.Patient])
+async def get_patients(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    patients = await async_crud.get_patients(db=db, skip=skip, limit=limit, cursor=cursor)
+    set_next_cursor(response, crud.next_cursor(patients, limit, "PatientID"))
+    return patients
+
+# PUT - Update Patient
+@router.put("/patients/{patient_id}", response_model=schemas.Patient)
+async def update_patient(patient_id: int, patient: schemas.PatientCreate, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.update_patient(db=db, patient_id=patient_id, patient=patient)
+
+# DELETE - Delete Patient
+@router.delete("/patients/{patient_id}", response_model=schemas.Message)
+async def delete_patient(patient_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.delete_patient(db=db, patient_id=patient_id)
+
+# ----------------- Doctor Routes -----------------
+
+@router.post("/doctors/", response_model=schemas.Doctor)
+async def create_doctor(doctor: schemas.DoctorCreate, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.create_doctor(db=db, doctor=doctor)
+
+@router.get("/doctors/{doctor_id}", response_model=schemas.Doctor)
+async def get_doctor(doctor_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.get_doctor(db=db, doctor_id=doctor_id)
+
+@router.get("/doctors/", response_model=list[schemas.Doctor])
+async def get_doctors(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    doctors = await async_crud.get_doctors(db=db, skip=skip, limit=limit, cursor=cursor)
+    set_next_cursor(response, crud.next_cursor(doctors, limit, "DoctorID"))
+    return doctors
+
+# PUT - Update Doctor
+@router.put("/doctors/{doctor_id}", response_model=schemas.Doctor)
+async def update_doctor(doctor_id: int, doctor: schemas.DoctorCreate, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.update_doctor(db=db, doctor_id=doctor_id, doctor=doctor)
+
+# DELETE - Delete Doctor
+@router.delete("/doctors/{doctor_id}", response_model=schemas.Message)
+async def delete_doctor(doctor_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.delete_doctor(db=db, doctor_id=doctor_id)
+
+# ----------------- Treatment Routes -----------------
+
+@router.post("/treatments/", response_model=schemas.Treatment)
+async def create_treatment(treatment: schemas.TreatmentCreate, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.create_treatment(db=db, treatment=treatment)
+
+@router.get("/treatments/{treatment_id}", response_model=schemas.Treatment)
+async def get_treatment(treatment_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.get_treatment(db=db, treatment_id=treatment_id)
+
+@router.get("/treatments/", response_model=list[schemas.Treatment])
+async def get_treatments(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    treatments = await async_crud.get_treatments(db=db, skip=skip, limit=limit, cursor=cursor)
+    set_next_cursor(response, crud.next_cursor(treatments, limit, "TreatmentID"))
+    return treatments
+
+# PUT - Update Treatment
+@router.put("/treatments/{treatment_id}", response_model=schemas.Treatment)
+async def update_treatment(treatment_id: int, treatment: schemas.TreatmentCreate, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.update_treatment(db=db, treatment_id=treatment_id, treatment=treatment)
+
+# DELETE - Delete Treatment
+@router.delete("/treatments/{treatment_id}", response_model=schemas.Message)
+async def delete_treatment(treatment_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.delete_treatment(db=db, treatment_id=treatment_id)
+
+# ----------------- Appointment Routes -----------------
+
+@router.post("/appointments/", response_model=schemas.Appointment)
+async def create_appointment(appointment: schemas.AppointmentCreate, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.create_appointment(db=db, appointment=appointment)
+
+@router.get("/appointments/{appointment_id}", response_model=schemas.Appointment)
+async def get_appointment(appointment_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.get_appointment(db=db, appointment_id=appointment_id)
+
+@router.get("/appointments/", response_model=list[schemas.Appointment])
+async def get_appointments(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    appointments = await async_crud.get_appointments(db=db, skip=skip, limit=limit, cursor=cursor)
+    set_next_cursor(response, crud.next_cursor(appointments, limit, "AppointmentDate", "AppointmentID"))
+    return appointments
+
+# PUT - Update Appointment
+@router.put("/appointments/{appointment_id}", response_model=schemas.Appointment)
+async def update_appointment(appointment_id: int, appointment: schemas.AppointmentCreate, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.update_appointment(db=db, appointment_id=appointment_id, appointment=appointment)
+
+# DELETE - Delete Appointment
+@router.delete("/appointments/{appointment_id}", response_model=schemas.Message)
+async def delete_appointment(appointment_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.delete_appointment(db=db, appointment_id=appointment_id)
+
+# ----------------- Link Treatments to Appointment -----------------
+
+@router.post("/appointments/{appointment_id}/treatments/", response_model=schemas.TreatmentLinkResult)
+async def link_treatment_to_appointment(appointment_id: int, treatment_ids: list[int], db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.link_treatment_to_appointment(db=db, appointment_id=appointment_id, treatment_ids=treatment_ids)
+
+@router.put("/appointments/{appointment_id}/treatments/", response_model=schemas.TreatmentLinkResult)
+async def replace_appointment_treatments(appointment_id: int, treatment_ids: list[int], db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.replace_appointment_treatments(db=db, appointment_id=appointment_id, treatment_ids=treatment_ids)
@@ -0,0 +1,118 @@
+import re
+from datetime import date, datetime, time, timedelta
+
+# Working-hours templates and free-slot computation for doctors.
+# A template is the free-text AvailabilityHours column from clinic_booking_system.sql,
+# e.g. "Mon-Fri 9AM-5PM" or "Mon-Fri 9AM-1PM; Mon-Fri 2PM-5:30PM; Sat 10AM-2PM".
+# Everything here is pure Python over sorted intervals; the database work lives in crud.py.
+
+DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+_TIME = r"\d{1,2}(?::\d{2})?\s*(?:am|pm)?"
+_SEGMENT = re.compile(rf"^(?P<days>[a-z,\s-]+?)\s+(?P<open>{_TIME})\s*-\s*(?P<close>{_TIME})$", re.IGNORECASE)
+
+def _parse_time(text: str):
+    """Parse '9AM', '5:30pm' or '17:00' into a time."""
+    match = re.fullmatch(r"(\d{1,2})(?::(\d{2}))?\s*(am|pm)?", text.strip(), re.IGNORECASE)
+    if match is None:
+        raise ValueError(f"Invalid time '{text}'")
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), (match.group(3) or "").lower()
+    if meridiem:
+        if not 1 <= hour <= 12:
+            raise ValueError(f"Invalid time '{text}'")
+        hour = hour % 12 + (12 if meridiem == "pm" else 0)
+    if hour > 23 or minute > 59:
+        raise ValueError(f"Invalid time '{text}'")
+    return time(hour, minute)
+
+def _parse_days(text: str):
+    """Parse 'Mon-Fri', 'Sat' or 'Mon,Wed,Fri' into weekday numbers (Monday is 0)."""
+    weekdays = set()
+    for part in text.lower().split(","):
+        bounds = [day.strip()[:3] for day in part.split("-")]
+        if len(bounds) > 2 or any(day not in DAYS for day in bounds):
+            raise ValueError(f"Invalid days '{part.strip()}'")
+        first, last = DAYS.index(bounds[0]), DAYS.index(bounds[-1])
+        # Ranges may wrap around the week, e.g. Fri-Mon
+        weekdays.update((first + offset) % 7 for offset in range((last - first) % 7 + 1))
+    return weekdays
+
+def parse_availability(text: str):
+    """Parse a working-hours template into {weekday: [(open, close), ...]} with sorted, merged hours."""
+    template = {}
+    for segment in filter(str.strip, re.split(r"[;\n]", text)):
+        match = _SEGMENT.match(segment.strip())
+        if match is None:
+            raise ValueError(f"Invalid availability '{segment.strip()}', expected e.g. 'Mon-Fri 9AM-5PM'")
+        open_at, close_at = _parse_time(match.group("open")), _parse_time(match.group("close"))
+        if close_at <= open_at:
+            raise ValueError(f"Availability '{segment.strip()}' closes before it opens")
+        for weekday in _parse_days(match.group("days")):
+            template.setdefault(weekday, []).append((open_at, close_at))
+
+    for weekday, hours in template.items():
+        merged = []
+        for open_at, close_at in sorted(hours):
+            if merged and open_at <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], close_at))
+            else:
+                merged.append((open_at, close_at))
+        template[weekday] = merged
+    return template
+
+def working_windows(template: dict, start: datetime, end: datetime):
+    """Yield the (open, close) datetimes of the template's working hours within [start, end), in order."""
+    day = start.date()
+    while day <= end.date():
+        for open_at, close_at in template.get(day.weekday(), []):
+            low = max(datetime.combine(day, open_at), start)
+            high = min(datetime.combine(day, close_at), end)
+            if low < high:
+                yield low, high
+        day += timedelta(days=1)
+
+def working_minutes(template: dict, start: date, end: date):
+    """Total working minutes of the template over the days in [start, end)."""
+    per_weekday = {
+        weekday: sum((datetime.combine(date.min, close_at) - datetime.combine(date.min, open_at)).seconds // 60
+                     for open_at, close_at in hours)
+        for weekday, hours in template.items()
+    }
+    days = max((end - start).days, 0)
+    full_weeks, remainder = divmod(days, 7)
+    total = full_weeks * sum(per_weekday.values())
+    for offset in range(remainder):
+        total += per_weekday.get((start.weekday() + offset) % 7, 0)
+    return total
+
+def merge_bookings(starts: list, length: timedelta):
+    """Turn sorted booking start times into sorted, non-overlapping busy intervals."""
+    busy = []
+    for booked_at in starts:
+        if busy and booked_at <= busy[-1][1]:
+            busy[-1] = (busy[-1][0], max(busy[-1][1], booked_at + length))
+        else:
+            busy.append((booked_at, booked_at + length))
+    return busy
+
+def open_slots(template: dict, booked: list, start: datetime, end: datetime, duration: timedelta, length: timedelta):
+    """Return the free (start, end) slots of `duration` within working hours, skipping booked intervals.
+
+    `booked` holds sorted booking start times, each lasting `length`. Working windows and busy
+    intervals are both sorted, so a single merge-style sweep over the two lists finds every slot.
+    """
+    busy = merge_bookings(booked, length)
+    slots = []
+    i = 0
+    for low, high in working_windows(template, start, end):
+        cursor = low
+        while cursor + duration <= high:
+            while i < len(busy) and busy[i][1] <= cursor:
+                i += 1
+            if i < len(busy) and busy[i][0] < cursor + duration:
+                # The slot would overlap a booking: resume right after it
+                cursor = busy[i][1]
+                continue
+            slots.append((cursor, cursor + duration))
+            cursor += duration
+    return slots
@@ -0,0 +1,497 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import time
+from datetime import date, datetime, timedelta
+import httpx
+from sqlalchemy import create_engine
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session, selectinload
+import config
+import analytics
+import archive
+import crud
+import database
+import metrics
+import schemas
+import serialization
+from models import Patient, Doctor, Treatment, Appointment, appointment_treatment_table
+
+# Load benchmark for the API.
+# Seeds a SQLite database with synthetic clinic data, then drives every route of the app in-process
+# (httpx.AsyncClient over ASGITransport, so no server or network is involved) at a fixed concurrency.
+# For each scenario it reports p50/p95/p99 latency, throughput and SQL statements per request (taken
+# from the per-route counters in metrics.py) as JSON. Save one run with --output and pass it to a later
+# run with --compare to get the relative change per scenario.
+#
+# The seeded database is built once per set of volumes and kept in --data-dir; every run works on a
+# fresh copy of it, so write scenarios never leak into the next run.
+#
+# Usage: python benchmark.py [--patients 100000 --doctors 500 --appointments 5000000]
+#                            [--requests 200 --concurrency 16] [--output baseline.json] [--compare baseline.json]
+#        python benchmark.py --serialization [--page-size 1000]   (list serialization paths only, see below)
+#        python benchmark.py --archive-share 0.8   (move the oldest 80% of appointments to the archive first)
+#        python benchmark.py --group-commit --only appointments.create   (POST /appointments/ through group_commit.py)
+
+SPECIALTIES = ["Cardiology", "Dermatology", "Neurology", "Pediatrics", "Orthopedics",
+               "Oncology", "Psychiatry", "Radiology", "General Practice", "Ophthalmology"]
+HOURS = ["Mon-Fri 9AM-5PM", "Mon-Thu 8AM-4PM; Fri 8AM-12PM", "Tue-Sat 10AM-6PM", None]
+
+# Seeded appointments fill each doctor's day on a grid of APPOINTMENT_DURATION_MINUTES slots from 9AM to 5PM
+SEED_START = datetime(2025, 6, 2, 9, 0)
+SLOT = timedelta(minutes=config.APPOINTMENT_DURATION_MINUTES)
+SLOTS_PER_DAY = 8 * 60 // config.APPOINTMENT_DURATION_MINUTES
+
+SEED_BATCH_SIZE = 50000
+
+# SQLite storage formats used by SQLAlchemy, so seeded rows compare equal to rows it writes itself
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+DATE_FORMAT = "%Y-%m-%d"
+
+# ----------------- Synthetic data -----------------
+# Every row is a pure function of its index, so scenarios can address seeded rows without querying them.
+
+def patient_row(i: int):
+    born = date(1940, 1, 1) + timedelta(days=(i * 37) % 25000)
+    return (i, f"Patient {i}", born.strftime(DATE_FORMAT), f"555{i:07d}", f"patient{i}@example.com", ("F", "M")[i % 2])
+
+def doctor_row(i: int):
+    return (i, f"Doctor {i}", SPECIALTIES[i % len(SPECIALTIES)], f"444{i:07d}", f"doctor{i}@example.com", HOURS[i % len(HOURS)])
+
+def treatment_row(i: int):
+    return (i, f"Treatment {i}", f"Synthetic treatment number {i}")
+
+def appointment_values(i: int, volumes: dict):
+    """(PatientID, DoctorID, AppointmentDate) of seeded appointment i (1-based)."""
+    doctor = (i - 1) % volumes["doctors"] + 1
+    slot = (i - 1) // volumes["doctors"]
+    when = SEED_START + timedelta(days=slot // SLOTS_PER_DAY) + SLOT * (slot % SLOTS_PER_DAY)
+    patient = (i * 7919) % volumes["patients"] + 1
+    return patient, doctor, when
+
+def appointment_row(i: int, volumes: dict):
+    patient, doctor, when = appointment_values(i, volumes)
+    return (i, patient, doctor, when.strftime(DATETIME_FORMAT), f"Visit {i}")
+
+def link_rows(i: int, volumes: dict):
+    return [(i, (i * volumes["links"] + j) % volumes["treatments"] + 1) for j in range(volumes["links"])]
+
+def seed_end(volumes: dict):
+    """First slot after every seeded appointment; new bookings start here so they never conflict."""
+    last = -(-volumes["appointments"] // volumes["doctors"])
+    return SEED_START + timedelta(days=last // SLOTS_PER_DAY + 1)
+
+# ----------------- Seeding -----------------
+
+def _insert_sql(table, columns):
+    names = ", ".join(f'"{name}"' for name in columns)
+    return f'INSERT INTO "{table.name}" ({names}) VALUES ({", ".join("?" * len(columns))})'
+
+def _bulk_insert(connection, table, columns, rows, total):
+    """executemany straight on the sqlite3 cursor, in batches, with a progress line per table."""
+    sql = _insert_sql(table, columns)
+    started, batch, done = time.perf_counter(), [], 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) == SEED_BATCH_SIZE:
+            connection.executemany(sql, batch)
+            done += len(batch)
+            batch = []
+            print(f"  {table.name}: {done}/{total}", end="\r", flush=True)
+    if batch:
+        connection.executemany(sql, batch)
+        done += len(batch)
+    connection.commit()
+    print(f"  {table.name}: {done} rows in {time.perf_counter() - started:.1f}s")
+
+def seed(path: str, volumes: dict):
+    """Create the schema with SQLAlchemy, then fill it with raw executemany on one transaction per table."""
+    engine = create_engine(f"sqlite:///{path}")
+    database.Base.metadata.create_all(bind=engine)
+    engine.dispose()
+
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode=OFF")
+    connection.execute("PRAGMA synchronous=OFF")
+    try:
+        _bulk_insert(connection, Patient.__table__,
+                     ["PatientID", "FullName", "DateOfBirth", "PhoneNumber", "Email", "Gender"],
+                     (patient_row(i) for i in range(1, volumes["patients"] + 1)), volumes["patients"])
+        _bulk_insert(connection, Doctor.__table__,
+                     ["DoctorID", "FullName", "Specialty", "PhoneNumber", "Email", "AvailabilityHours"],
+                     (doctor_row(i) for i in range(1, volumes["doctors"] + 1)), volumes["doctors"])
+        _bulk_insert(connection, Treatment.__table__, ["TreatmentID", "Name", "Description"],
+                     (treatment_row(i) for i in range(1, volumes["treatments"] + 1)), volumes["treatments"])
+        _bulk_insert(connection, Appointment.__table__,
+                     ["AppointmentID", "PatientID", "DoctorID", "AppointmentDate", "Reason"],
+                     (appointment_row(i, volumes) for i in range(1, volumes["appointments"] + 1)), volumes["appointments"])
+        _bulk_insert(connection, appointment_treatment_table, ["AppointmentID", "TreatmentID"],
+                     (link for i in range(1, volumes["appointments"] + 1) for link in link_rows(i, volumes)),
+                     volumes["appointments"] * volumes["links"])
+        connection.execute("ANALYZE")
+        connection.commit()
+    finally:
+        connection.close()
+
+    # The upcoming-appointments summary, the patient search index and the analytics rollups are
+    # derived data; build them the way the app does on startup, then aggregate every day up front
+    engine = create_engine(f"sqlite:///{path}")
+    with Session(engine) as db:
+        crud.backfill_upcoming_summary(db)
+        crud.backfill_patient_search(db)
+        analytics.backfill_rollups(db)
+        analytics.refresh_rollups(db)
+    engine.dispose()
+
+def prepare_database(data_dir: str, volumes: dict, reseed: bool = False):
+    """Path of a fresh working copy of the seeded database, seeding it first if needed."""
+    os.makedirs(data_dir, exist_ok=True)
+    key = "_".join(f"{name}{volumes[name]}" for name in sorted(volumes))
+    seeded = os.path.join(data_dir, f"seed_{key}.db")
+    if reseed or not os.path.exists(seeded):
+        print(f"Seeding {seeded} ...")
+        partial = seeded + ".partial"
+        if os.path.exists(partial):
+            os.remove(partial)
+        seed(partial, volumes)
+        os.replace(partial, seeded)
+    working = os.path.join(data_dir, "run.db")
+    shutil.copyfile(seeded, working)
+    return working
+
+def bind_app(path: str):
+    """Point the database settings at the benchmark database, then import the app on it.
+
+    main runs create_all and the startup backfills when it is first imported, so it is only imported
+    here, once DATABASE_URL and the primary engine name the working copy instead of ./test.db.
+    The app instruments both engines for metrics. Returns (engine, async engine, app).
+    """
+    config.DATABASE_URL = f"sqlite:///{path}"
+    config.ASYNC_DATABASE_URL = None  # derived from DATABASE_URL (aiosqlite)
+    database.engine = database.create_db_engine(config.DATABASE_URL)
+    database.SessionLocal.configure(bind=database.engine)
+    import main
+    return database.engine, database.get_async_engine(), main.app
+
+# ----------------- Scenarios -----------------
+# A scenario is (name, method, route template, request factory). The factory takes the request's
+# sequence number and returns (url, keyword arguments for httpx), so every request is reproducible.
+
+def scenarios(volumes: dict, rng: random.Random, batch: int):
+    patients, doctors, treatments, appointments = (volumes[name] for name in ("patients", "doctors", "treatments", "appointments"))
+    fresh = seed_end(volumes)
+
+    def any_id(count):
+        return lambda n: rng.randint(1, count)
+
+    def day_of(i):
+        return appointment_values(i, volumes)[2].replace(hour=0, minute=0)
+
+    def new_patient(n):
+        return {"FullName": f"New Patient {n}", "DateOfBirth": "1990-05-17",
+                "PhoneNumber": f"777{n:07d}", "Email": f"new{n}@example.com", "Gender": ("F", "M")[n % 2]}
+
+    def new_doctor(n):
+        return {"FullName": f"New Doctor {n}", "Specialty": SPECIALTIES[n % len(SPECIALTIES)],
+                "PhoneNumber": f"666{n:07d}", "Email": f"newdoc{n}@example.com", "AvailabilityHours": HOURS[0]}
+
+    def new_appointment(n):
+        # One fresh slot per request; patients and doctors rotate so nothing double-books
+        return {"PatientID": n % patients + 1, "DoctorID": n % doctors + 1,
+                "AppointmentDate": (fresh + SLOT * n).isoformat(), "Reason": f"Benchmark visit {n}"}
+
+    def existing_appointment(i, reason):
+        patient, doctor, when = appointment_values(i, volumes)
+        return {"PatientID": patient, "DoctorID": doctor, "AppointmentDate": when.isoformat(), "Reason": reason}
+
+    def import_csv(n):
+        lines = ["FullName,DateOfBirth,PhoneNumber,Email,Gender"]
+        lines += [f"Imported {n}-{k},1985-03-0{k % 9 + 1},888{n:04d}{k:03d},imp{n}-{k}@example.com,F" for k in range(batch)]
+        return "\n".join(lines).encode()
+
+    # Deletes take ids from the top of each table so they never collide with the reads and updates below
+    def from_top(count):
+        return lambda n: count - n
+
+    def seeded_range(**length):
+        # A random seeded day and the range of the given length from its start
+        start = day_of(rng.randint(1, appointments))
+        return {"from": start.isoformat(), "to": (start + timedelta(**length)).isoformat()}
+
+    def seeded_dates(days):
+        # A range of whole days starting on a random seeded day, for the analytics routes
+        start = day_of(rng.randint(1, appointments)).date()
+        return {"from": start.isoformat(), "to": (start + timedelta(days=days)).isoformat()}
+
+    def renamed_patient(i):
+        _, _, born, phone, email, gender = patient_row(i)
+        return {"FullName": f"Renamed Patient {i}", "DateOfBirth": born, "PhoneNumber": phone, "Email": email, "Gender": gender}
+
+    return [
+        ("root", "GET", "/", lambda n: ("/", {})),
+        ("patients.get", "GET", "/patients/{patient_id}", lambda n: (f"/patients/{any_id(patients)(n)}", {})),
+        ("patients.search", "GET", "/patients/search", lambda n: ("/patients/search", {"params": {"q": (
+            f"patient {any_id(patients)(n) // 10}", f"555{any_id(patients)(n):07d}"[:7], f"patient{any_id(patients)(n)}@")[n % 3]}})),
+        ("patients.list", "GET", "/patients/", lambda n: ("/patients/", {"params": {"skip": rng.randint(0, max(patients - 100, 0)), "limit": 100}})),
+        ("patients.list_fields", "GET", "/patients/", lambda n: ("/patients/", {"params": {
+            "skip": rng.randint(0, max(patients - 100, 0)), "limit": 100, "fields": "PatientID,FullName"}})),
+        ("patients.create", "POST", "/patients/", lambda n: ("/patients/", {"json": new_patient(n)})),
+        ("patients.bulk", "POST", "/patients/bulk", lambda n: ("/patients/bulk", {"json": [new_patient(100000 + n * batch + k) for k in range(batch)]})),
+        ("patients.import", "POST", "/patients/import", lambda n: ("/patients/import", {"content": import_csv(n)})),
+        ("patients.update", "PUT", "/patients/{patient_id}", lambda n: (f"/patients/{n + 1}", {"json": renamed_patient(n + 1)})),
+        ("doctors.get", "GET", "/doctors/{doctor_id}", lambda n: (f"/doctors/{any_id(doctors)(n)}", {})),
+        ("doctors.list", "GET", "/doctors/", lambda n: ("/doctors/", {"params": {"limit": 100}})),
+        ("doctors.create", "POST", "/doctors/", lambda n: ("/doctors/", {"json": new_doctor(n)})),
+        ("doctors.bulk", "POST", "/doctors/bulk", lambda n: ("/doctors/bulk", {"json": [new_doctor(100000 + n * batch + k) for k in range(batch)]})),
+        ("doctors.update", "PUT", "/doctors/{doctor_id}", lambda n: (f"/doctors/{n % doctors + 1}", {"json": doctor_update(n % doctors + 1)})),
+        ("doctors.availability", "GET", "/doctors/{doctor_id}/availability", lambda n: (
+            f"/doctors/{any_id(doctors)(n)}/availability", {"params": seeded_range(days=7)})),
+        ("doctors.search_availability", "GET", "/doctors/availability", lambda n: (
+            "/doctors/availability", {"params": dict(seeded_range(days=1), specialty=SPECIALTIES[n % len(SPECIALTIES)])})),
+        ("treatments.get", "GET", "/treatments/{treatment_id}", lambda n: (f"/treatments/{any_id(treatments)(n)}", {})),
+        ("treatments.list", "GET", "/treatments/", lambda n: ("/treatments/", {"params": {"limit": 100}})),
+        ("treatments.create", "POST", "/treatments/", lambda n: ("/treatments/", {"json": {"Name": f"New Treatment {n}", "Description": None}})),
+        ("treatments.bulk", "POST", "/treatments/bulk", lambda n: ("/treatments/bulk", {"json": [{"Name": f"Bulk Treatment {n}-{k}", "Description": None} for k in range(batch)]})),
+        ("treatments.update", "PUT", "/treatments/{treatment_id}", lambda n: (f"/treatments/{n % treatments + 1}", {"json": {"Name": f"Treatment {n % treatments + 1}", "Description": f"Revised {n}"}})),
+        ("appointments.get", "GET", "/appointments/{appointment_id}", lambda n: (f"/appointments/{any_id(appointments)(n)}", {})),
+        ("appointments.list", "GET", "/appointments/", lambda n: ("/appointments/", {"params": {"skip": rng.randint(0, 10000), "limit": 100}})),
+        ("appointments.list_fields", "GET", "/appointments/", lambda n: ("/appointments/", {"params": {
+            "skip": rng.randint(0, 10000), "limit": 100, "fields": "PatientID,DoctorID"}})),
+        ("appointments.list_range", "GET", "/appointments/", lambda n: ("/appointments/", {"params": dict(seeded_range(days=1), limit=100)})),
+        ("appointments.create", "POST", "/appointments/", lambda n: ("/appointments/", {"json": new_appointment(n)})),
+        ("appointments.bulk", "POST", "/appointments/bulk", lambda n: ("/appointments/bulk", {"json": [new_appointment(100000 + n * batch + k) for k in range(batch)]})),
+        ("appointments.update", "PUT", "/appointments/{appointment_id}", lambda n: (f"/appointments/{n + 1}", {"json": existing_appointment(n + 1, f"Rescheduled {n}")})),
+        ("appointments.link_treatments", "POST", "/appointments/{appointment_id}/treatments/", lambda n: (
+            f"/appointments/{fresh_appointment(n)}/treatments/", {"json": [n % treatments + 1]})),
+        ("appointments.treatment_details", "GET", "/appointments/treatments", lambda n: (
+            "/appointments/treatments", {"params": {"ids": ",".join(str(any_id(appointments)(n)) for _ in range(batch))}}
+            if n % 2 else {"params": dict(seeded_range(hours=4), limit=batch)})),
+        ("appointments.upcoming", "GET", "/appointments/upcoming", lambda n: (
+            "/appointments/upcoming", {"params": {"doctor_id": any_id(doctors)(n)} if n % 2 else {}})),
+        ("appointments.replace_treatments", "PUT", "/appointments/{appointment_id}/treatments/", lambda n: (
+            f"/appointments/{any_id(appointments)(n)}/treatments/", {"json": [(n + k) % treatments + 1 for k in range(batch)]})),
+        ("appointments.export", "GET", "/appointments/export", lambda n: (
+            "/appointments/export", {"params": dict(seeded_range(hours=1), format=("ndjson", "csv")[n % 2])})),
+        ("analytics.doctor_utilization", "GET", "/analytics/doctor-utilization", lambda n: (
+            "/analytics/doctor-utilization", {"params": seeded_dates((7, 90)[n % 2])})),
+        ("analytics.specialty_daily", "GET", "/analytics/specialty-daily", lambda n: (
+            "/analytics/specialty-daily", {"params": seeded_dates((7, 90)[n % 2])})),
+        ("analytics.treatment_frequency", "GET", "/analytics/treatment-frequency", lambda n: (
+            "/analytics/treatment-frequency", {"params": dict(seeded_dates((7, 90)[n % 2]), limit=10)})),
+        ("async.patients.get", "GET", "/async/patients/{patient_id}", lambda n: (f"/async/patients/{any_id(patients)(n)}", {})),
+        ("async.appointments.list", "GET", "/async/appointments/", lambda n: ("/async/appointments/", {"params": {"limit": 100}})),
+        ("cache.stats", "GET", "/cache/stats", lambda n: ("/cache/stats", {})),
+        ("appointments.delete", "DELETE", "/appointments/{appointment_id}", lambda n: (f"/appointments/{from_top(appointments)(n)}", {})),
+        ("treatments.delete", "DELETE", "/treatments/{treatment_id}", lambda n: (f"/treatments/{from_top(treatments)(n % treatments)}", {})),
+        ("doctors.delete", "DELETE", "/doctors/{doctor_id}", lambda n: (f"/doctors/{from_top(doctors)(n % doctors)}", {})),
+        ("patients.delete", "DELETE", "/patients/{patient_id}", lambda n: (f"/patients/{from_top(patients)(n)}", {})),
+    ]
+
+def doctor_update(doctor_id: int):
+    _, name, specialty, phone, email, hours = doctor_row(doctor_id)
+    return {"FullName": name, "Specialty": specialty, "PhoneNumber": phone, "Email": email, "AvailabilityHours": hours or HOURS[0]}
+
+def fresh_appointment(n: int):
+    # Treatment links go to appointments created by the appointments.create scenario (ids past the seed)
+    return _FRESH_IDS[n % len(_FRESH_IDS)] if _FRESH_IDS else 1
+
+_FRESH_IDS = []
+
+# ----------------- Runner -----------------
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def _sql_totals(method: str, route: str):
+    series = metrics.SQL_PER_REQUEST.series.get((method, route))
+    return (series[-2], series[-1]) if series else (0, 0)
+
+async def run_scenario(client, scenario, requests: int, concurrency: int):
+    name, method, route, factory = scenario
+    prepared = [factory(n) for n in range(requests)]  # built up front so generation isn't timed
+    latencies, statuses, queue = [], {}, iter(prepared)
+    statements_before, counted_before = _sql_totals(method, route)
+
+    async def worker():
+        for url, kwargs in queue:
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            await response.aread()
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if name == "appointments.create" and response.status_code == 200:
+                _FRESH_IDS.append(response.json()["AppointmentID"])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    statements_after, counted_after = _sql_totals(method, route)
+    counted = counted_after - counted_before
+    latencies.sort()
+    milliseconds = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        "route": f"{method} {route}",
+        "requests": requests,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput_rps": round(requests / elapsed, 1) if elapsed else None,
+        "p50_ms": milliseconds(percentile(latencies, 0.50)),
+        "p95_ms": milliseconds(percentile(latencies, 0.95)),
+        "p99_ms": milliseconds(percentile(latencies, 0.99)),
+        "mean_ms": milliseconds(statistics.fmean(latencies)) if latencies else None,
+        "sql_per_request": round((statements_after - statements_before) / counted, 2) if counted else None,
+    }
+
+async def run(args, volumes: dict, async_engine, app):
+    rng = random.Random(args.seed)
+    selected = [scenario for scenario in scenarios(volumes, rng, args.batch)
+                if not args.only or any(scenario[0].startswith(prefix) for prefix in args.only)]
+    # Unhandled errors are reported as 500s in the status counts instead of aborting the run
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        for scenario in selected:
+            for n in range(args.warmup):  # warm-up requests reuse late sequence numbers, and are not recorded
+                url, kwargs = scenario[3](args.requests + 1000000 + n)
+                await client.request(scenario[1], url, **kwargs)
+            results[scenario[0]] = await run_scenario(client, scenario, args.requests, args.concurrency)
+            print(f"  {scenario[0]:<32} p50 {results[scenario[0]]['p50_ms']} ms  p99 {results[scenario[0]]['p99_ms']} ms  "
+                  f"{results[scenario[0]]['throughput_rps']} req/s  {results[scenario[0]]['sql_per_request']} SQL/req", flush=True)
+    # Pooled aiosqlite connections each own a thread, which would keep the process alive
+    await async_engine.dispose()
+    return results
+
+# ----------------- Serialization micro-benchmark -----------------
+# Rows per second for one list page, split into loading and encoding, on the path list routes used
+# before (ORM objects, response_model validation, stdlib json) and the one they use now (core rows as
+# dicts from crud, orjson). Runs in-process on the sync engine, without HTTP.
+
+def _response_model_path(adapter: TypeAdapter, objects):
+    """What FastAPI does with a returned list: validate, dump to JSON-able primitives, json.dumps."""
+    content = adapter.dump_python(adapter.validate_python(objects, from_attributes=True), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+def serialization_benchmark(engine, page_size: int, repeat: int):
+    paths = {
+        "patients": (
+            lambda db: db.query(Patient).order_by(Patient.PatientID).limit(page_size).all(),
+            lambda objects: _response_model_path(schemas.PatientList, objects),
+            lambda db: crud.get_patients(db, limit=page_size),
+        ),
+        "appointments": (
+            lambda db: db.query(Appointment).options(selectinload(Appointment.treatments))
+                         .order_by(Appointment.AppointmentDate, Appointment.AppointmentID).limit(page_size).all(),
+            lambda objects: _response_model_path(schemas.AppointmentList, objects),
+            lambda db: crud.get_appointments(db, limit=page_size),
+        ),
+    }
+    results = {}
+    for name, (load_before, encode_before, load_after) in paths.items():
+        for path, load, encode in (("before", load_before, encode_before),
+                                   ("after", load_after, lambda rows: serialization.FastJSONResponse(rows).body)):
+            load_times, encode_times = [], []
+            for _ in range(repeat):
+                with Session(engine) as db:  # a fresh session each time, so no identity-map reuse
+                    started = time.perf_counter()
+                    rows = load(db)
+                    loaded = time.perf_counter()
+                    encode(rows)
+                    load_times.append(loaded - started)
+                    encode_times.append(time.perf_counter() - loaded)
+            load_time, encode_time = statistics.median(load_times), statistics.median(encode_times)
+            results[f"{name}.{path}"] = {
+                "rows": len(rows),
+                "load_rows_per_s": round(len(rows) / load_time),
+                "encode_rows_per_s": round(len(rows) / encode_time),
+                "total_rows_per_s": round(len(rows) / (load_time + encode_time)),
+            }
+            print(f"  {name + '.' + path:<24} load {results[f'{name}.{path}']['load_rows_per_s']:>9} rows/s  "
+                  f"encode {results[f'{name}.{path}']['encode_rows_per_s']:>9} rows/s  "
+                  f"total {results[f'{name}.{path}']['total_rows_per_s']:>9} rows/s", flush=True)
+    return results
+
+def compare(results: dict, baseline: dict):
+    """Relative change of each latency/throughput figure against a saved run (negative latency = faster)."""
+    changes = {}
+    for name, current in results.items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        changes[name] = {}
+        for field in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "sql_per_request"):
+            if previous.get(field) and current.get(field) is not None:
+                changes[name][field] = f"{(current[field] - previous[field]) / previous[field]:+.1%}"
+    return changes
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed a synthetic clinic database and benchmark every API route in-process.")
+    parser.add_argument("--patients", type=int, default=100000)
+    parser.add_argument("--doctors", type=int, default=500)
+    parser.add_argument("--treatments", type=int, default=200)
+    parser.add_argument("--appointments", type=int, default=5000000)
+    parser.add_argument("--links", type=int, default=2, help="treatments linked to each seeded appointment")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight at once")
+    parser.add_argument("--batch", type=int, default=50, help="rows per bulk/import request")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for request parameters")
+    parser.add_argument("--only", nargs="*", help="run only scenarios whose name starts with one of these prefixes")
+    parser.add_argument("--data-dir", default=".benchmark", help="where seeded databases are kept")
+    parser.add_argument("--reseed", action="store_true", help="rebuild the seeded database even if it exists")
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="earlier JSON report to diff this run against")
+    parser.add_argument("--serialization", action="store_true", help="only compare list serialization paths")
+    parser.add_argument("--page-size", type=int, default=1000, help="rows per page for --serialization")
+    parser.add_argument("--group-commit", action="store_true", help="create appointments through the group-commit writer")
+    parser.add_argument("--archive-share", type=float, default=0.0,
+                        help="share of the oldest appointments moved to the archive tables before running (archived ones are read-only)")
+    args = parser.parse_args()
+
+    volumes = {"patients": args.patients, "doctors": args.doctors, "treatments": args.treatments,
+               "appointments": args.appointments, "links": min(args.links, args.treatments)}
+    path = prepare_database(args.data_dir, volumes, reseed=args.reseed)
+    config.APPOINTMENT_GROUP_COMMIT = args.group_commit
+    engine, async_engine, app = bind_app(path)
+    report = {"created": datetime.now().isoformat(timespec="seconds"), "volumes": volumes}
+    if args.archive_share:
+        oldest_kept = min(volumes["appointments"], int(volumes["appointments"] * args.archive_share) + 1)
+        cutoff = appointment_values(oldest_kept, volumes)[2].replace(hour=0, minute=0)
+        with Session(engine) as db:
+            report["archived"] = archive.archive_appointments(db, cutoff)
+        print(f"Archived {report['archived']} appointments dated before {cutoff.isoformat()}")
+    if args.serialization:
+        print(f"Serializing {args.page_size}-row pages from {path}, median of {args.requests} runs")
+        try:
+            report["serialization"] = serialization_benchmark(engine, args.page_size, args.requests)
+        finally:
+            engine.dispose()
+            asyncio.run(async_engine.dispose())
+        results = {}
+    else:
+        print(f"Benchmarking {path} with {args.requests} requests per scenario at concurrency {args.concurrency}")
+        try:
+            results = asyncio.run(run(args, volumes, async_engine, app))
+        finally:
+            engine.dispose()
+        report["settings"] = {"requests": args.requests, "concurrency": args.concurrency, "batch": args.batch, "seed": args.seed,
+                              "group_commit": args.group_commit}
+        report["scenarios"] = results
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            report["compare"] = compare(results, json.load(baseline_file))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(text + "\n")
+        print(f"Report written to {args.output}")
+    else:
+        print(text)
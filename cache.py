@@ -0,0 +1,137 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+import config
+
+# Read-through cache for the doctor and treatment catalogs.
+# These tables change a few times a day but are read on every booking screen,
+# so crud.py serves them from here and clears the cache on every write.
+# Storage is pluggable: MemoryBackend keeps entries in-process, and a shared
+# backend (e.g. Redis) can be dropped in with `set_backend` so all workers
+# see the same entries and invalidations.
+
+_MISSING = object()
+
+class CacheBackend(ABC):
+    """Storage interface for ReadThroughCache. Values must be picklable for shared backends."""
+
+    evictions = 0  # Entries dropped to respect the size bound (if the backend tracks it)
+
+    @abstractmethod
+    def get(self, key, default=_MISSING):
+        """Return the cached value for `key`, or `default` when it is absent or expired."""
+
+    @abstractmethod
+    def set(self, key, value):
+        """Store `value` under `key`."""
+
+    @abstractmethod
+    def clear(self):
+        """Drop every entry."""
+
+    @abstractmethod
+    def __len__(self):
+        """Number of entries currently stored."""
+
+class MemoryBackend(CacheBackend):
+    """Bounded in-process LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, key, default=_MISSING):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class ReadThroughCache:
+    """Named cache that loads missing entries on demand and counts hits and misses.
+
+    Every invalidation bumps a generation counter. A value loaded while an invalidation happened may
+    predate the write behind it, so it is returned to its caller but not stored.
+    """
+
+    def __init__(self, name: str, backend: CacheBackend):
+        self.name = name
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._lock = threading.Lock()  # Guards the counters, which /metrics reads from other threads, and the generation
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for `key`, calling `loader()` and caching its result on a miss."""
+        value = self.backend.get(key, _MISSING)
+        hit = value is not _MISSING
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            generation = self.generation
+        if hit:
+            return value
+        value = loader()
+        with self._lock:
+            if generation == self.generation:
+                self.backend.set(key, value)
+        return value
+
+    def invalidate(self):
+        """Drop every entry; called after any write to the underlying table."""
+        with self._lock:
+            self.generation += 1
+            self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "evictions": self.backend.evictions,
+            "size": len(self.backend),
+        }
+
+def _default_backend():
+    return MemoryBackend(max_entries=config.CACHE_MAX_ENTRIES, ttl=config.CACHE_TTL_SECONDS)
+
+# Catalog caches used by crud.py
+doctor_cache = ReadThroughCache("doctors", _default_backend())
+treatment_cache = ReadThroughCache("treatments", _default_backend())
+
+CACHES = {cache.name: cache for cache in (doctor_cache, treatment_cache)}
+
+def set_backend(name: str, backend: CacheBackend):
+    """Replace the storage of a named cache, e.g. with a shared backend in multi-worker deployments."""
+    CACHES[name].backend = backend
+
+def stats():
+    """Hit/miss/eviction counters for every cache, keyed by cache name."""
+    return {name: cache.stats() for name, cache in CACHES.items()}
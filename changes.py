@@ -0,0 +1,145 @@
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+import config
+from database import async_session
+from models import AppointmentChange
+
+# Server-Sent Events change feed for appointments (GET /appointments/changes).
+# crud.py adds an AppointmentChanges row for every appointment it creates, updates or deletes and
+# for every change to an appointment's treatment links, in the same transaction as the write.
+# Each open stream polls that outbox every CHANGE_FEED_POLL_SECONDS with an index range scan past
+# the last ChangeID it sent, so a dashboard is pushed every change for one cheap query per second
+# instead of re-reading appointment lists, and changes made by any worker reach every stream.
+#
+# Every event carries its ChangeID as the SSE `id`, so a reconnecting EventSource sends it back in
+# Last-Event-ID and resumes exactly where it stopped, across restarts. Events older than
+# CHANGE_FEED_RETENTION_DAYS are pruned by `python changes.py`; a client resuming from before the
+# oldest retained event first gets a "reset" event telling it to reload its state.
+#
+# Event data is the outbox row as JSON; its Kind is one of created, updated, deleted, treatments
+# (the linked treatments changed) or moved (the appointment left DoctorID's schedule, because it
+# was given another doctor or the doctor was deleted). Clients fetch the current appointment with
+# GET /appointments/{id}.
+#
+# ChangeIDs are handed out when a write inserts its events, not when it commits, so on MySQL or
+# PostgreSQL a later ID can become visible before an earlier one whose transaction is still open.
+# A stream therefore never reads past the first missing ChangeID: it waits for the ID to commit,
+# and only skips it once it has been missing for CHANGE_FEED_GAP_SECONDS (a rolled-back write, or
+# an ID the database skipped). On SQLite writers are serialized, so such gaps are rollbacks only.
+#
+# Usage: python changes.py [--older-than-days 7]
+
+# Reconnection delay, in milliseconds, that EventSource clients are told to use
+RETRY_MS = 3000
+
+def _format(change) -> str:
+    data = {
+        "ChangeID": change.ChangeID,
+        "Kind": change.Kind,
+        "AppointmentID": change.AppointmentID,
+        "DoctorID": change.DoctorID,
+        "PatientID": change.PatientID,
+        "AppointmentDate": change.AppointmentDate.isoformat(),
+        "ChangedAt": change.ChangedAt.isoformat()
+    }
+    return f"id: {change.ChangeID}\ndata: {json.dumps(data)}\n\n"
+
+def _settled_through(change_id: int, ids: list, gaps: dict) -> int:
+    """The highest of `ids` (ascending ChangeIDs after `change_id`) that every earlier ChangeID is settled below.
+
+    A missing ChangeID is settled once it has been missing for CHANGE_FEED_GAP_SECONDS; `gaps` maps
+    each gap's first missing ID to when the stream first saw it, and is updated in place.
+    """
+    now = time.monotonic()
+    settled = change_id
+    for next_id in ids:
+        if next_id > settled + 1 and now - gaps.setdefault(settled + 1, now) < config.CHANGE_FEED_GAP_SECONDS:
+            break
+        settled = next_id
+    for gap in [gap for gap in gaps if gap <= settled]:
+        del gaps[gap]
+    return settled
+
+async def _changes_after(change_id: int, gaps: dict, doctor_id: int = None):
+    """Events after `change_id` up to the first unsettled gap (see _settled_through), oldest first.
+
+    Returns (events, ChangeID read through, whether more IDs are waiting). At most
+    CHANGE_FEED_BATCH_SIZE IDs are considered per call. Each poll uses its own short session, so an
+    idle stream holds no connection (and, on SQLite, no read snapshot that would hide newer commits).
+    """
+    change_id_column = AppointmentChange.ChangeID
+    async with async_session() as db:
+        ids = (await db.scalars(
+            select(change_id_column).where(change_id_column > change_id).order_by(change_id_column).limit(config.CHANGE_FEED_BATCH_SIZE)
+        )).all()
+        settled = _settled_through(change_id, ids, gaps)
+        if settled == change_id:
+            return [], change_id, False
+        query = select(*AppointmentChange.__table__.c).where(change_id_column > change_id, change_id_column <= settled)
+        if doctor_id is not None:
+            query = query.where(AppointmentChange.DoctorID == doctor_id)
+        changes = (await db.execute(query.order_by(change_id_column))).all()
+    return changes, settled, settled == ids[-1] and len(ids) == config.CHANGE_FEED_BATCH_SIZE
+
+async def stream(last_event_id: int = None, doctor_id: int = None):
+    """SSE frames for the events after `last_event_id` (only new ones when None), optionally of one doctor.
+
+    Runs until the client disconnects, when StreamingResponse cancels it.
+    """
+    async with async_session() as db:
+        if last_event_id is None:
+            last_event_id = await db.scalar(select(func.max(AppointmentChange.ChangeID))) or 0
+            start = f"id: {last_event_id}\n"  # An event without data only sets the client's Last-Event-ID
+        else:
+            oldest = await db.scalar(select(func.min(AppointmentChange.ChangeID)))
+            start = ""
+            if oldest is not None and last_event_id < oldest - 1:
+                last_event_id = oldest - 1
+                start = f"id: {last_event_id}\ndata: {json.dumps({'Kind': 'reset'})}\n"
+    yield f"retry: {RETRY_MS}\n{start}\n"
+
+    idle = 0.0
+    gaps = {}
+    while True:
+        changes, last_event_id, more = await _changes_after(last_event_id, gaps, doctor_id)
+        for change in changes:
+            yield _format(change)
+        if changes:
+            idle = 0.0
+        if more:
+            continue  # More are waiting; catch up without sleeping
+        if not changes and idle >= config.CHANGE_FEED_HEARTBEAT_SECONDS:
+            yield ": keepalive\n\n"
+            idle = 0.0
+        await asyncio.sleep(config.CHANGE_FEED_POLL_SECONDS)
+        idle += config.CHANGE_FEED_POLL_SECONDS
+
+def prune_changes(db: Session, older_than_days: int = config.CHANGE_FEED_RETENTION_DAYS):
+    """Delete events older than `older_than_days` and commit; returns how many were deleted.
+
+    The newest event is always kept, so a client resuming from a pruned ID can still be told to reset.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    newest = db.scalar(select(func.max(AppointmentChange.ChangeID)))
+    if newest is None:
+        return 0
+    table = AppointmentChange.__table__
+    deleted = db.execute(table.delete().where(table.c.ChangedAt < cutoff, table.c.ChangeID < newest)).rowcount
+    db.commit()
+    return deleted
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Delete old events from the appointment change feed.")
+    parser.add_argument("--older-than-days", type=int, default=config.CHANGE_FEED_RETENTION_DAYS, help="delete events older than this")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        deleted = prune_changes(db, args.older_than_days)
+    print(f"Deleted {deleted} change feed events older than {args.older_than_days} days")
@@ -42,7 +42,8 @@ CREATE TABLE Doctors (
     Email VARCHAR(100) UNIQUE,
     AvailabilityHours VARCHAR(100),
     CreatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    UpdatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    UpdatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX ix_Doctors_Specialty (Specialty)
 );
 
 -- ----------------------
@@ -66,6 +67,9 @@ CREATE TABLE Appointments (
     Status ENUM('Scheduled', 'Completed', 'Cancelled') DEFAULT 'Scheduled',
     CreatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     UpdatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX ix_Appointments_AppointmentDate (AppointmentDate),
+    INDEX ix_Appointments_DoctorID_AppointmentDate (DoctorID, AppointmentDate),
+    INDEX ix_Appointments_PatientID_AppointmentDate (PatientID, AppointmentDate),
     FOREIGN KEY (PatientID) REFERENCES Patients(PatientID) ON DELETE CASCADE,
     FOREIGN KEY (DoctorID) REFERENCES Doctors(DoctorID) ON DELETE SET NULL
 );
@@ -0,0 +1,98 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response
+
+# HTTP conditional requests for records with an UpdatedAt column (patients, doctors, appointments).
+# A record's ETag is its ID plus UpdatedAt to the microsecond, so it can be built from a one-column
+# lookup and turned back into an UpdatedAt for If-Match. A list page's ETag hashes the (ID, UpdatedAt)
+# pairs on the page, which changes when any row on it is edited, added or removed. Projections
+# (`?fields=`) are different representations of the same record, so their tags carry a suffix.
+# Appointments embed their treatments, which are edited without touching the appointment row, so
+# their tags add a digest of the embedded treatments after UpdatedAt (see crud.treatments_version).
+# UpdatedAt is written as naive UTC (datetime.utcnow()), which is what Last-Modified reports.
+
+_EPOCH = datetime(1970, 1, 1)
+
+def _micros(updated_at: datetime):
+    return (updated_at.replace(tzinfo=None) - _EPOCH) // timedelta(microseconds=1)
+
+def _variant(fields):
+    return hashlib.sha1(",".join(sorted(fields)).encode()).hexdigest()[:8]
+
+def content_digest(values):
+    """Short hex digest of a sequence of values, for content that has no UpdatedAt of its own."""
+    return hashlib.sha1(repr(list(values)).encode()).hexdigest()[:12]
+
+def _version(row_id: int, updated_at: datetime, extra: str = None):
+    return f"{row_id}-{_micros(updated_at)}" + ("" if extra is None else f"-{extra}")
+
+def entity_tag(row_id: int, updated_at: datetime, fields: list = None, extra: str = None):
+    """Strong ETag of one record, e.g. "42-1718000000123456" (plus "-<extra>" and "-<hash>" for a projection)."""
+    suffix = "" if fields is None else f"-{_variant(fields)}"
+    return f'"{_version(row_id, updated_at, extra)}{suffix}"'
+
+def collection_tag(versions, fields: list = None):
+    """Strong ETag of a list page from its (ID, UpdatedAt) or (ID, UpdatedAt, extra) tuples, in page order."""
+    digest = hashlib.sha1(b"" if fields is None else _variant(fields).encode())
+    for version in versions:
+        digest.update(f"{_version(*version)},".encode())
+    return f'"{digest.hexdigest()}"'
+
+def http_date(updated_at: datetime):
+    return format_datetime(updated_at.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+def _tags(header: str):
+    """The entity tags listed in an If-Match / If-None-Match header, without W/ prefixes."""
+    return [tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()]
+
+def matched_versions(header: str, row_id: int):
+    """Decode an If-Match header into the UpdatedAt values it accepts for this record.
+
+    Returns None for "*" (any current version) and a possibly empty list otherwise;
+    tags that belong to another record or are not ours match nothing.
+    """
+    tags = _tags(header)
+    if "*" in tags:
+        return None
+    versions = []
+    for tag in tags:
+        tagged_id, _, version = tag.strip('"').partition("-")
+        micros = version.partition("-")[0]
+        if tagged_id == str(row_id) and micros.isdigit():
+            versions.append(_EPOCH + timedelta(microseconds=int(micros)))
+    return versions
+
+def has_if_none_match(request: Request):
+    """Whether a GET carries If-None-Match, the only validator list pages answer with a 304."""
+    return request.headers.get("if-none-match") is not None
+
+def is_not_modified(request: Request, etag: str, updated_at: datetime = None):
+    """Whether a GET's If-None-Match (or, without one, If-Modified-Since) says the client's copy is current."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = _tags(if_none_match)
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or updated_at is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates have whole seconds
+    return updated_at.replace(tzinfo=timezone.utc, microsecond=0) <= since
+
+def set_validators(response: Response, etag: str, updated_at: datetime = None):
+    """Attach ETag (and Last-Modified for single records) to a response."""
+    response.headers["ETag"] = etag
+    if updated_at is not None:
+        response.headers["Last-Modified"] = http_date(updated_at)
+
+def not_modified(etag: str, updated_at: datetime = None):
+    """An empty 304 carrying the same validators as the full response."""
+    response = Response(status_code=304)
+    set_validators(response, etag, updated_at)
+    return response
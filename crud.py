@@ -1,8 +1,304 @@
-from sqlalchemy.orm import Session
-from fastapi import HTTPException
-from datetime import datetime
-from models import Patient, Doctor, Treatment, Appointment, appointment_treatment_table
+import base64
+import heapq
+import binascii
+import bisect
+import json
+from itertools import islice
+from pydantic import ValidationError
+from sqlalchemy import and_, case, distinct, exists, false, func, literal, or_, select, union_all
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session, selectinload
+from fastapi import HTTPException, Response
+from datetime import date, datetime, time, timedelta
+import config
+import availability
+import search
+import archive
+import conditional
+import schemas
+from cache import doctor_cache, treatment_cache
+from models import Patient, Doctor, Treatment, Appointment, appointment_treatment_table, UpcomingAppointmentsSummary, PatientSearchToken
+from models import AnalyticsDirtyDay, AppointmentArchive, AppointmentChange
 from schemas import PatientCreate, DoctorCreate, TreatmentCreate, AppointmentCreate, PatientUpdate, DoctorUpdate, TreatmentUpdate, AppointmentUpdate
+from schemas import BulkCreateResult, BulkRowError, AvailabilitySlot, DoctorAvailability
+
+# Keyset Pagination Helpers
+
+# Response header carrying the opaque cursor for the next page of a list endpoint.
+# Clients pass it back as `?cursor=` to seek past the previous page instead of using `skip`.
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(*values):
+    """Encode the sort key of the last row on a page as an opaque cursor string."""
+    key = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(key, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    """Decode a cursor produced by encode_cursor back into its list of key values."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(key, list):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key
+
+def next_cursor(rows, limit: int, *attrs):
+    """Return the cursor for the page after `rows`, or None when this was the last page."""
+    if limit <= 0 or len(rows) < limit:
+        return None
+    last = rows[-1]
+    if isinstance(last, dict):  # a projected row (see Sparse Fieldsets)
+        return encode_cursor(*(last[attr] for attr in attrs))
+    return encode_cursor(*(getattr(last, attr) for attr in attrs))
+
+def set_next_cursor(response: Response, cursor: str = None):
+    """Send the cursor of the next page in NEXT_CURSOR_HEADER (nothing on the last page)."""
+    if cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+
+def _seek_by_id(query, id_column, skip: int, limit: int, cursor: str = None):
+    """Order a query by its primary key and either seek past the cursor or fall back to offset."""
+    query = query.order_by(id_column)
+    if cursor is None:
+        return query.offset(skip).limit(limit)
+    key = decode_cursor(cursor)
+    if len(key) != 1 or not isinstance(key[0], int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return query.filter(id_column > key[0]).limit(limit)
+
+def _seek_by_date(query, date_column, id_column, skip: int, limit: int, cursor: str = None):
+    """Order a query by (date, ID) and either seek past the cursor or fall back to offset."""
+    query = query.order_by(date_column, id_column)
+    if cursor is None:
+        return query.offset(skip).limit(limit)
+
+    key = decode_cursor(cursor)
+    try:
+        last_date, last_id = datetime.fromisoformat(key[0]), int(key[1])
+    except (IndexError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Expanded form of (date, ID) > (last_date, last_id) so that
+    # every backend can turn it into a range scan on the date index
+    return query.filter(or_(
+        date_column > last_date,
+        and_(date_column == last_date, id_column > last_id)
+    )).limit(limit)
+
+# Sparse Fieldsets
+# Read functions take an optional `fields` list (from `?fields=`). Patient and appointment lists
+# always select plain columns with a core SELECT and return dicts (no ORM objects to build or
+# validate), restricted to `fields` when given; the cached doctor and treatment catalogs are
+# projected in memory. The primary key and the columns a list is ordered by are always included,
+# so cursors and client-side de-duplication keep working.
+
+def _check_fields(schema, fields: list):
+    unknown = [name for name in fields if name not in schema.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+def _projection(model, schema, fields: list, keys: tuple):
+    """Columns of `model` for `fields` (every field of `schema` when None) plus `keys`, in table order."""
+    if fields is None:
+        fields = list(schema.model_fields)
+    _check_fields(schema, fields)
+    wanted = set(fields) | set(keys)
+    return [column for column in model.__table__.c if column.key in wanted]
+
+def _project_rows(rows):
+    return [dict(row._mapping) for row in rows]
+
+def _project_models(items, fields: list, keys: tuple):
+    """Project cached schema objects (doctors, treatments) to dicts of `fields` plus `keys`."""
+    include = set(fields) | set(keys)
+    if isinstance(items, list):
+        return [item.model_dump(include=include) for item in items]
+    return items.model_dump(include=include)
+
+# Record Versions
+# UpdatedAt doubles as the version of a patient, doctor or appointment: conditional.py builds ETags
+# from it, and writes sent with If-Match only apply while it still holds one of the tagged values.
+# Treatment edits leave the appointments that embed them alone, so an appointment representation
+# that includes its treatments is versioned by UpdatedAt plus a digest of those treatments.
+
+def _version_matches(model, versions: list):
+    """UpdatedAt equals one of `versions`, give or take the sub-microsecond formatting of the backend.
+
+    A one-microsecond window on each side matches the same instant whether the column stores
+    microseconds, whole seconds or (on SQLite) text with or without a fractional part.
+    """
+    step = timedelta(microseconds=1)
+    return or_(false(), *(
+        and_(model.UpdatedAt > version - step, model.UpdatedAt < version + step) for version in versions
+    ))
+
+def _precondition_failed(db: Session, id_column, row_id: int, detail: str):
+    """After a conditional write matched nothing: 412 if the row exists (its version moved on), else 404."""
+    db.rollback()
+    if db.execute(select(id_column).where(id_column == row_id)).first() is not None:
+        raise HTTPException(status_code=412, detail="Precondition Failed: the record was modified")
+    raise HTTPException(status_code=404, detail=detail)
+
+def _embeds_treatments(fields: list = None):
+    return fields is None or "treatments" in fields
+
+def treatments_version(treatments):
+    """Digest of the treatments embedded in an appointment (dicts or Treatment objects), in any order."""
+    values = sorted(
+        (treatment.TreatmentID, treatment.Name, treatment.Description) if isinstance(treatment, Treatment)
+        else (treatment["TreatmentID"], treatment["Name"], treatment["Description"])
+        for treatment in treatments
+    )
+    return conditional.content_digest(values)
+
+def row_versions(rows: list, id_name: str):
+    """(ID, UpdatedAt) of fetched list rows, plus the treatments version of appointments that embed them."""
+    return [
+        (row[id_name], row["UpdatedAt"]) + ((treatments_version(row["treatments"]),) if "treatments" in row else ())
+        for row in rows
+    ]
+
+def get_version(db: Session, model, row_id: int, detail: str):
+    """UpdatedAt of one record, read on its own so an unchanged record can be answered with a 304."""
+    id_column = model.__table__.primary_key.columns[0]
+    updated_at = db.execute(select(model.UpdatedAt).where(id_column == row_id)).scalar_one_or_none()
+    if updated_at is None:
+        raise HTTPException(status_code=404, detail=detail)
+    return updated_at
+
+def get_appointment_version(db: Session, appointment_id: int, fields: list = None):
+    """(UpdatedAt, treatments version or None) of a hot or archived appointment, in one query per table.
+
+    The treatments version is only read when the representation (`fields`) includes the treatments.
+    """
+    for model in archive.appointment_models(db):
+        table, link = model.__table__, archive.LINKS[model]
+        if _embeds_treatments(fields):
+            query = (
+                select(table.c.UpdatedAt, Treatment.TreatmentID, Treatment.Name, Treatment.Description)
+                .select_from(table)
+                .outerjoin(link, link.c.AppointmentID == table.c.AppointmentID)
+                .outerjoin(Treatment, Treatment.TreatmentID == link.c.TreatmentID)
+            )
+        else:
+            query = select(table.c.UpdatedAt)
+        rows = db.execute(query.where(table.c.AppointmentID == appointment_id)).all()
+        if rows:
+            if not _embeds_treatments(fields):
+                return rows[0].UpdatedAt, None
+            treatments = [row._asdict() for row in rows if row.TreatmentID is not None]
+            return rows[0].UpdatedAt, treatments_version(treatments)
+    raise HTTPException(status_code=404, detail="Appointment not found")
+
+def get_page_versions(db: Session, model, skip: int = 0, limit: int = 100, cursor: str = None, start: datetime = None,
+                      end: datetime = None, fields: list = None):
+    """Versions of the rows on one list page (see row_versions), paginated exactly like the list route."""
+    if model is Appointment:
+        # Same hot/archive merge as the list itself; treatments only when the representation embeds them
+        versioned = ["UpdatedAt", "treatments"] if _embeds_treatments(fields) else ["UpdatedAt"]
+        appointments = get_appointments(db, skip=skip, limit=limit, cursor=cursor, fields=versioned, start=start, end=end)
+        return row_versions(appointments, "AppointmentID")
+    id_column = model.__table__.primary_key.columns[0]
+    query = _seek_by_id(db.query(id_column, model.UpdatedAt), id_column, skip, limit, cursor)
+    return [tuple(row) for row in query.all()]
+
+def _touch_appointments(db: Session, where):
+    """Bump UpdatedAt of the appointments matching `where`, whose treatment links changed, and publish it (no commit)."""
+    db.execute(Appointment.__table__.update().where(where).values(UpdatedAt=datetime.utcnow()))
+    _record_changes(db, "treatments", where)
+
+# Single-Statement Write Helpers
+
+def _changes(update) -> dict:
+    """Fields provided in an update request body (empty values leave the column unchanged)."""
+    return {var: value for var, value in vars(update).items() if value}
+
+def _update_returning(db: Session, model, id_column, row_id: int, values: dict, detail: str, versions: list = None):
+    """Update one row and return its new state without committing.
+
+    A single UPDATE ... RETURNING where the dialect supports it; otherwise an UPDATE whose
+    rowcount decides the 404, followed by a SELECT of the updated row. With `versions`
+    (from If-Match) the row's UpdatedAt must be one of them, or the update raises 412.
+    """
+    table = model.__table__
+    where = id_column == row_id
+    if versions is not None:
+        where = and_(where, _version_matches(model, versions))
+    if not values:
+        row = db.execute(select(*table.c).where(where)).first()
+    elif db.get_bind().dialect.update_returning:
+        row = db.execute(table.update().where(where).values(values).returning(*table.c)).first()
+    elif db.execute(table.update().where(where).values(values)).rowcount:
+        row = db.execute(select(*table.c).where(id_column == row_id)).first()
+    else:
+        row = None
+    if row is None:
+        if versions is not None:
+            _precondition_failed(db, id_column, row_id, detail)
+        db.rollback()
+        raise HTTPException(status_code=404, detail=detail)
+    return row
+
+def _delete_one(db: Session, model, id_column, row_id: int, detail: str, versions: list = None):
+    """Delete one row with a single DELETE, raising 404 when it matched nothing.
+
+    Dependent rows are removed by the ON DELETE CASCADE / SET NULL foreign keys.
+    With `versions` (from If-Match) the row's UpdatedAt must be one of them, or it raises 412.
+    """
+    where = id_column == row_id
+    if versions is not None:
+        where = and_(where, _version_matches(model, versions))
+    if db.execute(model.__table__.delete().where(where)).rowcount == 0:
+        if versions is not None:
+            _precondition_failed(db, id_column, row_id, detail)
+        db.rollback()
+        raise HTTPException(status_code=404, detail=detail)
+    db.commit()
+
+def _insert_ignoring_duplicates(db: Session, table, columns: list, query):
+    """INSERT ... SELECT that skips rows whose primary key already exists; returns the rows inserted.
+
+    ON CONFLICT DO NOTHING on SQLite/PostgreSQL, a no-op ON DUPLICATE KEY UPDATE on MySQL,
+    and a NOT EXISTS guard on the primary key elsewhere.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql.insert(table).from_select(columns, query)
+        key = table.primary_key.columns[0].name
+        stmt = stmt.on_duplicate_key_update({key: stmt.inserted[key]})
+    elif dialect in ("sqlite", "postgresql"):
+        stmt = (sqlite if dialect == "sqlite" else postgresql).insert(table).from_select(columns, query).on_conflict_do_nothing()
+    else:
+        selected = query.subquery()
+        stmt = table.insert().from_select(columns, select(*selected.c).where(~exists().where(*(
+            table.c[column] == selected.c[position] for position, column in enumerate(columns)
+            if table.c[column].primary_key
+        ))))
+    return db.execute(stmt).rowcount
+
+def _mark_days_dirty(db: Session, where, model=Appointment):
+    """Flag the days of the appointments (or archived ones) matching `where` for re-aggregation by analytics.py (no commit)."""
+    _insert_ignoring_duplicates(db, AnalyticsDirtyDay.__table__, ["Day"],
+                                select(func.date(model.AppointmentDate)).where(where).distinct())
+
+# Appointment Change Feed
+# Appointment and treatment-link writes add their events to the AppointmentChanges outbox in the
+# same transaction, with INSERT ... SELECT from the rows they touch; changes.py streams them.
+
+CHANGE_COLUMNS = ["Kind", "AppointmentID", "DoctorID", "PatientID", "AppointmentDate", "ChangedAt"]
+
+def _record_changes(db: Session, kind: str, where, model=Appointment):
+    """Add a `kind` event to the change feed for each appointment (or archived one) matching `where` (no commit)."""
+    table = model.__table__
+    query = select(
+        literal(kind), table.c.AppointmentID, table.c.DoctorID, table.c.PatientID, table.c.AppointmentDate,
+        literal(datetime.utcnow(), AppointmentChange.ChangedAt.type)
+    ).where(where)
+    db.execute(AppointmentChange.__table__.insert().from_select(CHANGE_COLUMNS, query))
 
 # Patient CRUD Operations
 
@@ -18,48 +314,150 @@ def create_patient(db: Session, patient: PatientCreate):
         UpdatedAt=datetime.utcnow()
     )
     db.add(db_patient)
+    db.flush()
+    _index_patients(db, [(db_patient.PatientID, db_patient.FullName, db_patient.PhoneNumber, db_patient.Email)])
     db.commit()
     db.refresh(db_patient)
     return db_patient
 
-def get_patient(db: Session, patient_id: int):
-    """Fetch a single patient by ID."""
-    db_patient = db.query(Patient).filter(Patient.PatientID == patient_id).first()
+def get_patient(db: Session, patient_id: int, fields: list = None):
+    """Fetch a single patient by ID, optionally only the given fields."""
+    entities = (Patient,) if fields is None else _projection(Patient, schemas.Patient, fields, ("PatientID",))
+    db_patient = db.query(*entities).filter(Patient.PatientID == patient_id).first()
     if db_patient is None:
         raise HTTPException(status_code=404, detail="Patient not found")
-    return db_patient
+    return db_patient if fields is None else dict(db_patient._mapping)
 
-def get_patients(db: Session, skip: int = 0, limit: int = 100):
-    """Fetch all patients, with optional pagination."""
-    return db.query(Patient).offset(skip).limit(limit).all()
+def get_patients(db: Session, skip: int = 0, limit: int = 100, cursor: str = None, fields: list = None):
+    """Fetch patients as dicts ordered by ID, paginated by offset or by a keyset cursor, optionally only the given fields."""
+    columns = _projection(Patient, schemas.Patient, fields, ("PatientID",))
+    return _project_rows(_seek_by_id(db.query(*columns), Patient.PatientID, skip, limit, cursor).all())
 
-def update_patient(db: Session, patient_id: int, patient: PatientUpdate):
+def update_patient(db: Session, patient_id: int, patient: PatientUpdate, versions: list = None):
     """Update an existing patient's details by ID."""
-    db_patient = db.query(Patient).filter(Patient.PatientID == patient_id).first()
-    if db_patient is None:
-        raise HTTPException(status_code=404, detail="Patient not found")
-    
-    # Update the fields provided in the request body
-    for var, value in vars(patient).items():
-        setattr(db_patient, var, value) if value else None
-    
-    # Set the UpdatedAt timestamp to current time
-    db_patient.UpdatedAt = datetime.utcnow()
-    
+    values = _changes(patient)
+    values["UpdatedAt"] = datetime.utcnow()
+    db_patient = _update_returning(db, Patient, Patient.PatientID, patient_id, values, "Patient not found", versions)
+    if "FullName" in values:
+        sync_upcoming_names(db, Patient, [patient_id])
+    if values.keys() & {"FullName", "PhoneNumber", "Email"}:
+        _unindex_patients(db, PatientSearchToken.PatientID == patient_id)
+        _index_patients(db, [(patient_id, db_patient.FullName, db_patient.PhoneNumber, db_patient.Email)])
     db.commit()
-    db.refresh(db_patient)
     return db_patient
 
-def delete_patient(db: Session, patient_id: int):
+def delete_patient(db: Session, patient_id: int, versions: list = None):
     """Delete a patient record by ID."""
-    db_patient = db.query(Patient).filter(Patient.PatientID == patient_id).first()
-    if db_patient is None:
-        raise HTTPException(status_code=404, detail="Patient not found")
-    
-    db.delete(db_patient)
-    db.commit()
+    # Their appointments go with them (ON DELETE CASCADE), which changes those days' analytics
+    for model in (Appointment, AppointmentArchive):
+        _mark_days_dirty(db, model.PatientID == patient_id, model)
+        _record_changes(db, "deleted", model.PatientID == patient_id, model)
+    _delete_one(db, Patient, Patient.PatientID, patient_id, "Patient not found", versions)
     return {"message": "Patient deleted successfully"}
 
+# Patient Search
+# PatientSearchTokens maps prefix-searchable tokens (name words, phone digits, email) to patients.
+# Patient writes re-index the patients they touch; deletes cascade through the foreign key.
+
+# Patients indexed per transaction when building the index for an existing table
+SEARCH_BACKFILL_BATCH_SIZE = 5000
+
+def _index_patients(db: Session, patients):
+    """Insert the search tokens of (PatientID, FullName, PhoneNumber, Email) rows in one executemany (no commit)."""
+    rows = [
+        {"Token": token, "PatientID": patient_id}
+        for patient_id, full_name, phone_number, email in patients
+        for token in search.patient_tokens(full_name, phone_number, email)
+    ]
+    if rows:
+        db.execute(PatientSearchToken.__table__.insert(), rows)
+
+def _unindex_patients(db: Session, where):
+    """Delete the search tokens matching `where` (no commit)."""
+    db.execute(PatientSearchToken.__table__.delete().where(where))
+
+def reindex_patients(db: Session, where):
+    """Rebuild the search tokens of the patients matching `where`, e.g. after an upsert (no commit)."""
+    _unindex_patients(db, PatientSearchToken.PatientID.in_(select(Patient.PatientID).where(where)))
+    _index_patients(db, db.execute(
+        select(Patient.PatientID, Patient.FullName, Patient.PhoneNumber, Patient.Email).where(where)
+    ).all())
+
+def _index_inserted_patients(db: Session, patients: list, ids: list):
+    """Index a chunk of newly inserted patients (bulk create)."""
+    if ids:
+        _index_patients(db, [
+            (patient_id, values["FullName"], values["PhoneNumber"], values["Email"])
+            for patient_id, values in zip(ids, patients)
+        ])
+    else:
+        # Without RETURNING the new IDs are unknown; PhoneNumber is unique, so look them up by it
+        reindex_patients(db, Patient.PhoneNumber.in_([values["PhoneNumber"] for values in patients]))
+
+def backfill_patient_search(db: Session, batch_size: int = SEARCH_BACKFILL_BATCH_SIZE):
+    """Index every patient when the search index is empty, e.g. the first time the table is created."""
+    if db.query(PatientSearchToken.PatientID).first() is not None:
+        return
+    last_id = 0
+    while True:
+        patients = db.execute(
+            select(Patient.PatientID, Patient.FullName, Patient.PhoneNumber, Patient.Email)
+            .where(Patient.PatientID > last_id).order_by(Patient.PatientID).limit(batch_size)
+        ).all()
+        if not patients:
+            break
+        _index_patients(db, patients)
+        db.commit()
+        last_id = patients[-1].PatientID
+
+def search_patients(db: Session, q: str, skip: int = 0, limit: int = 100, cursor: str = None, fields: list = None):
+    """Find patients whose name words, phone digits or email start with every term of `q`.
+
+    Each term is a range scan on the token index; patients matching all terms are ranked by how
+    many terms matched a whole token, then by ID. Returns (patient dicts, cursor of the next page or None).
+    """
+    terms = search.query_terms(q)
+    if not terms:
+        return [], None
+
+    tokens = PatientSearchToken.__table__
+    per_term = [
+        select(
+            tokens.c.PatientID,
+            literal(position).label("term"),
+            case((tokens.c.Token == term, 1), else_=0).label("exact")
+        ).where(tokens.c.Token >= term, tokens.c.Token < search.prefix_end(term))
+        for position, term in enumerate(terms)
+    ]
+    matches = (union_all(*per_term) if len(per_term) > 1 else per_term[0]).subquery()
+    # Score: the number of terms that matched a whole token (a full name word, phone number or email)
+    scored = (
+        select(matches.c.PatientID, func.count(distinct(case((matches.c.exact == 1, matches.c.term)))).label("score"))
+        .group_by(matches.c.PatientID)
+        .having(func.count(distinct(matches.c.term)) == len(terms))
+        .subquery()
+    )
+
+    columns = _projection(Patient, schemas.Patient, fields, ("PatientID",))
+    query = db.query(*columns, scored.c.score).join(scored, scored.c.PatientID == Patient.PatientID)
+    query = query.order_by(scored.c.score.desc(), Patient.PatientID)
+    if cursor is None:
+        query = query.offset(skip)
+    else:
+        key = decode_cursor(cursor)
+        try:
+            last_score, last_id = int(key[0]), int(key[1])
+        except (IndexError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(or_(
+            scored.c.score < last_score,
+            and_(scored.c.score == last_score, Patient.PatientID > last_id)
+        ))
+    rows = query.limit(limit).all()
+
+    page_cursor = encode_cursor(rows[-1].score, rows[-1].PatientID) if limit > 0 and len(rows) == limit else None
+    return [{key: value for key, value in row._mapping.items() if key != "score"} for row in rows], page_cursor
+
 # Doctor CRUD Operations
 
 def create_doctor(db: Session, doctor: DoctorCreate):
@@ -69,50 +467,58 @@ def create_doctor(db: Session, doctor: DoctorCreate):
         Specialty=doctor.Specialty,
         PhoneNumber=doctor.PhoneNumber,
         Email=doctor.Email,
+        AvailabilityHours=doctor.AvailabilityHours,
         CreatedAt=datetime.utcnow(),
         UpdatedAt=datetime.utcnow()
     )
     db.add(db_doctor)
     db.commit()
+    doctor_cache.invalidate()
     db.refresh(db_doctor)
     return db_doctor
 
-def get_doctor(db: Session, doctor_id: int):
-    """Fetch a single doctor by ID."""
-    db_doctor = db.query(Doctor).filter(Doctor.DoctorID == doctor_id).first()
-    if db_doctor is None:
-        raise HTTPException(status_code=404, detail="Doctor not found")
-    return db_doctor
+def get_doctor(db: Session, doctor_id: int, fields: list = None):
+    """Fetch a single doctor by ID (served from the catalog cache)."""
+    def load():
+        db_doctor = db.query(Doctor).filter(Doctor.DoctorID == doctor_id).first()
+        if db_doctor is None:
+            raise HTTPException(status_code=404, detail="Doctor not found")
+        return schemas.Doctor.model_validate(db_doctor)
+    cached = doctor_cache.get_or_load(("doctor", doctor_id), load)
+    if fields is None:
+        return cached
+    _check_fields(schemas.Doctor, fields)
+    return _project_models(cached, fields, ("DoctorID",))
 
-def get_doctors(db: Session, skip: int = 0, limit: int = 100):
-    """Fetch all doctors, with optional pagination."""
-    return db.query(Doctor).offset(skip).limit(limit).all()
+def get_doctors(db: Session, skip: int = 0, limit: int = 100, cursor: str = None, fields: list = None):
+    """Fetch doctors ordered by ID, paginated by offset or by a keyset cursor (served from the catalog cache)."""
+    def load():
+        doctors = _seek_by_id(db.query(Doctor), Doctor.DoctorID, skip, limit, cursor).all()
+        return [schemas.Doctor.model_validate(db_doctor) for db_doctor in doctors]
+    cached = doctor_cache.get_or_load(("doctors", skip, limit, cursor), load)
+    if fields is None:
+        return cached
+    _check_fields(schemas.Doctor, fields)
+    return _project_models(cached, fields, ("DoctorID",))
 
-def update_doctor(db: Session, doctor_id: int, doctor: DoctorUpdate):
+def update_doctor(db: Session, doctor_id: int, doctor: DoctorUpdate, versions: list = None):
     """Update an existing doctor's details by ID."""
-    db_doctor = db.query(Doctor).filter(Doctor.DoctorID == doctor_id).first()
-    if db_doctor is None:
-        raise HTTPException(status_code=404, detail="Doctor not found")
-    
-    # Update the fields provided in the request body
-    for var, value in vars(doctor).items():
-        setattr(db_doctor, var, value) if value else None
-    
-    # Set the UpdatedAt timestamp to current time
-    db_doctor.UpdatedAt = datetime.utcnow()
-    
+    values = _changes(doctor)
+    values["UpdatedAt"] = datetime.utcnow()
+    db_doctor = _update_returning(db, Doctor, Doctor.DoctorID, doctor_id, values, "Doctor not found", versions)
+    if "FullName" in values:
+        sync_upcoming_names(db, Doctor, [doctor_id])
     db.commit()
-    db.refresh(db_doctor)
+    doctor_cache.invalidate()
     return db_doctor
 
-def delete_doctor(db: Session, doctor_id: int):
+def delete_doctor(db: Session, doctor_id: int, versions: list = None):
     """Delete a doctor record by ID."""
-    db_doctor = db.query(Doctor).filter(Doctor.DoctorID == doctor_id).first()
-    if db_doctor is None:
-        raise HTTPException(status_code=404, detail="Doctor not found")
-    
-    db.delete(db_doctor)
-    db.commit()
+    # Their appointments lose their doctor (ON DELETE SET NULL), which takes them off the doctor's feed
+    for model in (Appointment, AppointmentArchive):
+        _record_changes(db, "moved", model.DoctorID == doctor_id, model)
+    _delete_one(db, Doctor, Doctor.DoctorID, doctor_id, "Doctor not found", versions)
+    doctor_cache.invalidate()
     return {"message": "Doctor deleted successfully"}
 
 # Treatment CRUD Operations
@@ -125,119 +531,751 @@ def create_treatment(db: Session, treatment: TreatmentCreate):
     )
     db.add(db_treatment)
     db.commit()
+    treatment_cache.invalidate()
     db.refresh(db_treatment)
     return db_treatment
 
-def get_treatment(db: Session, treatment_id: int):
-    """Fetch a single treatment by ID."""
-    db_treatment = db.query(Treatment).filter(Treatment.TreatmentID == treatment_id).first()
-    if db_treatment is None:
-        raise HTTPException(status_code=404, detail="Treatment not found")
-    return db_treatment
+def get_treatment(db: Session, treatment_id: int, fields: list = None):
+    """Fetch a single treatment by ID (served from the catalog cache)."""
+    def load():
+        db_treatment = db.query(Treatment).filter(Treatment.TreatmentID == treatment_id).first()
+        if db_treatment is None:
+            raise HTTPException(status_code=404, detail="Treatment not found")
+        return schemas.Treatment.model_validate(db_treatment)
+    cached = treatment_cache.get_or_load(("treatment", treatment_id), load)
+    if fields is None:
+        return cached
+    _check_fields(schemas.Treatment, fields)
+    return _project_models(cached, fields, ("TreatmentID",))
 
-def get_treatments(db: Session, skip: int = 0, limit: int = 100):
-    """Fetch all treatments, with optional pagination."""
-    return db.query(Treatment).offset(skip).limit(limit).all()
+def get_treatments(db: Session, skip: int = 0, limit: int = 100, cursor: str = None, fields: list = None):
+    """Fetch treatments ordered by ID, paginated by offset or by a keyset cursor (served from the catalog cache)."""
+    def load():
+        treatments = _seek_by_id(db.query(Treatment), Treatment.TreatmentID, skip, limit, cursor).all()
+        return [schemas.Treatment.model_validate(db_treatment) for db_treatment in treatments]
+    cached = treatment_cache.get_or_load(("treatments", skip, limit, cursor), load)
+    if fields is None:
+        return cached
+    _check_fields(schemas.Treatment, fields)
+    return _project_models(cached, fields, ("TreatmentID",))
 
 def update_treatment(db: Session, treatment_id: int, treatment: TreatmentUpdate):
     """Update an existing treatment record by ID."""
-    db_treatment = db.query(Treatment).filter(Treatment.TreatmentID == treatment_id).first()
-    if db_treatment is None:
-        raise HTTPException(status_code=404, detail="Treatment not found")
-    
-    # Update the fields provided in the request body
-    for var, value in vars(treatment).items():
-        setattr(db_treatment, var, value) if value else None
-    
+    values = _changes(treatment)
+    # Appointments embedding it are left alone; their ETags carry a digest of their treatments
+    db_treatment = _update_returning(db, Treatment, Treatment.TreatmentID, treatment_id, values, "Treatment not found")
     db.commit()
-    db.refresh(db_treatment)
+    treatment_cache.invalidate()
     return db_treatment
 
 def delete_treatment(db: Session, treatment_id: int):
     """Delete a treatment record by ID."""
-    db_treatment = db.query(Treatment).filter(Treatment.TreatmentID == treatment_id).first()
-    if db_treatment is None:
-        raise HTTPException(status_code=404, detail="Treatment not found")
-    
-    db.delete(db_treatment)
-    db.commit()
+    _delete_one(db, Treatment, Treatment.TreatmentID, treatment_id, "Treatment not found")
+    treatment_cache.invalidate()
     return {"message": "Treatment deleted successfully"}
 
 # Appointment CRUD Operations
 
-def create_appointment(db: Session, appointment: AppointmentCreate):
-    """Create a new appointment record in the database."""
-    db_appointment = Appointment(
-        PatientID=appointment.PatientID,
-        DoctorID=appointment.DoctorID,
-        AppointmentDate=appointment.AppointmentDate,
-        Reason=appointment.Reason,
-        CreatedAt=datetime.utcnow(),
-        UpdatedAt=datetime.utcnow()
+def _appointment_load_options():
+    """Loader options for appointment reads: treatments for the whole page in one SELECT ... IN query."""
+    return (selectinload(Appointment.treatments),)
+
+# Appointment Conflict Detection
+
+# Bookings for the same doctor or patient must start at least this far apart
+APPOINTMENT_LENGTH = timedelta(minutes=config.APPOINTMENT_DURATION_MINUTES)
+
+def _lock_schedules(db: Session, doctor_ids: list, patient_ids: list):
+    """Serialize bookings for these doctors and patients until the transaction ends.
+
+    A no-op UPDATE takes row locks on MySQL/PostgreSQL and the database write lock on SQLite,
+    so a concurrent booking for the same doctor or patient waits here instead of racing
+    past the overlap check. Rows are locked in ID order to avoid deadlocks.
+    """
+    for model, id_column, ids in ((Doctor, Doctor.DoctorID, doctor_ids), (Patient, Patient.PatientID, patient_ids)):
+        if ids:
+            db.execute(
+                model.__table__.update()
+                .where(id_column.in_(ids))
+                .values({id_column.key: id_column, "UpdatedAt": model.UpdatedAt})
+            )
+
+def _booked_times(db: Session, column, ids: list, start: datetime, end: datetime, exclude_id: int = None, lock: bool = False):
+    """Map each doctor/patient ID to its sorted booking start times in (start, end) with one index range scan.
+
+    With `lock`, the scan is a locking read so it sees bookings committed after the transaction's snapshot.
+    """
+    query = db.query(column, Appointment.AppointmentDate).filter(
+        column.in_(ids),
+        Appointment.AppointmentDate > start,
+        Appointment.AppointmentDate < end
+    )
+    if exclude_id is not None:
+        query = query.filter(Appointment.AppointmentID != exclude_id)
+    if lock:
+        query = query.with_for_update()
+
+    booked = {}
+    for owner_id, booked_at in query.order_by(column, Appointment.AppointmentDate):
+        booked.setdefault(owner_id, []).append(booked_at)
+    return booked
+
+def _overlaps(times: list, when: datetime):
+    """Check whether a booking at `when` overlaps any of the sorted booking start times."""
+    i = bisect.bisect_right(times, when - APPOINTMENT_LENGTH)
+    return i < len(times) and times[i] < when + APPOINTMENT_LENGTH
+
+def _schedule_conflicts(db: Session, appointments: list, exclude_id: int = None, previous: list = ()):
+    """Lock the affected schedules and find the appointments that would double-book a doctor or patient.
+
+    `appointments` are dicts with PatientID, DoctorID and AppointmentDate. They are checked in order
+    against existing bookings and against each other. Returns {position: reason} for the conflicts.
+    The schedules of `previous` (the current state of rescheduled appointments) are locked as well.
+    """
+    doctor_ids = sorted({a["DoctorID"] for a in appointments if a["DoctorID"] is not None})
+    patient_ids = sorted({a["PatientID"] for a in appointments})
+    _lock_schedules(
+        db,
+        sorted(set(doctor_ids) | {a["DoctorID"] for a in previous if a["DoctorID"] is not None}),
+        sorted(set(patient_ids) | {a["PatientID"] for a in previous})
     )
-    db.add(db_appointment)
+
+    dates = [a["AppointmentDate"] for a in appointments]
+    start, end = min(dates) - APPOINTMENT_LENGTH, max(dates) + APPOINTMENT_LENGTH
+    booked = {
+        "DoctorID": _booked_times(db, Appointment.DoctorID, doctor_ids, start, end, exclude_id, lock=True) if doctor_ids else {},
+        "PatientID": _booked_times(db, Appointment.PatientID, patient_ids, start, end, exclude_id, lock=True),
+    }
+
+    conflicts = {}
+    for position, a in enumerate(appointments):
+        for key, label in (("DoctorID", "Doctor"), ("PatientID", "Patient")):
+            if a[key] is not None and _overlaps(booked[key].get(a[key], []), a["AppointmentDate"]):
+                conflicts[position] = (
+                    f"{label} {a[key]} already has an appointment within "
+                    f"{config.APPOINTMENT_DURATION_MINUTES} minutes of {a['AppointmentDate']}"
+                )
+                break
+        else:
+            # Accepted: later appointments in the same batch must not overlap this one either
+            for key in ("DoctorID", "PatientID"):
+                if a[key] is not None:
+                    bisect.insort(booked[key].setdefault(a[key], []), a["AppointmentDate"])
+    return conflicts
+
+# Doctor Availability
+
+def _check_search_range(start: datetime, end: datetime, duration: timedelta):
+    """Reject availability searches that are empty, inverted or too long."""
+    if end <= start:
+        raise HTTPException(status_code=400, detail="'to' must be after 'from'")
+    if end - start > timedelta(days=config.AVAILABILITY_MAX_DAYS):
+        raise HTTPException(status_code=400, detail=f"Search range is limited to {config.AVAILABILITY_MAX_DAYS} days")
+    if duration <= timedelta(0):
+        raise HTTPException(status_code=400, detail="Duration must be positive")
+
+def _availability(db: Session, doctors: list, start: datetime, end: datetime, duration: timedelta):
+    """Compute open slots for a set of doctors from one range scan over their bookings."""
+    _check_search_range(start, end, duration)
+    ids = [doctor.DoctorID for doctor in doctors]
+    # Bookings that start up to one appointment length before `start` can still block its first slot
+    booked = _booked_times(db, Appointment.DoctorID, ids, start - APPOINTMENT_LENGTH, end) if ids else {}
+
+    results = []
+    for doctor in doctors:
+        template = availability.parse_availability(doctor.AvailabilityHours or config.DEFAULT_AVAILABILITY_HOURS)
+        slots = availability.open_slots(template, booked.get(doctor.DoctorID, []), start, end, duration, APPOINTMENT_LENGTH)
+        results.append(DoctorAvailability(
+            DoctorID=doctor.DoctorID,
+            FullName=doctor.FullName,
+            Specialty=doctor.Specialty,
+            Slots=[AvailabilitySlot(Start=slot_start, End=slot_end) for slot_start, slot_end in slots]
+        ))
+    return results
+
+def get_doctor_availability(db: Session, doctor_id: int, start: datetime, end: datetime, duration: timedelta):
+    """Fetch the open slots of one doctor between start and end."""
+    return _availability(db, [get_doctor(db, doctor_id)], start, end, duration)[0]
+
+def find_availability(db: Session, start: datetime, end: datetime, duration: timedelta, specialty: str = None, limit: int = 100):
+    """Fetch the open slots of up to `limit` doctors, optionally filtered by specialty."""
+    query = db.query(Doctor)
+    if specialty is not None:
+        query = query.filter(Doctor.Specialty == specialty)
+    return _availability(db, query.order_by(Doctor.DoctorID).limit(limit).all(), start, end, duration)
+
+def appointment_values(appointment: AppointmentCreate):
+    """Column values of a new appointment, timestamped now."""
+    now = datetime.utcnow()
+    return dict(appointment.model_dump(), CreatedAt=now, UpdatedAt=now)
+
+def add_appointments(db: Session, appointments: list):
+    """Insert appointments (dicts of column values) in the current transaction, without committing.
+
+    They are checked in order for double-bookings, against existing bookings and each other.
+    Returns one result per appointment: its new AppointmentID, or the 409 HTTPException it was
+    rejected with. The upcoming summary and the analytics days are updated for the inserted ones.
+    """
+    conflicts = _schedule_conflicts(db, appointments)
+    accepted = [values for position, values in enumerate(appointments) if position not in conflicts]
+    ids = []
+    if accepted:
+        if db.get_bind().dialect.insert_executemany_returning:
+            _, ids = _insert_rows(db, Appointment, accepted)
+        else:
+            table = Appointment.__table__
+            ids = [db.execute(table.insert().values(values)).inserted_primary_key[0] for values in accepted]
+        _appointments_inserted(db, accepted, ids)
+    new_ids = iter(ids)
+    return [
+        HTTPException(status_code=409, detail=conflicts[position]) if position in conflicts else next(new_ids)
+        for position in range(len(appointments))
+    ]
+
+def create_appointment(db: Session, appointment: AppointmentCreate):
+    """Create a new appointment record in the database, rejecting double-bookings with a 409."""
+    result = add_appointments(db, [appointment_values(appointment)])[0]
+    if isinstance(result, HTTPException):
+        db.rollback()
+        raise result
     db.commit()
-    db.refresh(db_appointment)
-    return db_appointment
+    return db.get(Appointment, result)
+
+def _treatments_by_appointment(db: Session, appointment_ids: list, link=appointment_treatment_table):
+    """{AppointmentID: [treatment dicts]} for the given appointments, in one join query."""
+    treatments = {appointment_id: [] for appointment_id in appointment_ids}
+    rows = db.execute(
+        select(link.c.AppointmentID, Treatment.TreatmentID, Treatment.Name, Treatment.Description)
+        .join(Treatment, Treatment.TreatmentID == link.c.TreatmentID)
+        .where(link.c.AppointmentID.in_(appointment_ids))
+        .order_by(link.c.AppointmentID, Treatment.TreatmentID)
+    )
+    for row in rows:
+        treatments[row.AppointmentID].append({"TreatmentID": row.TreatmentID, "Name": row.Name, "Description": row.Description})
+    return treatments
+
+def _project_appointments(db: Session, query, fields: list, model=Appointment):
+    """Run an appointment (or archive) query selecting only `fields` (all when None); treatments are loaded only when listed."""
+    columns = _projection(model, schemas.Appointment, fields, ("AppointmentID", "AppointmentDate"))
+    appointments = _project_rows(query.with_entities(*columns).all())
+    if (fields is None or "treatments" in fields) and appointments:
+        ids = [appointment["AppointmentID"] for appointment in appointments]
+        treatments = _treatments_by_appointment(db, ids, archive.LINKS[model])
+        for appointment in appointments:
+            appointment["treatments"] = treatments[appointment["AppointmentID"]]
+    return appointments
 
-def get_appointment(db: Session, appointment_id: int):
-    """Fetch a single appointment by ID."""
-    db_appointment = db.query(Appointment).filter(Appointment.AppointmentID == appointment_id).first()
+def get_appointment(db: Session, appointment_id: int, fields: list = None):
+    """Fetch a single appointment by ID, optionally only the given fields."""
+    if fields is not None:
+        appointments = _project_appointments(db, db.query(Appointment).filter(Appointment.AppointmentID == appointment_id), fields)
+        if not appointments:
+            return _get_archived_appointment(db, appointment_id, fields)
+        return appointments[0]
+    db_appointment = db.query(Appointment).options(*_appointment_load_options()).filter(
+        Appointment.AppointmentID == appointment_id
+    ).first()
     if db_appointment is None:
-        raise HTTPException(status_code=404, detail="Appointment not found")
+        return _get_archived_appointment(db, appointment_id)
     return db_appointment
 
-def get_appointments(db: Session, skip: int = 0, limit: int = 100):
-    """Fetch all appointments, with optional pagination."""
-    return db.query(Appointment).offset(skip).limit(limit).all()
+def _get_archived_appointment(db: Session, appointment_id: int, fields: list = None):
+    """An archived appointment as a dict; only looked up after a miss on Appointments."""
+    if archive.archive_horizon(db) is not None:
+        query = db.query(AppointmentArchive).filter(AppointmentArchive.AppointmentID == appointment_id)
+        appointments = _project_appointments(db, query, fields, AppointmentArchive)
+        if appointments:
+            return appointments[0]
+    raise HTTPException(status_code=404, detail="Appointment not found")
 
-def update_appointment(db: Session, appointment_id: int, appointment: AppointmentUpdate):
-    """Update an existing appointment record by ID."""
-    db_appointment = db.query(Appointment).filter(Appointment.AppointmentID == appointment_id).first()
-    if db_appointment is None:
-        raise HTTPException(status_code=404, detail="Appointment not found")
-    
-    # Update the fields provided in the request body
-    for var, value in vars(appointment).items():
-        setattr(db_appointment, var, value) if value else None
-    
-    # Set the UpdatedAt timestamp to current time
-    db_appointment.UpdatedAt = datetime.utcnow()
-    
+def _page_start(start: datetime, cursor: str):
+    """Earliest AppointmentDate a page can contain: the later of `start` and the cursor's date."""
+    if cursor is None:
+        return start
+    key = decode_cursor(cursor)
+    try:
+        after = datetime.fromisoformat(key[0])
+    except (IndexError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return after if start is None else max(start, after)
+
+def get_appointments(db: Session, skip: int = 0, limit: int = 100, cursor: str = None, fields: list = None,
+                     start: datetime = None, end: datetime = None):
+    """Fetch appointments as dicts ordered by (AppointmentDate, AppointmentID), paginated by offset or cursor.
+
+    Optionally only the given fields, and only appointments in [start, end). Archived appointments
+    are included when the page can reach back past the archive horizon. Archived appointments
+    normally all sort before the hot ones, so the page is the archived page continued with hot
+    rows. If appointments were booked back past the horizon since, the page is chosen by merging
+    the (AppointmentDate, AppointmentID) keys read from both tables, and only those rows are projected.
+    """
+    def in_range(query, model):
+        if start is not None:
+            query = query.filter(model.AppointmentDate >= start)
+        if end is not None:
+            query = query.filter(model.AppointmentDate < end)
+        return query
+
+    def page(model, skip, limit):
+        query = _seek_by_date(in_range(db.query(model), model), model.AppointmentDate, model.AppointmentID, skip, limit, cursor)
+        return _project_appointments(db, query, fields, model)
+
+    models = archive.appointment_models(db, _page_start(start, cursor))
+    if len(models) == 1:
+        return page(Appointment, skip, limit)
+
+    horizon = archive.archive_horizon(db)
+    if in_range(db.query(Appointment.AppointmentID), Appointment).filter(Appointment.AppointmentDate <= horizon).first() is None:
+        archived = page(AppointmentArchive, skip, limit)
+        if len(archived) == limit:
+            return archived
+        hot_skip = 0
+        if cursor is None and not archived:
+            # The offset lies past the archive; skip whatever of it the archived rows did not cover
+            hot_skip = max(0, skip - in_range(db.query(func.count(AppointmentArchive.AppointmentID)), AppointmentArchive).scalar())
+        return archived + page(Appointment, hot_skip, limit - len(archived))
+
+    # Each table supplies the keys an offset would skip as well as a full page
+    offset = 0 if cursor is not None else skip
+    keys = []
+    for model in models:
+        query = in_range(db.query(model.AppointmentDate, model.AppointmentID), model)
+        query = _seek_by_date(query, model.AppointmentDate, model.AppointmentID, 0, offset + limit, cursor)
+        keys.append([(row.AppointmentDate, row.AppointmentID, model) for row in query])
+    chosen = list(islice(heapq.merge(*keys, key=lambda key: key[:2]), offset, offset + limit))
+    pages = []
+    for model in models:
+        ids = [appointment_id for _, appointment_id, source in chosen if source is model]
+        if ids:
+            query = db.query(model).filter(model.AppointmentID.in_(ids)).order_by(model.AppointmentDate, model.AppointmentID)
+            pages.append(_project_appointments(db, query, fields, model))
+    return list(heapq.merge(*pages, key=lambda appointment: (appointment["AppointmentDate"], appointment["AppointmentID"])))
+
+def update_appointment(db: Session, appointment_id: int, appointment: AppointmentUpdate, versions: list = None):
+    """Update an existing appointment record by ID, rejecting double-bookings with a 409.
+
+    When the doctor, patient or time was sent, the old and new schedules are locked and checked for
+    overlaps before anything is written, in the same order as a new booking takes its locks.
+    """
+    values = _changes(appointment)
+    values["UpdatedAt"] = datetime.utcnow()
+    if values.keys() & {"PatientID", "DoctorID", "AppointmentDate"}:
+        current = db.execute(
+            select(Appointment.PatientID, Appointment.DoctorID, Appointment.AppointmentDate)
+            .where(Appointment.AppointmentID == appointment_id)
+        ).first()
+        if current is None:
+            db.rollback()
+            raise HTTPException(status_code=404, detail="Appointment not found")
+        current = current._asdict()
+        conflicts = _schedule_conflicts(db, [dict(current, **values)], exclude_id=appointment_id, previous=[current])
+        if conflicts:
+            db.rollback()
+            raise HTTPException(status_code=409, detail=conflicts[0])
+
+    # Moving an appointment changes the analytics of both its old and its new day
+    rescheduled = values.keys() & {"DoctorID", "AppointmentDate"}
+    if rescheduled:
+        _mark_days_dirty(db, Appointment.AppointmentID == appointment_id)
+    if "DoctorID" in values:
+        # Tell the old doctor's feed the appointment left their schedule
+        _record_changes(db, "moved", and_(
+            Appointment.AppointmentID == appointment_id, Appointment.DoctorID.is_distinct_from(values["DoctorID"])
+        ))
+    db_appointment = _update_returning(db, Appointment, Appointment.AppointmentID, appointment_id, values, "Appointment not found", versions)
+    _record_changes(db, "updated", Appointment.AppointmentID == appointment_id)
+    _refresh_upcoming(db, Appointment.AppointmentID == appointment_id)
+    if "AppointmentDate" in values:
+        _mark_days_dirty(db, Appointment.AppointmentID == appointment_id)
     db.commit()
-    db.refresh(db_appointment)
-    return db_appointment
+    return dict(db_appointment._asdict(), treatments=get_appointment_treatments(db, appointment_id))
 
-def delete_appointment(db: Session, appointment_id: int):
+def delete_appointment(db: Session, appointment_id: int, versions: list = None):
     """Delete an appointment record by ID."""
-    db_appointment = db.query(Appointment).filter(Appointment.AppointmentID == appointment_id).first()
-    if db_appointment is None:
-        raise HTTPException(status_code=404, detail="Appointment not found")
-    
-    db.delete(db_appointment)
-    db.commit()
+    _mark_days_dirty(db, Appointment.AppointmentID == appointment_id)
+    _record_changes(db, "deleted", Appointment.AppointmentID == appointment_id)
+    _delete_one(db, Appointment, Appointment.AppointmentID, appointment_id, "Appointment not found", versions)
     return {"message": "Appointment deleted successfully"}
 
+# Upcoming Appointments Summary
+# UpcomingAppointmentsSummary holds future appointments with the patient and doctor names copied in.
+# Appointment writes rewrite the rows they touch, patient/doctor renames update the copied names,
+# and deletes cascade through the foreign keys, so reads never join or sort the full schedule.
+
+def _refresh_upcoming(db: Session, where):
+    """Rewrite the summary rows of the appointments matching `where`, pruning past rows on the way.
+
+    Two statements whatever the number of appointments: a DELETE of their old rows (and of every
+    row that is now in the past), then an INSERT ... SELECT of the ones that are still upcoming.
+    """
+    summary = UpcomingAppointmentsSummary.__table__
+    now = datetime.now()
+    db.execute(summary.delete().where(or_(
+        summary.c.AppointmentID.in_(select(Appointment.AppointmentID).where(where)),
+        summary.c.AppointmentDate < now
+    )))
+    upcoming = (
+        select(
+            Appointment.AppointmentID,
+            Appointment.PatientID,
+            Patient.FullName,
+            Appointment.DoctorID,
+            Doctor.FullName,
+            Appointment.AppointmentDate,
+            Appointment.Reason
+        )
+        .join(Patient, Patient.PatientID == Appointment.PatientID)
+        .join(Doctor, Doctor.DoctorID == Appointment.DoctorID)
+        .where(where, Appointment.AppointmentDate >= now)
+    )
+    columns = ["AppointmentID", "PatientID", "Patient", "DoctorID", "Doctor", "AppointmentDate", "Reason"]
+    db.execute(summary.insert().from_select(columns, upcoming))
+
+def sync_upcoming_names(db: Session, model, ids: list):
+    """Copy the current FullName of the given patients or doctors into their summary rows (no commit)."""
+    summary = UpcomingAppointmentsSummary.__table__
+    id_column = model.__table__.primary_key.columns[0]
+    name_column = "Patient" if model is Patient else "Doctor"
+    owner_column = summary.c[id_column.name]
+    db.execute(
+        summary.update()
+        .where(owner_column.in_(ids))
+        .values({name_column: select(model.FullName).where(id_column == owner_column).scalar_subquery()})
+    )
+
+def backfill_upcoming_summary(db: Session):
+    """Fill an empty summary from the appointments table, e.g. the first time the table is created."""
+    if db.query(UpcomingAppointmentsSummary.AppointmentID).first() is None:
+        _refresh_upcoming(db, Appointment.AppointmentDate >= datetime.now())
+        db.commit()
+
+def get_upcoming_appointments(db: Session, doctor_id: int = None, day: date = None, skip: int = 0, limit: int = 100, cursor: str = None):
+    """Fetch upcoming appointments by (AppointmentDate, AppointmentID), optionally for one doctor and/or one day."""
+    start = datetime.now()
+    query = db.query(UpcomingAppointmentsSummary)
+    if day is not None:
+        start = max(start, datetime.combine(day, time.min))
+        query = query.filter(UpcomingAppointmentsSummary.AppointmentDate < datetime.combine(day + timedelta(days=1), time.min))
+    if doctor_id is not None:
+        query = query.filter(UpcomingAppointmentsSummary.DoctorID == doctor_id)
+    query = query.filter(UpcomingAppointmentsSummary.AppointmentDate >= start)
+    return _seek_by_date(
+        query, UpcomingAppointmentsSummary.AppointmentDate, UpcomingAppointmentsSummary.AppointmentID, skip, limit, cursor
+    ).all()
+
+# Appointment Export
+
+# Rows fetched per round trip while streaming an export
+EXPORT_BATCH_SIZE = 1000
+
+def _export_query(appointments, link, start: datetime = None, end: datetime = None):
+    """The export join over one appointments table and its treatment links, one row per treatment."""
+    query = (
+        select(
+            appointments.c.AppointmentID,
+            appointments.c.AppointmentDate,
+            appointments.c.Reason,
+            appointments.c.PatientID,
+            Patient.FullName.label("Patient"),
+            appointments.c.DoctorID,
+            Doctor.FullName.label("Doctor"),
+            Treatment.Name.label("Treatment")
+        )
+        .join(Patient, Patient.PatientID == appointments.c.PatientID)
+        .outerjoin(Doctor, Doctor.DoctorID == appointments.c.DoctorID)
+        .outerjoin(link, link.c.AppointmentID == appointments.c.AppointmentID)
+        .outerjoin(Treatment, Treatment.TreatmentID == link.c.TreatmentID)
+        .order_by(appointments.c.AppointmentDate, appointments.c.AppointmentID, Treatment.TreatmentID)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    if start is not None:
+        query = query.where(appointments.c.AppointmentDate >= start)
+    if end is not None:
+        query = query.where(appointments.c.AppointmentDate < end)
+    return query
+
+def _export_rows(db: Session, start: datetime = None, end: datetime = None):
+    """Export join rows in [start, end), ordered by appointment, with one result streaming at a time.
+
+    MySQL drivers allow a single unbuffered result per connection, so the hot and archive tables
+    are read one after the other. The archive ends at the archive horizon; hot appointments dated
+    at or before it (booked into the archived past since the last archive run) are few, so they
+    are fetched up front and merged into the archive stream before the rest of the hot table.
+    """
+    tables = archive.appointment_tables(db, start)
+    if len(tables) == 1:
+        yield from db.execute(_export_query(*tables[0], start, end))
+        return
+    (hot, hot_link), (cold, cold_link) = tables
+    horizon = archive.archive_horizon(db)
+    backdated = db.execute(_export_query(hot, hot_link, start, end).where(hot.c.AppointmentDate <= horizon)).all()
+    yield from heapq.merge(
+        backdated, db.execute(_export_query(cold, cold_link, start, end)), key=lambda row: (row.AppointmentDate, row.AppointmentID)
+    )
+    yield from db.execute(_export_query(hot, hot_link, start, end).where(hot.c.AppointmentDate > horizon))
+
+def iter_appointment_export(db: Session, start: datetime = None, end: datetime = None):
+    """Stream appointments in [start, end) with patient, doctor and treatment names, one dict per appointment.
+
+    Uses a single join (like the AppointmentTreatmentDetails view) read through a server-side
+    cursor in EXPORT_BATCH_SIZE batches, so memory use does not depend on the result size.
+    Archived appointments are included when the range reaches them (see _export_rows).
+    """
+    # Rows arrive ordered by appointment, so treatments can be grouped on the fly
+    current = None
+    for row in _export_rows(db, start, end):
+        if current is None or current["AppointmentID"] != row.AppointmentID:
+            if current is not None:
+                yield current
+            current = {
+                "AppointmentID": row.AppointmentID,
+                "AppointmentDate": row.AppointmentDate.isoformat(),
+                "Reason": row.Reason,
+                "PatientID": row.PatientID,
+                "Patient": row.Patient,
+                "DoctorID": row.DoctorID,
+                "Doctor": row.Doctor,
+                "Treatments": []
+            }
+        if row.Treatment is not None:
+            current["Treatments"].append(row.Treatment)
+    if current is not None:
+        yield current
+
 # Link Treatments to Appointment
 
-def link_treatment_to_appointment(db: Session, appointment_id: int, treatment_ids: list):
-    """Link treatments to an appointment, given an appointment ID and list of treatment IDs."""
-    if not db.query(Appointment).filter_by(AppointmentID=appointment_id).first():
+def _require_appointment(db: Session, appointment_id: int):
+    """Raise a 404 unless the appointment exists (reads only its primary key)."""
+    if db.query(Appointment.AppointmentID).filter(Appointment.AppointmentID == appointment_id).first() is None:
         raise HTTPException(status_code=404, detail="Appointment not found")
 
-    # Ensure that the treatment IDs exist in the database
-    valid_ids = db.query(Treatment.TreatmentID).filter(Treatment.TreatmentID.in_(treatment_ids)).all()
-    valid_ids = [t[0] for t in valid_ids]
-    
-    # Insert the treatments into the junction table
-    for treatment_id in valid_ids:
-        db.execute(
-            appointment_treatment_table.insert().values(AppointmentID=appointment_id, TreatmentID=treatment_id)
-        )
+def _add_links(db: Session, appointment_id: int, treatment_ids: list) -> int:
+    """Link every existing treatment in `treatment_ids` with one INSERT ... SELECT, skipping links that exist.
+
+    Unknown treatment IDs are dropped by the SELECT. Returns the number of links added.
+    """
+    treatments = select(literal(appointment_id), Treatment.TreatmentID).where(Treatment.TreatmentID.in_(treatment_ids))
+    return _insert_ignoring_duplicates(db, appointment_treatment_table, ["AppointmentID", "TreatmentID"], treatments)
+
+def link_treatment_to_appointment(db: Session, appointment_id: int, treatment_ids: list):
+    """Link treatments to an appointment, given an appointment ID and list of treatment IDs.
+
+    Idempotent: links that already exist and unknown treatment IDs are skipped.
+    """
+    _require_appointment(db, appointment_id)
+    added = _add_links(db, appointment_id, set(treatment_ids))
+    if added:
+        _mark_days_dirty(db, Appointment.AppointmentID == appointment_id)
+        _touch_appointments(db, Appointment.AppointmentID == appointment_id)
+    db.commit()
+    return {"message": "Treatments linked successfully", "added": added}
+
+def replace_appointment_treatments(db: Session, appointment_id: int, treatment_ids: list):
+    """Make `treatment_ids` the exact set of treatments linked to an appointment.
+
+    The diff against the current links is applied in the database: one DELETE of the links
+    outside the new set and one INSERT ... SELECT of the missing ones.
+    """
+    _require_appointment(db, appointment_id)
+    treatment_ids = set(treatment_ids)
+    link = appointment_treatment_table
+    removed = db.execute(link.delete().where(
+        link.c.AppointmentID == appointment_id, link.c.TreatmentID.not_in(treatment_ids)
+    )).rowcount
+    added = _add_links(db, appointment_id, treatment_ids) if treatment_ids else 0
+    if added or removed:
+        _mark_days_dirty(db, Appointment.AppointmentID == appointment_id)
+        _touch_appointments(db, Appointment.AppointmentID == appointment_id)
     db.commit()
+    return {"message": "Treatments replaced successfully", "added": added, "removed": removed}
 
 def get_appointment_treatments(db: Session, appointment_id: int):
     """Fetch all treatments associated with an appointment by ID."""
     return db.query(Treatment).join(appointment_treatment_table).filter(
         appointment_treatment_table.c.AppointmentID == appointment_id
     ).all()
+
+def get_appointment_treatment_details(db: Session, ids: list = None, start: datetime = None, end: datetime = None,
+                                      limit: int = config.TREATMENT_DETAILS_MAX_APPOINTMENTS, cursor: str = None):
+    """Fetch (appointment, patient, treatment) rows for many appointments in one join query.
+
+    Appointments are selected either by ID (at most TREATMENT_DETAILS_MAX_APPOINTMENTS) or as a page
+    of up to `limit` appointments with treatments in [start, end), ordered by (AppointmentDate,
+    AppointmentID). Rows come back grouped by appointment, like the AppointmentTreatmentDetails view.
+    Archived appointments are included when the IDs or the range may reach them; each table pair
+    is queried the same way and the ordered rows are merged.
+    Returns (rows, cursor of the next page or None).
+    """
+    if ids is not None:
+        if len(ids) > config.TREATMENT_DETAILS_MAX_APPOINTMENTS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {config.TREATMENT_DETAILS_MAX_APPOINTMENTS} appointment ids can be resolved at once"
+            )
+    elif start is None or end is None or end <= start:
+        raise HTTPException(status_code=400, detail="Pass ids, or a from/to range with 'to' after 'from'")
+
+    results = []
+    for source, link in archive.appointment_tables(db, start if ids is None else None):
+        appointments = select(source.c.AppointmentID, source.c.AppointmentDate, source.c.PatientID)
+        if ids is not None:
+            appointments = appointments.where(source.c.AppointmentID.in_(ids))
+        else:
+            # Only appointments that have treatments, so every selected appointment yields rows and
+            # a full page of appointments is recognisable from the rows alone
+            appointments = _seek_by_date(
+                appointments.where(
+                    source.c.AppointmentDate >= start,
+                    source.c.AppointmentDate < end,
+                    exists().where(link.c.AppointmentID == source.c.AppointmentID)
+                ),
+                source.c.AppointmentDate, source.c.AppointmentID, 0, limit, cursor
+            )
+        selected = appointments.subquery()
+
+        results.append(db.execute(
+            select(
+                selected.c.AppointmentID,
+                Patient.FullName.label("Patient"),
+                Treatment.Name.label("Treatment"),
+                selected.c.AppointmentDate
+            )
+            .join(Patient, Patient.PatientID == selected.c.PatientID)
+            .join(link, link.c.AppointmentID == selected.c.AppointmentID)
+            .join(Treatment, Treatment.TreatmentID == link.c.TreatmentID)
+            .order_by(selected.c.AppointmentDate, selected.c.AppointmentID, Treatment.TreatmentID)
+        ).all())
+
+    rows = results[0]
+    if len(results) > 1:
+        # Each table returned up to `limit` appointments; keep the first `limit` of the merged order
+        rows, seen = [], set()
+        for row in heapq.merge(*results, key=lambda row: (row.AppointmentDate, row.AppointmentID)):
+            if row.AppointmentID not in seen:
+                if ids is None and len(seen) == limit:
+                    break
+                seen.add(row.AppointmentID)
+            rows.append(row)
+
+    page_cursor = None
+    if ids is None and len({row.AppointmentID for row in rows}) == limit:
+        page_cursor = encode_cursor(rows[-1].AppointmentDate, rows[-1].AppointmentID)
+    return rows, page_cursor
+
+# Bulk Create Operations
+
+# Rows per multi-row INSERT; each chunk is committed in its own transaction
+BULK_CHUNK_SIZE = 500
+
+def _insert_rows(db: Session, model, rows: list):
+    """Insert rows with a single multi-row INSERT and return the new primary keys when the dialect can."""
+    table = model.__table__
+    pk = table.primary_key.columns[0]
+    if db.get_bind().dialect.insert_executemany_returning:
+        # The new keys come back in the order of `rows`, whatever order the database assigned them in
+        return len(rows), db.scalars(table.insert().returning(pk, sort_by_parameter_order=True), rows).all()
+    return db.execute(table.insert(), rows).rowcount, []
+
+def _insert_chunk(db: Session, model, chunk: list, check=None, after=None):
+    """Insert a chunk of (index, values) rows, skipping the ones rejected by `check`.
+
+    `after(db, values_list, ids)` runs in the same transaction once the rows are inserted.
+    """
+    errors = []
+    if check is not None:
+        conflicts = check(db, [values for _, values in chunk])
+        errors = [BulkRowError(index=chunk[position][0], detail=detail) for position, detail in conflicts.items()]
+        chunk = [row for position, row in enumerate(chunk) if position not in conflicts]
+    if not chunk:
+        return 0, [], errors
+    created, ids = _insert_rows(db, model, [values for _, values in chunk])
+    if after is not None:
+        after(db, [values for _, values in chunk], ids)
+    return created, ids, errors
+
+def _bulk_create(db: Session, model, schema, rows: list, timestamps: bool = True, check=None, after=None, chunk_size: int = BULK_CHUNK_SIZE):
+    """Validate raw rows against a *Create schema and insert the valid ones in chunked transactions.
+
+    A chunk that fails on a database constraint is rolled back and retried row by row,
+    so a bad row is reported in `errors` without discarding the rest of the batch.
+    `check(db, values_list)` may reject rows up front by returning {position: reason}, and
+    `after` is passed on to _insert_chunk.
+    """
+    result = BulkCreateResult()
+    valid = []
+    for index, row in enumerate(rows):
+        try:
+            values = schema.model_validate(row).model_dump()
+        except ValidationError as e:
+            detail = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            result.errors.append(BulkRowError(index=index, detail=detail))
+            continue
+        if timestamps:
+            values["CreatedAt"] = values["UpdatedAt"] = datetime.utcnow()
+        valid.append((index, values))
+
+    for start in range(0, len(valid), chunk_size):
+        chunk = valid[start:start + chunk_size]
+        try:
+            created, ids, errors = _insert_chunk(db, model, chunk, check, after)
+            db.commit()
+        except DBAPIError:
+            db.rollback()
+            created, ids, errors = 0, [], []
+            for row in chunk:
+                try:
+                    row_created, row_ids, row_errors = _insert_chunk(db, model, [row], check, after)
+                    db.commit()
+                except DBAPIError as e:
+                    db.rollback()
+                    errors.append(BulkRowError(index=row[0], detail=str(e.orig)))
+                    continue
+                created += row_created
+                ids.extend(row_ids)
+                errors.extend(row_errors)
+        result.created += created
+        result.ids.extend(ids)
+        result.errors.extend(errors)
+
+    result.errors.sort(key=lambda error: error.index)
+    return result
+
+def bulk_create_patients(db: Session, patients: list):
+    """Create many patients at once, reporting per-row errors."""
+    return _bulk_create(db, Patient, PatientCreate, patients, after=_index_inserted_patients)
+
+def bulk_create_doctors(db: Session, doctors: list):
+    """Create many doctors at once, reporting per-row errors."""
+    result = _bulk_create(db, Doctor, DoctorCreate, doctors)
+    doctor_cache.invalidate()
+    return result
+
+def bulk_create_treatments(db: Session, treatments: list):
+    """Create many treatments at once, reporting per-row errors."""
+    result = _bulk_create(db, Treatment, TreatmentCreate, treatments, timestamps=False)
+    treatment_cache.invalidate()
+    return result
+
+def bulk_create_appointments(db: Session, appointments: list):
+    """Create many appointments at once, reporting per-row errors (including double-bookings)."""
+    return _bulk_create(db, Appointment, AppointmentCreate, appointments, check=_schedule_conflicts, after=_appointments_inserted)
+
+def _appointments_inserted(db: Session, appointments: list, ids: list):
+    """Publish a chunk of new appointments to the change feed and bring the upcoming summary and analytics days in line."""
+    if ids:
+        where = Appointment.AppointmentID.in_(ids)
+    else:
+        # Without RETURNING the new IDs are unknown; match on doctor (or, for appointments without
+        # one, patient) and time instead, which may also pick up a few existing rows of the same
+        # doctors or patients (harmless, they are rebuilt as-is, and feed readers just refetch them)
+        doctor_ids = {values["DoctorID"] for values in appointments if values["DoctorID"] is not None}
+        patient_ids = {values["PatientID"] for values in appointments if values["DoctorID"] is None}
+        owners = []
+        if doctor_ids:
+            owners.append(Appointment.DoctorID.in_(doctor_ids))
+        if patient_ids:
+            owners.append(and_(Appointment.DoctorID.is_(None), Appointment.PatientID.in_(patient_ids)))
+        where = and_(or_(*owners), Appointment.AppointmentDate.in_({values["AppointmentDate"] for values in appointments}))
+    _record_changes(db, "created", where)
+    _refresh_upcoming(db, where)
+    _mark_days_dirty(db, where)
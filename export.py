@@ -0,0 +1,49 @@
+import csv
+import io
+import json
+
+# Encoders for the streaming appointment export (GET /appointments/export).
+# They turn the row dicts from crud.iter_appointment_export into text chunks without ever
+# holding more than one chunk in memory, so exports stay flat regardless of result size.
+
+EXPORT_FIELDS = ["AppointmentID", "AppointmentDate", "Reason", "PatientID", "Patient", "DoctorID", "Doctor", "Treatments"]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# Rows per chunk handed to the response; larger chunks mean fewer socket writes
+ROWS_PER_CHUNK = 500
+
+def _chunked(lines, size: int = ROWS_PER_CHUNK):
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= size:
+            yield "".join(buffer)
+            buffer.clear()
+    if buffer:
+        yield "".join(buffer)
+
+def _ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, default=str) + "\n"
+
+def _csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        values = dict(row, Treatments="; ".join(row["Treatments"]))
+        writer.writerow([values[field] for field in EXPORT_FIELDS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Emit the header even when there are no rows
+    yield buffer.getvalue()
+
+def encode(rows, format: str):
+    """Encode export rows as NDJSON or CSV text chunks."""
+    lines = _csv_lines(rows) if format == "csv" else _ndjson_lines(rows)
+    return _chunked(line for line in lines if line)
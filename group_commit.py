@@ -0,0 +1,133 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from sqlalchemy.exc import DBAPIError
+import config
+import crud
+import database
+import metrics
+
+# Group commit for appointment creation (opt-in with APPOINTMENT_GROUP_COMMIT).
+# During a booking rush every POST /appointments/ would run its own transaction and pay for its own
+# commit (an fsync on SQLite and on most server setups). With group commit the route hands the new
+# appointment to one background writer and waits on a future. The writer collects appointments for
+# up to APPOINTMENT_BATCH_WINDOW_MS after the first one arrives, or until APPOINTMENT_BATCH_SIZE are
+# pending, inserts them with crud.add_appointments and commits once for all of them.
+#
+# Every caller still gets its own outcome. Double-bookings are decided per appointment in arrival
+# order, as if the requests had run one after another. A batch that fails on a database error is
+# rolled back and replayed one appointment per transaction, so only the offending one fails.
+# Batch sizes and queue waits are exported on /metrics.
+
+logger = logging.getLogger("clinic.group_commit")
+
+class GroupCommitQueue:
+    """Background writer that commits the items submitted within one window in a single transaction.
+
+    `write(db, items)` adds the items to the session without committing and returns one result per
+    item: a value for the caller, or an exception to raise in the caller instead.
+    """
+
+    def __init__(self, name: str, write, window_ms: float, max_size: int):
+        self.name = name
+        self.write = write
+        self.window = window_ms / 1000
+        self.max_size = max(1, max_size)
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, item) -> Future:
+        """Queue an item for the next batch; the future resolves once that batch has committed."""
+        future = Future()
+        self._start()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def stop(self, timeout: float = 5.0):
+        """Commit what is already queued, then stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def _start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=f"group-commit-{self.name}", daemon=True)
+                    self._thread.start()
+
+    def _collect(self):
+        """Wait for an item, then gather more until the window closes or the batch is full.
+
+        Returns (batch, stopping), where stopping means stop() was called.
+        """
+        first = self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is None:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    def _run(self):
+        while True:
+            batch, stopping = self._collect()
+            if batch:
+                self._flush(batch)
+            if stopping:
+                return
+
+    def _commit(self, items: list):
+        db = database.SessionLocal()
+        try:
+            results = self.write(db, items)
+            db.commit()
+            return results
+        finally:
+            db.close()  # rolls back whatever did not commit
+
+    def _flush(self, batch: list):
+        started = time.perf_counter()
+        labels = (self.name,)
+        metrics.WRITE_BATCH_SIZE.observe(labels, len(batch))
+        for _, _, enqueued in batch:
+            metrics.WRITE_QUEUE_WAIT.observe(labels, started - enqueued)
+
+        items = [item for item, _, _ in batch]
+        try:
+            results = self._commit(items)
+        except DBAPIError as error:
+            logger.warning("Group commit of %d %s failed (%s), retrying one by one", len(items), self.name, error.orig)
+            results = []
+            for item in items:
+                try:
+                    results.extend(self._commit([item]))
+                except Exception as item_error:
+                    results.append(item_error)
+        except Exception as error:  # never leave a caller waiting
+            logger.exception("Group commit of %d %s failed", len(items), self.name)
+            results = [error] * len(items)
+
+        for (_, future, _), result in zip(batch, results):
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+# New appointments from POST /appointments/ when APPOINTMENT_GROUP_COMMIT is on
+appointments = GroupCommitQueue("appointments", crud.add_appointments, config.APPOINTMENT_BATCH_WINDOW_MS, config.APPOINTMENT_BATCH_SIZE)
@@ -1,29 +1,130 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Response, Query, Request, Header
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, PlainTextResponse
+import asyncio
+import functools
+import io
+import tempfile
+from typing import Any, Optional
+from datetime import date, datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 import crud
 import schemas
 import database  # Import your database module
-
-# Database setup
-DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+import migrations
+import config
+import cache
+import conditional
+import serialization
+import export
+import patient_import
+import analytics
+import metrics
+import async_routes
+import group_commit
+import changes
+from models import Patient, Appointment
+
+# Database setup: engine, sessions and the get_db dependency come from database.py,
+# configured through DATABASE_URL and the DB_POOL_* / SQLITE_* settings in config.py
+SessionLocal = database.SessionLocal
+get_db = database.get_db
+get_primary_db = database.get_primary_db  # GET routes that must not read from a replica
+
+# Record per-route SQL statement counts, time, rows and pool waits (exported on /metrics)
+for instrumented in (database.engine, *database.replicas.engines):
+    metrics.instrument_engine(instrumented)
+database.async_engine_listeners.append(lambda async_engine: metrics.instrument_engine(async_engine.sync_engine))  # once created
 
 Base = database.Base
-Base.metadata.create_all(bind=engine)
+Base.metadata.create_all(bind=database.engine)
+migrations.upgrade_schema(database.engine)  # add columns and indexes that tables created by older models lack
 
-app = FastAPI()
+# Populate the upcoming-appointments summary, the patient search index and the analytics rollups when their tables are new
+with database.SessionLocal() as db:
+    crud.backfill_upcoming_summary(db)
+    crud.backfill_patient_search(db)
+    analytics.backfill_rollups(db)
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+app = FastAPI()
+app.add_middleware(database.PrimaryAfterWriteMiddleware)  # read-your-writes when replicas are configured
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Async variants of the CRUD routes, served under /async
+app.include_router(async_routes.router)
+
+# Close pooled async connections on shutdown; aiosqlite runs each one on its own thread
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    await database.dispose_async_engine()
+
+# Commit the bookings still queued for group commit before the process exits
+@app.on_event("shutdown")
+def stop_group_commit():
+    group_commit.appointments.stop()
+
+# List pages send the cursor of the next page in the X-Next-Cursor header (see crud.py)
+set_next_cursor = crud.set_next_cursor
+
+# Conditional requests (see conditional.py). Single records and list pages carry an ETag built from
+# UpdatedAt; a GET whose If-None-Match / If-Modified-Since still matches gets an empty 304, decided
+# from a lookup of UpdatedAt alone. PUT and DELETE honour If-Match and answer 412 when it is stale.
+# List pages only look their versions up before fetching when the request has If-None-Match;
+# otherwise the ETag is built from the rows the page was served from, which are always fetched
+# with UpdatedAt (and stripped of it again when the projection left it out).
+
+def check_record(request: Request, response: Response, row_id: int, updated_at: datetime, fields: list = None, extra: str = None):
+    """Set a record's ETag and Last-Modified, or return the 304 to send instead."""
+    etag = conditional.entity_tag(row_id, updated_at, fields, extra)
+    # With an `extra` version part (an appointment's treatments), UpdatedAt alone cannot vouch for the record
+    if conditional.is_not_modified(request, etag, updated_at if extra is None else None):
+        return conditional.not_modified(etag, updated_at)
+    conditional.set_validators(response, etag, updated_at)
+
+def check_page(request: Request, response: Response, versions, fields: list = None):
+    """Set a list page's ETag from its (ID, UpdatedAt) pairs, or return the 304 to send instead."""
+    etag = conditional.collection_tag(versions, fields)
+    if conditional.is_not_modified(request, etag):
+        return conditional.not_modified(etag)
+    conditional.set_validators(response, etag)
+
+def probe_page(request: Request, versions_of_page, fields: list = None):
+    """With If-None-Match, the 304 to send when the page's versions (from `versions_of_page()`) still match it."""
+    if conditional.has_if_none_match(request):
+        etag = conditional.collection_tag(versions_of_page(), fields)
+        if conditional.is_not_modified(request, etag):
+            return conditional.not_modified(etag)
+
+def page_fields(fields: list = None):
+    """Fields to fetch a list page with: the projection plus the UpdatedAt its ETag is built from."""
+    return fields if fields is None or "UpdatedAt" in fields else fields + ["UpdatedAt"]
+
+def tag_page(response: Response, rows: list, id_name: str, fields: list = None):
+    """Set the ETag of a list page fetched with `page_fields(fields)`, then drop UpdatedAt if `fields` left it out."""
+    conditional.set_validators(response, conditional.collection_tag(crud.row_versions(rows, id_name), fields))
+    if fields is not None and "UpdatedAt" not in fields:
+        for row in rows:
+            del row["UpdatedAt"]
+
+def if_match(request: Request, row_id: int):
+    """UpdatedAt values accepted by the request's If-Match header, or None when there is no precondition."""
+    header = request.headers.get("if-match")
+    return None if header is None else conditional.matched_versions(header, row_id)
+
+# Sparse fieldsets: read routes accept `?fields=PatientID,FullName` and return only those fields
+# (plus the ID and sort keys), selected as columns rather than loaded as full records.
+
+def field_list(fields: Optional[str]):
+    """Split `?fields=` into a list of names, or None when it was not sent."""
+    if fields is None:
+        return None
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    if not names:
+        raise HTTPException(status_code=400, detail="fields must name at least one field")
+    return names
+
+# Projected records and the large list pages are returned through serialization.py, which encodes
+# them directly instead of validating them against the response_model (that would reject projections).
 
 # ----------------- Patient Routes -----------------
 
@@ -31,32 +132,90 @@ def get_db():
 def create_patient(patient: schemas.PatientCreate, db: Session = Depends(get_db)):
     return crud.create_patient(db=db, patient=patient)
 
+# POST - Bulk create Patients (rows are validated individually against PatientCreate)
+@app.post("/patients/bulk", response_model=schemas.BulkCreateResult)
+def bulk_create_patients(patients: list[dict[str, Any]], db: Session = Depends(get_db)):
+    return crud.bulk_create_patients(db=db, patients=patients)
+
+# POST - Import patients from a CSV request body (text/csv), upserting on PhoneNumber/Email
+@app.post("/patients/import", response_model=schemas.PatientImportResult)
+async def import_patients(request: Request, chunk_size: int = Query(config.IMPORT_CHUNK_SIZE, gt=0)):
+    # Spool the upload without buffering it all in memory, then import it off the event loop
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as upload:
+        async for chunk in request.stream():
+            upload.write(chunk)
+        upload.seek(0)
+
+        def run():
+            db = SessionLocal()
+            try:
+                lines = io.TextIOWrapper(upload, encoding="utf-8-sig", newline="")
+                # Per-chunk progress goes to the clinic.import logger, not the server's stdout
+                return patient_import.import_patients(db, lines, chunk_size=chunk_size, log=patient_import.logger.debug)
+            finally:
+                db.close()
+
+        return await run_in_threadpool(run)
+
+# GET - Search patients by the start of name words, phone digits or email, best matches first
+@app.get("/patients/search", response_model=list[schemas.Patient])
+def search_patients(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    skip: int = 0,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    projection = field_list(fields)
+    patients, next_page = crud.search_patients(db=db, q=q, skip=skip, limit=limit, cursor=cursor, fields=projection)
+    set_next_cursor(response, next_page)
+    return serialization.rows(response, patients)
+
 @app.get("/patients/{patient_id}", response_model=schemas.Patient)
-def get_patient(patient_id: int, db: Session = Depends(get_db)):
-    db_patient = crud.get_patient(db=db, patient_id=patient_id)
+def get_patient(patient_id: int, request: Request, response: Response, fields: Optional[str] = None, db: Session = Depends(get_db)):
+    projection = field_list(fields)
+    updated_at = crud.get_version(db, Patient, patient_id, "Patient not found")
+    not_modified = check_record(request, response, patient_id, updated_at, projection)
+    if not_modified is not None:
+        return not_modified
+    db_patient = crud.get_patient(db=db, patient_id=patient_id, fields=projection)
     if db_patient is None:
         raise HTTPException(status_code=404, detail="Patient not found")
-    return db_patient
+    return db_patient if projection is None else serialization.rows(response, db_patient)
 
 @app.get("/patients/", response_model=list[schemas.Patient])
-def get_patients(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_patients(db=db, skip=skip, limit=limit)
+def get_patients(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    projection = field_list(fields)
+    page_versions = functools.partial(crud.get_page_versions, db, Patient, skip=skip, limit=limit, cursor=cursor)
+    not_modified = probe_page(request, page_versions, projection)
+    if not_modified is not None:
+        return not_modified
+    patients = crud.get_patients(db=db, skip=skip, limit=limit, cursor=cursor, fields=page_fields(projection))
+    tag_page(response, patients, "PatientID", projection)
+    set_next_cursor(response, crud.next_cursor(patients, limit, "PatientID"))
+    return serialization.rows(response, patients)
 
 # PUT - Update Patient
 @app.put("/patients/{patient_id}", response_model=schemas.Patient)
-def update_patient(patient_id: int, patient: schemas.PatientCreate, db: Session = Depends(get_db)):
-    db_patient = crud.get_patient(db=db, patient_id=patient_id)
-    if db_patient is None:
-        raise HTTPException(status_code=404, detail="Patient not found")
-    return crud.update_patient(db=db, patient_id=patient_id, patient=patient)
+def update_patient(patient_id: int, patient: schemas.PatientCreate, request: Request, response: Response, db: Session = Depends(get_db)):
+    db_patient = crud.update_patient(db=db, patient_id=patient_id, patient=patient, versions=if_match(request, patient_id))
+    conditional.set_validators(response, conditional.entity_tag(patient_id, db_patient.UpdatedAt), db_patient.UpdatedAt)
+    return db_patient
 
 # DELETE - Delete Patient
-@app.delete("/patients/{patient_id}", response_model=schemas.Patient)
-def delete_patient(patient_id: int, db: Session = Depends(get_db)):
-    db_patient = crud.get_patient(db=db, patient_id=patient_id)
-    if db_patient is None:
-        raise HTTPException(status_code=404, detail="Patient not found")
-    return crud.delete_patient(db=db, patient_id=patient_id)
+@app.delete("/patients/{patient_id}", response_model=schemas.Message)
+def delete_patient(patient_id: int, request: Request, db: Session = Depends(get_db)):
+    return crud.delete_patient(db=db, patient_id=patient_id, versions=if_match(request, patient_id))
 
 # ----------------- Doctor Routes -----------------
 
@@ -64,32 +223,81 @@ def delete_patient(patient_id: int, db: Session = Depends(get_db)):
 def create_doctor(doctor: schemas.DoctorCreate, db: Session = Depends(get_db)):
     return crud.create_doctor(db=db, doctor=doctor)
 
+# POST - Bulk create Doctors (rows are validated individually against DoctorCreate)
+@app.post("/doctors/bulk", response_model=schemas.BulkCreateResult)
+def bulk_create_doctors(doctors: list[dict[str, Any]], db: Session = Depends(get_db)):
+    return crud.bulk_create_doctors(db=db, doctors=doctors)
+
+# GET - Open slots across doctors (declared before /doctors/{doctor_id} so "availability" is not parsed as an ID).
+# Availability reads the primary like the other doctor routes, since a doctor loaded from a replica can refill the catalog cache.
+@app.get("/doctors/availability", response_model=list[schemas.DoctorAvailability])
+def find_availability(
+    start: datetime = Query(alias="from"),
+    end: datetime = Query(alias="to"),
+    duration: int = config.APPOINTMENT_DURATION_MINUTES,
+    specialty: Optional[str] = None,
+    limit: int = 100,
+    db: Session = Depends(get_primary_db)
+):
+    return crud.find_availability(db=db, start=start, end=end, duration=timedelta(minutes=duration), specialty=specialty, limit=limit)
+
+# GET - Open slots for one doctor
+@app.get("/doctors/{doctor_id}/availability", response_model=schemas.DoctorAvailability)
+def get_doctor_availability(
+    doctor_id: int,
+    start: datetime = Query(alias="from"),
+    end: datetime = Query(alias="to"),
+    duration: int = config.APPOINTMENT_DURATION_MINUTES,
+    db: Session = Depends(get_primary_db)
+):
+    return crud.get_doctor_availability(db=db, doctor_id=doctor_id, start=start, end=end, duration=timedelta(minutes=duration))
+
+# Doctors come from the catalog cache, so their validators are computed from the cached records.
+# Catalog routes read the primary: a lagging replica could refill the cache right after a write cleared it.
 @app.get("/doctors/{doctor_id}", response_model=schemas.Doctor)
-def get_doctor(doctor_id: int, db: Session = Depends(get_db)):
+def get_doctor(doctor_id: int, request: Request, response: Response, fields: Optional[str] = None, db: Session = Depends(get_primary_db)):
+    projection = field_list(fields)
     db_doctor = crud.get_doctor(db=db, doctor_id=doctor_id)
     if db_doctor is None:
         raise HTTPException(status_code=404, detail="Doctor not found")
-    return db_doctor
+    not_modified = check_record(request, response, doctor_id, db_doctor.UpdatedAt, projection)
+    if not_modified is not None:
+        return not_modified
+    if projection is None:
+        return db_doctor
+    return serialization.rows(response, crud.get_doctor(db=db, doctor_id=doctor_id, fields=projection))
 
 @app.get("/doctors/", response_model=list[schemas.Doctor])
-def get_doctors(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_doctors(db=db, skip=skip, limit=limit)
+def get_doctors(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_primary_db)
+):
+    projection = field_list(fields)
+    doctors = crud.get_doctors(db=db, skip=skip, limit=limit, cursor=cursor)
+    not_modified = check_page(request, response, [(doctor.DoctorID, doctor.UpdatedAt) for doctor in doctors], projection)
+    if not_modified is not None:
+        return not_modified
+    set_next_cursor(response, crud.next_cursor(doctors, limit, "DoctorID"))
+    if projection is None:
+        return serialization.models(response, schemas.DoctorList, doctors)
+    return serialization.rows(response, crud.get_doctors(db=db, skip=skip, limit=limit, cursor=cursor, fields=projection))
 
 # PUT - Update Doctor
 @app.put("/doctors/{doctor_id}", response_model=schemas.Doctor)
-def update_doctor(doctor_id: int, doctor: schemas.DoctorCreate, db: Session = Depends(get_db)):
-    db_doctor = crud.get_doctor(db=db, doctor_id=doctor_id)
-    if db_doctor is None:
-        raise HTTPException(status_code=404, detail="Doctor not found")
-    return crud.update_doctor(db=db, doctor_id=doctor_id, doctor=doctor)
+def update_doctor(doctor_id: int, doctor: schemas.DoctorCreate, request: Request, response: Response, db: Session = Depends(get_db)):
+    db_doctor = crud.update_doctor(db=db, doctor_id=doctor_id, doctor=doctor, versions=if_match(request, doctor_id))
+    conditional.set_validators(response, conditional.entity_tag(doctor_id, db_doctor.UpdatedAt), db_doctor.UpdatedAt)
+    return db_doctor
 
 # DELETE - Delete Doctor
-@app.delete("/doctors/{doctor_id}", response_model=schemas.Doctor)
-def delete_doctor(doctor_id: int, db: Session = Depends(get_db)):
-    db_doctor = crud.get_doctor(db=db, doctor_id=doctor_id)
-    if db_doctor is None:
-        raise HTTPException(status_code=404, detail="Doctor not found")
-    return crud.delete_doctor(db=db, doctor_id=doctor_id)
+@app.delete("/doctors/{doctor_id}", response_model=schemas.Message)
+def delete_doctor(doctor_id: int, request: Request, db: Session = Depends(get_db)):
+    return crud.delete_doctor(db=db, doctor_id=doctor_id, versions=if_match(request, doctor_id))
 
 # ----------------- Treatment Routes -----------------
 
@@ -97,72 +305,237 @@ def delete_doctor(doctor_id: int, db: Session = Depends(get_db)):
 def create_treatment(treatment: schemas.TreatmentCreate, db: Session = Depends(get_db)):
     return crud.create_treatment(db=db, treatment=treatment)
 
+# POST - Bulk create Treatments (rows are validated individually against TreatmentCreate)
+@app.post("/treatments/bulk", response_model=schemas.BulkCreateResult)
+def bulk_create_treatments(treatments: list[dict[str, Any]], db: Session = Depends(get_db)):
+    return crud.bulk_create_treatments(db=db, treatments=treatments)
+
 @app.get("/treatments/{treatment_id}", response_model=schemas.Treatment)
-def get_treatment(treatment_id: int, db: Session = Depends(get_db)):
-    db_treatment = crud.get_treatment(db=db, treatment_id=treatment_id)
+def get_treatment(treatment_id: int, response: Response, fields: Optional[str] = None, db: Session = Depends(get_primary_db)):
+    projection = field_list(fields)
+    db_treatment = crud.get_treatment(db=db, treatment_id=treatment_id, fields=projection)
     if db_treatment is None:
         raise HTTPException(status_code=404, detail="Treatment not found")
-    return db_treatment
+    return db_treatment if projection is None else serialization.rows(response, db_treatment)
 
 @app.get("/treatments/", response_model=list[schemas.Treatment])
-def get_treatments(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_treatments(db=db, skip=skip, limit=limit)
+def get_treatments(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, fields: Optional[str] = None, db: Session = Depends(get_primary_db)):
+    projection = field_list(fields)
+    treatments = crud.get_treatments(db=db, skip=skip, limit=limit, cursor=cursor, fields=projection)
+    set_next_cursor(response, crud.next_cursor(treatments, limit, "TreatmentID"))
+    if projection is None:
+        return serialization.models(response, schemas.TreatmentList, treatments)
+    return serialization.rows(response, treatments)
 
 # PUT - Update Treatment
 @app.put("/treatments/{treatment_id}", response_model=schemas.Treatment)
 def update_treatment(treatment_id: int, treatment: schemas.TreatmentCreate, db: Session = Depends(get_db)):
-    db_treatment = crud.get_treatment(db=db, treatment_id=treatment_id)
-    if db_treatment is None:
-        raise HTTPException(status_code=404, detail="Treatment not found")
     return crud.update_treatment(db=db, treatment_id=treatment_id, treatment=treatment)
 
 # DELETE - Delete Treatment
-@app.delete("/treatments/{treatment_id}", response_model=schemas.Treatment)
+@app.delete("/treatments/{treatment_id}", response_model=schemas.Message)
 def delete_treatment(treatment_id: int, db: Session = Depends(get_db)):
-    db_treatment = crud.get_treatment(db=db, treatment_id=treatment_id)
-    if db_treatment is None:
-        raise HTTPException(status_code=404, detail="Treatment not found")
     return crud.delete_treatment(db=db, treatment_id=treatment_id)
 
 # ----------------- Appointment Routes -----------------
 
+# POST - Create Appointment (with APPOINTMENT_GROUP_COMMIT, committed together with concurrent bookings).
+# Async so that bookings waiting for their batch to commit do not each hold a threadpool worker.
 @app.post("/appointments/", response_model=schemas.Appointment)
-def create_appointment(appointment: schemas.AppointmentCreate, db: Session = Depends(get_db)):
-    return crud.create_appointment(db=db, appointment=appointment)
+async def create_appointment(appointment: schemas.AppointmentCreate, db: Session = Depends(get_db)):
+    if config.APPOINTMENT_GROUP_COMMIT:
+        values = crud.appointment_values(appointment)
+        # Raises the booking's own 409 or error
+        appointment_id = await asyncio.wrap_future(group_commit.appointments.submit(values))
+        return dict(values, AppointmentID=appointment_id, treatments=[])
+    return await run_in_threadpool(crud.create_appointment, db=db, appointment=appointment)
+
+# POST - Bulk create Appointments (rows are validated individually against AppointmentCreate)
+@app.post("/appointments/bulk", response_model=schemas.BulkCreateResult)
+def bulk_create_appointments(appointments: list[dict[str, Any]], db: Session = Depends(get_db)):
+    return crud.bulk_create_appointments(db=db, appointments=appointments)
+
+# GET - Treatments of many appointments in one query: `?ids=1,2,3` (or repeated `ids`), or a `from`/`to` range
+@app.get("/appointments/treatments", response_model=list[schemas.AppointmentTreatmentDetail])
+def get_appointment_treatment_details(
+    response: Response,
+    ids: Optional[list[str]] = Query(None),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    limit: int = Query(config.TREATMENT_DETAILS_MAX_APPOINTMENTS, gt=0, le=config.TREATMENT_DETAILS_MAX_APPOINTMENTS),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    appointment_ids = None
+    if ids is not None:
+        try:
+            appointment_ids = {int(value) for values in ids for value in values.split(",") if value.strip()}
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+    rows, next_page = crud.get_appointment_treatment_details(
+        db=db, ids=appointment_ids, start=start, end=end, limit=limit, cursor=cursor
+    )
+    set_next_cursor(response, next_page)
+    return rows
+
+# GET - Upcoming appointments with patient and doctor names, optionally for one doctor and/or one day
+@app.get("/appointments/upcoming", response_model=list[schemas.UpcomingAppointment])
+def get_upcoming_appointments(
+    response: Response,
+    doctor_id: Optional[int] = None,
+    day: Optional[date] = None,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    appointments = crud.get_upcoming_appointments(db=db, doctor_id=doctor_id, day=day, skip=skip, limit=limit, cursor=cursor)
+    set_next_cursor(response, crud.next_cursor(appointments, limit, "AppointmentDate", "AppointmentID"))
+    return appointments
+
+# GET - Stream appointments with patient, doctor and treatment names as NDJSON or CSV
+@app.get("/appointments/export")
+def export_appointments(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to")
+):
+    # The stream outlives the request's dependencies, so it opens and closes its own (routed) session
+    def generate():
+        db = database.session_for(request)
+        try:
+            yield from export.encode(crud.iter_appointment_export(db, start=start, end=end), format)
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        generate(),
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="appointments.{format}"'}
+    )
+
+# GET - Server-Sent Events stream of appointment changes, optionally of one doctor's appointments only.
+# Reconnecting clients resume after the Last-Event-ID header (or ?last_event_id=, for the first connect);
+# without either the stream starts with changes made from now on. Read from the primary via the async engine.
+@app.get("/appointments/changes")
+def appointment_changes(
+    doctor_id: Optional[int] = None,
+    last_event_id: Optional[int] = None,
+    last_event_id_header: Optional[int] = Header(None, alias="Last-Event-ID")
+):
+    resume_after = last_event_id_header if last_event_id_header is not None else last_event_id
+    return StreamingResponse(
+        changes.stream(last_event_id=resume_after, doctor_id=doctor_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # Keep proxies from buffering events
+    )
 
 @app.get("/appointments/{appointment_id}", response_model=schemas.Appointment)
-def get_appointment(appointment_id: int, db: Session = Depends(get_db)):
-    db_appointment = crud.get_appointment(db=db, appointment_id=appointment_id)
+def get_appointment(appointment_id: int, request: Request, response: Response, fields: Optional[str] = None, db: Session = Depends(get_db)):
+    projection = field_list(fields)
+    updated_at, treatments = crud.get_appointment_version(db, appointment_id, projection)
+    not_modified = check_record(request, response, appointment_id, updated_at, projection, treatments)
+    if not_modified is not None:
+        return not_modified
+    db_appointment = crud.get_appointment(db=db, appointment_id=appointment_id, fields=projection)
     if db_appointment is None:
         raise HTTPException(status_code=404, detail="Appointment not found")
-    return db_appointment
+    return db_appointment if projection is None else serialization.rows(response, db_appointment)
 
+# GET - Appointments by date, optionally within a `from`/`to` range (archived ones are read only when the range reaches them)
 @app.get("/appointments/", response_model=list[schemas.Appointment])
-def get_appointments(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_appointments(db=db, skip=skip, limit=limit)
+def get_appointments(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    db: Session = Depends(get_db)
+):
+    projection = field_list(fields)
+    page_versions = functools.partial(
+        crud.get_page_versions, db, Appointment, skip=skip, limit=limit, cursor=cursor, start=start, end=end, fields=projection
+    )
+    not_modified = probe_page(request, page_versions, projection)
+    if not_modified is not None:
+        return not_modified
+    appointments = crud.get_appointments(
+        db=db, skip=skip, limit=limit, cursor=cursor, fields=page_fields(projection), start=start, end=end
+    )
+    tag_page(response, appointments, "AppointmentID", projection)
+    set_next_cursor(response, crud.next_cursor(appointments, limit, "AppointmentDate", "AppointmentID"))
+    return serialization.rows(response, appointments)
 
 # PUT - Update Appointment
 @app.put("/appointments/{appointment_id}", response_model=schemas.Appointment)
-def update_appointment(appointment_id: int, appointment: schemas.AppointmentCreate, db: Session = Depends(get_db)):
-    db_appointment = crud.get_appointment(db=db, appointment_id=appointment_id)
-    if db_appointment is None:
-        raise HTTPException(status_code=404, detail="Appointment not found")
-    return crud.update_appointment(db=db, appointment_id=appointment_id, appointment=appointment)
+def update_appointment(appointment_id: int, appointment: schemas.AppointmentCreate, request: Request, response: Response, db: Session = Depends(get_db)):
+    db_appointment = crud.update_appointment(db=db, appointment_id=appointment_id, appointment=appointment, versions=if_match(request, appointment_id))
+    updated_at = db_appointment["UpdatedAt"]
+    etag = conditional.entity_tag(appointment_id, updated_at, extra=crud.treatments_version(db_appointment["treatments"]))
+    conditional.set_validators(response, etag, updated_at)
+    return db_appointment
 
 # DELETE - Delete Appointment
-@app.delete("/appointments/{appointment_id}", response_model=schemas.Appointment)
-def delete_appointment(appointment_id: int, db: Session = Depends(get_db)):
-    db_appointment = crud.get_appointment(db=db, appointment_id=appointment_id)
-    if db_appointment is None:
-        raise HTTPException(status_code=404, detail="Appointment not found")
-    return crud.delete_appointment(db=db, appointment_id=appointment_id)
+@app.delete("/appointments/{appointment_id}", response_model=schemas.Message)
+def delete_appointment(appointment_id: int, request: Request, db: Session = Depends(get_db)):
+    return crud.delete_appointment(db=db, appointment_id=appointment_id, versions=if_match(request, appointment_id))
 
 # ----------------- Link Treatments to Appointment -----------------
 
-@app.post("/appointments/{appointment_id}/treatments/")
+# POST - Add treatments to an appointment (links that already exist are left alone)
+@app.post("/appointments/{appointment_id}/treatments/", response_model=schemas.TreatmentLinkResult)
 def link_treatment_to_appointment(appointment_id: int, treatment_ids: list[int], db: Session = Depends(get_db)):
-    crud.link_treatment_to_appointment(db=db, appointment_id=appointment_id, treatment_ids=treatment_ids)
-    return {"message": "Treatments linked successfully"}
+    return crud.link_treatment_to_appointment(db=db, appointment_id=appointment_id, treatment_ids=treatment_ids)
+
+# PUT - Replace the appointment's treatments with exactly this set
+@app.put("/appointments/{appointment_id}/treatments/", response_model=schemas.TreatmentLinkResult)
+def replace_appointment_treatments(appointment_id: int, treatment_ids: list[int], db: Session = Depends(get_db)):
+    return crud.replace_appointment_treatments(db=db, appointment_id=appointment_id, treatment_ids=treatment_ids)
+
+# ----------------- Analytics Routes -----------------
+# Every range is half-open: appointments on `from` up to, but not including, `to`.
+# They run on the primary, since reading a rollup first re-aggregates its dirty days.
+
+# GET - Appointments, booked minutes and utilization of working hours per doctor
+@app.get("/analytics/doctor-utilization", response_model=list[schemas.DoctorUtilization])
+def get_doctor_utilization(
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+    specialty: Optional[str] = None,
+    db: Session = Depends(get_primary_db)
+):
+    return analytics.doctor_utilization(db=db, start=start, end=end, specialty=specialty)
+
+# GET - Appointments per specialty per day
+@app.get("/analytics/specialty-daily", response_model=list[schemas.SpecialtyDailyCount])
+def get_specialty_daily(start: date = Query(..., alias="from"), end: date = Query(..., alias="to"), db: Session = Depends(get_primary_db)):
+    return analytics.specialty_daily(db=db, start=start, end=end)
+
+# GET - Most frequently used treatments
+@app.get("/analytics/treatment-frequency", response_model=list[schemas.TreatmentFrequency])
+def get_treatment_frequency(
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_primary_db)
+):
+    return analytics.treatment_frequency(db=db, start=start, end=end, limit=limit)
+
+# ----------------- Cache Statistics -----------------
+
+@app.get("/cache/stats")
+def cache_stats():
+    return cache.stats()
+
+# ----------------- Metrics -----------------
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 # ----------------- Root Endpoint -----------------
 
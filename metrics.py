@@ -0,0 +1,263 @@
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from sqlalchemy import event
+import cache
+import config
+import database
+
+# Per-route request and SQL instrumentation, exported as Prometheus text on GET /metrics.
+# MetricsMiddleware opens a RequestStats for every HTTP request; the SQLAlchemy events installed
+# by instrument_engine add each statement's count, time and rows to it, and the pools built by
+# database.create_db_engine add the time spent waiting for a pooled connection. When the request
+# finishes its totals are folded into the per-route metrics below.
+
+logger = logging.getLogger("clinic.sql")
+
+# Latency buckets in seconds, shared by every histogram
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Route label used for SQL that runs outside of an HTTP request (startup, background jobs)
+BACKGROUND = ("-", "(background)")
+
+class Histogram:
+    """Cumulative Prometheus histogram over BUCKETS, one series per label tuple."""
+
+    def __init__(self, name: str, help: str, labels: tuple, buckets: tuple = BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self.series = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, labels: tuple, value: float):
+        with _lock:
+            series = self.series.setdefault(labels, [0] * len(self.buckets) + [0.0, 0])
+            bucket = bisect.bisect_left(self.buckets, value)
+            if bucket < len(self.buckets):
+                series[bucket] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, series in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(self.labels, labels, le=bound)} {cumulative}"
+            yield f"{self.name}_bucket{_labels(self.labels, labels, le='+Inf')} {series[-1]}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {series[-2]}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {series[-1]}"
+
+class Counter:
+    """Monotonic Prometheus counter, one series per label tuple."""
+
+    def __init__(self, name: str, help: str, labels: tuple):
+        self.name, self.help, self.labels = name, help, labels
+        self.series = {}
+
+    def inc(self, labels: tuple, value: float = 1):
+        with _lock:
+            self.series[labels] = self.series.get(labels, 0) + value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted(self.series.items()):
+            yield f"{self.name}{_labels(self.labels, labels)} {value}"
+
+def _labels(names: tuple, values: tuple, **extra):
+    pairs = list(zip(names, values)) + list(extra.items())
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+_lock = threading.Lock()
+
+ROUTE = ("method", "route")
+REQUEST_LATENCY = Histogram("clinic_http_request_duration_seconds", "HTTP request latency.", ROUTE)
+REQUESTS = Counter("clinic_http_requests_total", "HTTP requests by response status.", ROUTE + ("status",))
+SQL_STATEMENTS = Counter("clinic_db_statements_total", "SQL statements executed.", ROUTE)
+SQL_PER_REQUEST = Histogram("clinic_db_statements_per_request", "SQL statements per HTTP request.", ROUTE,
+                            buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100, 250, 1000))
+SQL_TIME = Counter("clinic_db_query_seconds_total", "Time spent executing SQL statements.", ROUTE)
+SQL_ROWS = Counter("clinic_db_rows_total", "Rows fetched from SELECTs plus rows affected by writes.", ROUTE)
+POOL_WAIT = Counter("clinic_db_pool_wait_seconds_total", "Time spent waiting for a pooled connection.", ROUTE)
+
+# Group commit (see group_commit.py)
+WRITE_BATCH_SIZE = Histogram("clinic_group_commit_batch_size", "Items committed per group-commit transaction.", ("queue",),
+                             buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500))
+WRITE_QUEUE_WAIT = Histogram("clinic_group_commit_queue_wait_seconds", "Time items waited before their batch was written.", ("queue",))
+
+METRICS = [REQUEST_LATENCY, REQUESTS, SQL_STATEMENTS, SQL_PER_REQUEST, SQL_TIME, SQL_ROWS, POOL_WAIT, WRITE_BATCH_SIZE, WRITE_QUEUE_WAIT]
+
+class RequestStats:
+    """SQL totals accumulated while handling one request."""
+
+    def __init__(self, scope: dict = None):
+        self.scope = scope
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.rows = 0
+        self.pool_wait = 0.0
+
+    @property
+    def route(self):
+        """(method, route template) once routing has happened, e.g. ("GET", "/patients/{patient_id}")."""
+        if self.scope is None:
+            return BACKGROUND
+        route = self.scope.get("route")
+        return self.scope["method"], getattr(route, "path", "(unmatched)")
+
+_current = contextvars.ContextVar("request_stats", default=None)
+
+def current_stats():
+    """RequestStats of the request being handled, or None outside of a request."""
+    return _current.get()
+
+def _record_sql(stats: RequestStats, seconds: float, rows: int):
+    if stats is not None:
+        stats.statements += 1
+        stats.sql_seconds += seconds
+        stats.rows += rows
+    else:
+        SQL_STATEMENTS.inc(BACKGROUND)
+        SQL_TIME.inc(BACKGROUND, seconds)
+        SQL_ROWS.inc(BACKGROUND, rows)
+
+class _CountingCursor:
+    """DBAPI cursor proxy that adds fetched rows to the request's stats."""
+
+    def __init__(self, cursor, stats: RequestStats):
+        self._cursor = cursor
+        self._stats = stats
+
+    def _count(self, rows):
+        if self._stats is not None:
+            self._stats.rows += rows
+        else:
+            SQL_ROWS.inc(BACKGROUND, rows)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._count(1)
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._cursor.fetchmany(*args)
+        self._count(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._count(len(rows))
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+def instrument_engine(engine):
+    """Install the SQL timing, row counting and slow query hooks on a (sync) engine."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        stats = current_stats()
+        if cursor.description is not None and context is not None:
+            # Rows of a SELECT are counted as the result fetches them
+            context.cursor = _CountingCursor(cursor, stats)
+            _record_sql(stats, elapsed, 0)
+        else:
+            _record_sql(stats, elapsed, max(cursor.rowcount, 0))
+
+        if elapsed * 1000 >= config.SLOW_QUERY_MS:
+            method, route = stats.route if stats is not None else BACKGROUND
+            logger.warning("Slow query (%.1f ms) on %s %s: %s", elapsed * 1000, method, route, " ".join(statement.split()))
+
+def _record_pool_wait(waited: float):
+    stats = current_stats()
+    if stats is not None:
+        stats.pool_wait += waited
+    else:
+        POOL_WAIT.inc(BACKGROUND, waited)
+
+# Pool waits are timed by the pools of every engine from database.create_db_engine
+database.pool_wait_listeners.append(_record_pool_wait)
+
+def _server_timing(stats: RequestStats):
+    app_ms = (time.perf_counter() - stats.started) * 1000
+    return (
+        f'db;dur={stats.sql_seconds * 1000:.1f};desc="{stats.statements} queries", '
+        f"pool;dur={stats.pool_wait * 1000:.1f}, app;dur={app_ms:.1f}"
+    )
+
+class MetricsMiddleware:
+    """ASGI middleware that times each request and attributes its SQL work to the matched route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(scope)
+        token = _current.set(stats)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if config.METRICS_SERVER_TIMING:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", _server_timing(stats).encode()))
+                    message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            route = stats.route
+            REQUEST_LATENCY.observe(route, time.perf_counter() - stats.started)
+            REQUESTS.inc(route + (str(status),))
+            SQL_STATEMENTS.inc(route, stats.statements)
+            SQL_PER_REQUEST.observe(route, stats.statements)
+            SQL_TIME.inc(route, stats.sql_seconds)
+            SQL_ROWS.inc(route, stats.rows)
+            POOL_WAIT.inc(route, stats.pool_wait)
+
+def _cache_lines():
+    stats = cache.stats()
+    for counter in ("hits", "misses", "evictions"):
+        name = f"clinic_cache_{counter}_total"
+        yield f"# HELP {name} Catalog cache {counter}."
+        yield f"# TYPE {name} counter"
+        for cache_name, values in sorted(stats.items()):
+            yield f'{name}{{cache="{cache_name}"}} {values[counter]}'
+
+def _replica_lines():
+    status = database.replicas.status()
+    if not status:
+        return
+    yield "# HELP clinic_db_replica_healthy Whether a read replica passed its last health check."
+    yield "# TYPE clinic_db_replica_healthy gauge"
+    for replica in status:
+        yield f'clinic_db_replica_healthy{{replica="{replica["replica"]}"}} {int(replica["healthy"])}'
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = [line for metric in METRICS for line in metric.render()]
+    lines.extend(_cache_lines())
+    lines.extend(_replica_lines())
+    return "\n".join(lines) + "\n"
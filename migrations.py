@@ -0,0 +1,53 @@
+import logging
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateColumn
+from database import Base
+import models  # registers every table on Base.metadata
+
+# Schema upgrades for databases created by an older version of the models.
+# Base.metadata.create_all() creates missing tables but never alters existing ones, so columns and
+# indexes added to a model later (Patients.Gender, Doctors.AvailabilityHours, the Doctors.Specialty
+# and Appointments date indexes) would be missing from an existing database and every query that
+# selects them would fail. upgrade_schema() runs after create_all at startup and adds them: each
+# missing column with ALTER TABLE ... ADD COLUMN, each missing index with CREATE INDEX. It only ever
+# adds, so it is safe to run on every start. Rebuilding a SQLite Appointments table with
+# AUTOINCREMENT is a separate, offline step (python archive.py --migrate-ids).
+
+logger = logging.getLogger("clinic.migrations")
+
+# Value given to existing rows by a NOT NULL column that has no server default.
+# Gender was not recorded before the column existed, so those patients get an empty one.
+BACKFILL_VALUES = {
+    ("Patients", "Gender"): "",
+}
+
+def _add_column(conn, table, column):
+    ddl = CreateColumn(column).compile(dialect=conn.dialect)
+    backfill = BACKFILL_VALUES.get((table.name, column.name))
+    if backfill is not None:
+        # Existing rows need a value to satisfy NOT NULL; new rows always get one from the API
+        ddl = f"{ddl} DEFAULT {column.type.literal_processor(conn.dialect)(backfill)}"
+    conn.execute(text(f"ALTER TABLE {conn.dialect.identifier_preparer.format_table(table)} ADD COLUMN {ddl}"))
+
+def upgrade_schema(engine: Engine):
+    """Add the model columns and indexes an existing database is missing. Returns the names added."""
+    added = []
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue  # created by create_all with everything already in place
+            columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    _add_column(conn, table, column)
+                    added.append(f"{table.name}.{column.name}")
+            indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn)
+                    added.append(index.name)
+    for name in added:
+        logger.info("schema upgrade: added %s", name)
+    return added
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, DateTime, Text, Table, UniqueConstraint, func
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, DateTime, Text, Table, UniqueConstraint, Index, func
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -18,6 +18,7 @@ class Patient(Base):
     DateOfBirth = Column(Date, nullable=False)
     PhoneNumber = Column(String(15), unique=True, nullable=False)
     Email = Column(String(100), unique=True)
+    Gender = Column(String(10), nullable=False)
 
     CreatedAt = Column(DateTime, server_default=func.now())
     UpdatedAt = Column(DateTime, server_default=func.now(), onupdate=func.now())
@@ -29,9 +30,10 @@ class Doctor(Base):
 
     DoctorID = Column(Integer, primary_key=True, index=True)
     FullName = Column(String(100), nullable=False)
-    Specialty = Column(String(100), nullable=False)
+    Specialty = Column(String(100), nullable=False, index=True)
     PhoneNumber = Column(String(15), unique=True)
     Email = Column(String(100), unique=True)
+    AvailabilityHours = Column(String(100))  # Working-hours template, e.g. "Mon-Fri 9AM-5PM"
 
     CreatedAt = Column(DateTime, server_default=func.now())
     UpdatedAt = Column(DateTime, server_default=func.now(), onupdate=func.now())
@@ -49,11 +51,18 @@ class Treatment(Base):
 
 class Appointment(Base):
     __tablename__ = "Appointments"
+    __table_args__ = (
+        # Per-doctor and per-patient schedules, used for range probes by the double-booking check
+        Index("ix_Appointments_DoctorID_AppointmentDate", "DoctorID", "AppointmentDate"),
+        Index("ix_Appointments_PatientID_AppointmentDate", "PatientID", "AppointmentDate"),
+        # Never reuse the ID of a row that was moved to AppointmentsArchive (plain SQLite rowids can be)
+        {"sqlite_autoincrement": True},
+    )
 
     AppointmentID = Column(Integer, primary_key=True, index=True)
     PatientID = Column(Integer, ForeignKey("Patients.PatientID", ondelete="CASCADE"), nullable=False)
     DoctorID = Column(Integer, ForeignKey("Doctors.DoctorID", ondelete="SET NULL"), nullable=True)
-    AppointmentDate = Column(DateTime, nullable=False)
+    AppointmentDate = Column(DateTime, nullable=False, index=True)  # Sort/seek key for keyset pagination
     Reason = Column(String(255))
 
     CreatedAt = Column(DateTime, server_default=func.now())
@@ -62,3 +71,99 @@ class Appointment(Base):
     patient = relationship("Patient", back_populates="appointments")
     doctor = relationship("Doctor", back_populates="appointments")
     treatments = relationship("Treatment", secondary=appointment_treatment_table, back_populates="appointments")
+
+# Denormalized copy of the UpcomingAppointments view: future appointments with a doctor, with the
+# patient and doctor names copied in. crud.py rewrites an appointment's row whenever it is written and
+# prunes past rows, so GET /appointments/upcoming is an index range scan with no joins.
+# Deleting the appointment or the doctor removes the row through the foreign keys.
+class UpcomingAppointmentsSummary(Base):
+    __tablename__ = "UpcomingAppointmentsSummary"
+    __table_args__ = (
+        Index("ix_UpcomingAppointmentsSummary_DoctorID_AppointmentDate", "DoctorID", "AppointmentDate"),
+    )
+
+    AppointmentID = Column(Integer, ForeignKey("Appointments.AppointmentID", ondelete="CASCADE"), primary_key=True)
+    PatientID = Column(Integer, nullable=False, index=True)
+    Patient = Column(String(100), nullable=False)  # Patients.FullName
+    DoctorID = Column(Integer, ForeignKey("Doctors.DoctorID", ondelete="CASCADE"), nullable=False)
+    Doctor = Column(String(100), nullable=False)  # Doctors.FullName
+    AppointmentDate = Column(DateTime, nullable=False, index=True)
+    Reason = Column(String(255))
+
+# Prefix index for patient search (see search.py): one row per (token, patient), where the tokens are
+# the words of the name, the digits of the phone number and the lower-cased email. The primary key
+# makes every "token starts with ..." lookup a range scan. Kept in sync by the patient writes in crud.py.
+class PatientSearchToken(Base):
+    __tablename__ = "PatientSearchTokens"
+
+    Token = Column(String(100), primary_key=True)
+    PatientID = Column(Integer, ForeignKey("Patients.PatientID", ondelete="CASCADE"), primary_key=True, index=True)
+
+# Daily rollups for the analytics routes (see analytics.py): appointments per doctor per day and
+# treatment uses per day. Appointment writes mark the days they touch in AnalyticsDirtyDays, and
+# those days are re-aggregated before a rollup is read, so long date ranges never scan Appointments.
+class DailyDoctorAppointments(Base):
+    __tablename__ = "DailyDoctorAppointments"
+
+    Day = Column(Date, primary_key=True)
+    DoctorID = Column(Integer, ForeignKey("Doctors.DoctorID", ondelete="CASCADE"), primary_key=True, index=True)
+    Appointments = Column(Integer, nullable=False)
+
+class DailyTreatmentUses(Base):
+    __tablename__ = "DailyTreatmentUses"
+
+    Day = Column(Date, primary_key=True)
+    TreatmentID = Column(Integer, ForeignKey("Treatments.TreatmentID", ondelete="CASCADE"), primary_key=True, index=True)
+    Uses = Column(Integer, nullable=False)
+
+class AnalyticsDirtyDay(Base):
+    __tablename__ = "AnalyticsDirtyDays"
+
+    Day = Column(Date, primary_key=True)  # Day whose rollup rows are out of date
+
+# Cold storage for finished appointments (see archive.py). Rows older than the archive cutoff are
+# moved here with their treatment links in small batches, keeping Appointments, its indexes and
+# the double-booking probes sized to recent and upcoming visits. Reads that reach back past the
+# newest archived appointment include these tables; archived appointments are read-only.
+archived_appointment_treatment_table = Table(
+    "ArchivedAppointment_Treatments",
+    Base.metadata,
+    Column("AppointmentID", Integer, ForeignKey("AppointmentsArchive.AppointmentID", ondelete="CASCADE"), primary_key=True),
+    Column("TreatmentID", Integer, ForeignKey("Treatments.TreatmentID", ondelete="CASCADE"), primary_key=True, index=True)
+)
+
+class AppointmentArchive(Base):
+    __tablename__ = "AppointmentsArchive"
+    __table_args__ = (
+        Index("ix_AppointmentsArchive_PatientID_AppointmentDate", "PatientID", "AppointmentDate"),
+    )
+
+    AppointmentID = Column(Integer, primary_key=True, autoincrement=False)  # Kept from Appointments
+    PatientID = Column(Integer, ForeignKey("Patients.PatientID", ondelete="CASCADE"), nullable=False)
+    DoctorID = Column(Integer, ForeignKey("Doctors.DoctorID", ondelete="SET NULL"), nullable=True, index=True)
+    AppointmentDate = Column(DateTime, nullable=False, index=True)
+    Reason = Column(String(255))
+
+    CreatedAt = Column(DateTime)
+    UpdatedAt = Column(DateTime)
+
+# Outbox behind the appointment change feed (see changes.py). crud.py adds one row per affected
+# appointment in the same transaction as each appointment or treatment-link write, so an event
+# exists exactly when its write committed and survives restarts. ChangeID is the SSE event ID
+# clients resume from; the DoctorID index serves the per-doctor feed. No foreign keys, since
+# deleted appointments (and doctors) keep their events.
+class AppointmentChange(Base):
+    __tablename__ = "AppointmentChanges"
+    __table_args__ = (
+        Index("ix_AppointmentChanges_DoctorID_ChangeID", "DoctorID", "ChangeID"),
+        # Never hand out a ChangeID again after the newest events were pruned
+        {"sqlite_autoincrement": True},
+    )
+
+    ChangeID = Column(Integer, primary_key=True)
+    Kind = Column(String(20), nullable=False)  # created, updated, moved, deleted or treatments
+    AppointmentID = Column(Integer, nullable=False)
+    DoctorID = Column(Integer, nullable=True)  # For "moved", the doctor the appointment was taken from
+    PatientID = Column(Integer, nullable=False)
+    AppointmentDate = Column(DateTime, nullable=False)
+    ChangedAt = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,183 @@
+import argparse
+import csv
+import io
+import logging
+import time
+from datetime import datetime
+from pydantic import ValidationError
+from sqlalchemy import bindparam, or_
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+import config
+import crud
+from models import Patient
+from schemas import PatientCreate, PatientImportResult, BulkRowError
+
+# Chunked CSV import of patients with upsert on PhoneNumber/Email.
+# The CSV is read as a stream, validated row by row against PatientCreate and written in
+# chunks of IMPORT_CHUNK_SIZE rows, each committed in its own transaction. A row whose phone
+# number or email already exists updates that patient instead of failing on the unique constraint.
+#
+# Usage: python patient_import.py patients.csv [--chunk-size 1000]
+
+# Columns overwritten when an imported row matches an existing patient
+UPSERT_COLUMNS = ["FullName", "DateOfBirth", "PhoneNumber", "Email", "Gender", "UpdatedAt"]
+
+# Dialects with a native multi-row upsert
+UPSERT_DIALECTS = ("mysql", "sqlite", "postgresql")
+
+# Keep at most this many per-row errors in the result; `failed` still counts all of them
+MAX_REPORTED_ERRORS = 1000
+
+# Per-chunk progress of imports run through the API; the CLI prints it instead
+logger = logging.getLogger("clinic.import")
+
+def _upsert_statement(dialect: str, rows: list):
+    """Build a multi-row INSERT that updates the existing patient on a PhoneNumber conflict."""
+    table = Patient.__table__
+    if dialect == "mysql":
+        stmt = mysql.insert(table).values(rows)
+        return stmt.on_duplicate_key_update({column: stmt.inserted[column] for column in UPSERT_COLUMNS})
+    stmt = (sqlite if dialect == "sqlite" else postgresql).insert(table).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=["PhoneNumber"],
+        set_={column: stmt.excluded[column] for column in UPSERT_COLUMNS}
+    )
+
+def _upsert_chunk(db: Session, chunk: list):
+    """Upsert a chunk of (line, values) rows. Returns (rows written, per-row errors)."""
+    dialect = db.get_bind().dialect.name
+    phones = [values["PhoneNumber"] for _, values in chunk]
+    emails = [values["Email"] for _, values in chunk if values["Email"]]
+    existing = db.query(Patient.PatientID, Patient.PhoneNumber, Patient.Email).filter(
+        or_(Patient.PhoneNumber.in_(phones), Patient.Email.in_(emails))
+    ).all()
+    by_phone = {row.PhoneNumber: row.PatientID for row in existing}
+    by_email = {row.Email: row.PatientID for row in existing if row.Email}
+
+    upserts, updates, errors = [], [], []
+    for line, values in chunk:
+        phone_match, email_match = by_phone.get(values["PhoneNumber"]), by_email.get(values["Email"])
+        if phone_match and email_match and phone_match != email_match:
+            errors.append(BulkRowError(index=line, detail="PhoneNumber and Email belong to different patients"))
+        elif email_match and not phone_match:
+            # Same patient under a new phone number: update it by ID
+            updates.append(dict(values, match_id=email_match))
+        elif phone_match and dialect not in UPSERT_DIALECTS:
+            updates.append(dict(values, match_id=phone_match))
+        else:
+            upserts.append(dict(values, CreatedAt=values["UpdatedAt"]))
+
+    if upserts:
+        stmt = _upsert_statement(dialect, upserts) if dialect in UPSERT_DIALECTS else Patient.__table__.insert().values(upserts)
+        db.execute(stmt)
+    if updates:
+        table = Patient.__table__
+        db.execute(
+            table.update()
+            .where(table.c.PatientID == bindparam("match_id"))
+            .values({column: bindparam(column) for column in UPSERT_COLUMNS}),
+            updates
+        )
+    if existing:
+        # Existing patients may have been renamed; keep their upcoming appointments in step
+        crud.sync_upcoming_names(db, Patient, [row.PatientID for row in existing])
+    # Written rows end up with the phone number from the file, so that finds them for re-indexing
+    crud.reindex_patients(db, Patient.PhoneNumber.in_(phones))
+    return len(upserts) + len(updates), errors
+
+def _read_chunks(lines, chunk_size: int, result: PatientImportResult):
+    """Parse and validate CSV rows, yielding de-duplicated chunks of (line, values).
+
+    Within a chunk the last row for a phone number or email wins. Across chunks the upsert
+    gives the same last-row-wins result, so the whole file never has to be held in memory.
+    """
+    chunk = {}  # PhoneNumber -> (line, values), in file order
+    email_owner = {}  # Email -> PhoneNumber of the row that currently holds it
+    for line, row in enumerate(csv.DictReader(lines), start=2):
+        result.processed += 1
+        try:
+            patient = PatientCreate.model_validate({key: value or None for key, value in row.items() if key})
+        except ValidationError as e:
+            _add_error(result, line, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+            continue
+
+        values = patient.model_dump()
+        values["UpdatedAt"] = datetime.utcnow()
+        phone, email = values["PhoneNumber"], values["Email"]
+        if phone in chunk:
+            result.duplicates += 1
+            previous_email = chunk.pop(phone)[1]["Email"]
+            email_owner.pop(previous_email, None)
+        if email and email in email_owner:
+            result.duplicates += 1
+            chunk.pop(email_owner.pop(email), None)
+        chunk[phone] = (line, values)
+        if email:
+            email_owner[email] = phone
+
+        if len(chunk) >= chunk_size:
+            yield list(chunk.values())
+            chunk, email_owner = {}, {}
+    if chunk:
+        yield list(chunk.values())
+
+def _add_error(result: PatientImportResult, line: int, detail: str):
+    result.failed += 1
+    if len(result.errors) < MAX_REPORTED_ERRORS:
+        result.errors.append(BulkRowError(index=line, detail=detail))
+
+def import_patients(db: Session, lines, chunk_size: int = config.IMPORT_CHUNK_SIZE, log=logger.info):
+    """Import patients from an iterable of CSV lines (with a header row), committing every `chunk_size` rows.
+
+    Per-row errors are reported with their CSV line number. A chunk that fails in the database is
+    retried row by row so one bad row does not discard the chunk. Progress and throughput are
+    reported through `log` after every chunk (the `clinic.import` logger by default).
+    """
+    result = PatientImportResult()
+    started = time.perf_counter()
+    for chunk in _read_chunks(lines, chunk_size, result):
+        try:
+            written, errors = _upsert_chunk(db, chunk)
+            db.commit()
+        except DBAPIError:
+            db.rollback()
+            written, errors = 0, []
+            for row in chunk:
+                try:
+                    row_written, row_errors = _upsert_chunk(db, [row])
+                    db.commit()
+                except DBAPIError as e:
+                    db.rollback()
+                    errors.append(BulkRowError(index=row[0], detail=str(e.orig)))
+                    continue
+                written += row_written
+                errors.extend(row_errors)
+        result.upserted += written
+        for error in errors:
+            _add_error(result, error.index, error.detail)
+
+        elapsed = time.perf_counter() - started
+        log(f"Imported {result.upserted} patients from {result.processed} rows ({result.processed / elapsed:.0f} rows/s)")
+
+    result.errors.sort(key=lambda error: error.index)
+    return result
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Import patients from a CSV file, upserting on PhoneNumber/Email.")
+    parser.add_argument("csv_file", help="CSV with columns FullName, DateOfBirth, PhoneNumber, Email, Gender")
+    parser.add_argument("--chunk-size", type=int, default=config.IMPORT_CHUNK_SIZE, help="rows per transaction")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        with io.open(args.csv_file, newline="", encoding="utf-8-sig") as csv_file:
+            summary = import_patients(db, csv_file, chunk_size=args.chunk_size, log=print)
+    finally:
+        db.close()
+    print(f"Done: {summary.upserted} upserted, {summary.duplicates} duplicates skipped, {summary.failed} failed")
+    for error in summary.errors:
+        print(f"  line {error.index}: {error.detail}")
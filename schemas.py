@@ -1,6 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter, field_validator
 from typing import Optional, List
 from datetime import date, datetime
+from availability import parse_availability
 
 # ----------------------------------------
 # Shared config class for Pydantic models
@@ -52,6 +53,14 @@ class DoctorBase(BaseModel):
     Specialty: str  # Doctor's specialty
     PhoneNumber: Optional[str]  # Doctor's phone number (optional)
     Email: Optional[str]  # Doctor's email (optional)
+    AvailabilityHours: Optional[str] = None  # Working-hours template, e.g. "Mon-Fri 9AM-5PM" (optional)
+
+    @field_validator("AvailabilityHours")
+    @classmethod
+    def check_availability(cls, value):
+        if value is not None:
+            parse_availability(value)  # Raises ValueError for templates the slot finder cannot read
+        return value
 
 # Doctor Create Schema (inherits from DoctorBase)
 class DoctorCreate(DoctorBase):
@@ -63,6 +72,7 @@ class DoctorUpdate(DoctorBase):
     Specialty: Optional[str]
     PhoneNumber: Optional[str]
     Email: Optional[str]
+    AvailabilityHours: Optional[str] = None
 
 # Doctor Schema (includes DoctorID, CreatedAt, and UpdatedAt for returning data)
 class Doctor(DoctorBase):
@@ -134,6 +144,15 @@ class Appointment(AppointmentBase):
 # Custom Response Schemas
 # ----------------------------------------
 
+# Plain confirmation message (e.g. returned by DELETE routes)
+class Message(BaseModel):
+    message: str  # Human-readable result
+
+# Result of linking treatments to an appointment (POST adds, PUT replaces the whole set)
+class TreatmentLinkResult(Message):
+    added: int = 0  # Links that did not exist before
+    removed: int = 0  # Links dropped because they were not in the new set (PUT only)
+
 # Upcoming Appointment Schema for viewing upcoming appointments (with Patient and Doctor names)
 class UpcomingAppointment(BaseModel):
     AppointmentID: int  # Appointment ID
@@ -154,3 +173,75 @@ class AppointmentTreatmentDetail(BaseModel):
 
     class Config(ConfigORM):  # Uses shared config
         pass
+
+# Free appointment slot returned by the availability search
+class AvailabilitySlot(BaseModel):
+    Start: datetime  # When the slot starts
+    End: datetime  # When the slot ends
+
+# Open slots of a single doctor within the searched range
+class DoctorAvailability(BaseModel):
+    DoctorID: int  # Doctor ID
+    FullName: str  # Full name of the doctor
+    Specialty: str  # Doctor's specialty
+    Slots: List[AvailabilitySlot] = []  # Free slots in chronological order
+
+# ----------------------------------------
+# Bulk Create Schemas
+# ----------------------------------------
+
+# Error for a single row of a bulk create request
+class BulkRowError(BaseModel):
+    index: int  # Position of the row in the request body
+    detail: str  # Validation or database error message
+
+# Result of a bulk create request
+class BulkCreateResult(BaseModel):
+    created: int = 0  # Number of rows inserted
+    ids: List[int] = []  # IDs of the inserted rows in request order (empty if the database cannot return them)
+    errors: List[BulkRowError] = []  # Rows that were rejected
+
+# Result of a patient CSV import (errors are indexed by CSV line number)
+class PatientImportResult(BaseModel):
+    processed: int = 0  # Data rows read from the file
+    upserted: int = 0  # Patients inserted or updated
+    duplicates: int = 0  # Rows superseded by a later row with the same phone number or email
+    failed: int = 0  # Rows rejected by validation or the database
+    errors: List[BulkRowError] = []  # First rejected rows with their reasons
+
+# ----------------------------------------
+# Analytics Schemas
+# ----------------------------------------
+
+# Booked share of a doctor's working hours over a date range
+class DoctorUtilization(BaseModel):
+    DoctorID: int  # Doctor ID
+    FullName: str  # Full name of the doctor
+    Specialty: str  # Doctor's specialty
+    Appointments: int  # Appointments in the range
+    BookedMinutes: int  # Appointments x APPOINTMENT_DURATION_MINUTES
+    AvailableMinutes: int  # Working minutes in the range according to AvailabilityHours
+    Utilization: Optional[float]  # BookedMinutes / AvailableMinutes (None without working hours in the range)
+
+# Appointments per specialty on one day
+class SpecialtyDailyCount(BaseModel):
+    Day: date  # Calendar day
+    Specialty: str  # Doctor specialty
+    Appointments: int  # Appointments with doctors of this specialty that day
+
+# How often a treatment was linked to appointments in a date range
+class TreatmentFrequency(BaseModel):
+    TreatmentID: int  # Treatment ID
+    Name: str  # Name of the treatment
+    Uses: int  # Appointments in the range linked to this treatment
+
+# ----------------------------------------
+# Precompiled List Adapters
+# ----------------------------------------
+# Built once at import, so serializing a page of records (see serialization.py) reuses the
+# compiled pydantic-core serializer instead of building one per response
+
+PatientList = TypeAdapter(List[Patient])
+DoctorList = TypeAdapter(List[Doctor])
+TreatmentList = TypeAdapter(List[Treatment])
+AppointmentList = TypeAdapter(List[Appointment])
@@ -0,0 +1,52 @@
+import re
+import unicodedata
+
+# Tokenization for the patient search index (the PatientSearchTokens table).
+# Every patient is indexed under the words of their name, the digits of their phone number and
+# their lower-cased email. A query term matches a token it is a prefix of, so "jo smi", "0712 3"
+# and "mary.w@" all become index range scans. The database work lives in crud.py.
+
+# Longest token stored; matches the width of PatientSearchTokens.Token
+MAX_TOKEN_LENGTH = 100
+
+# Query terms beyond this many are ignored
+MAX_QUERY_TERMS = 5
+
+_WORD = re.compile(r"\w+")
+_PHONE = re.compile(r"^\+?[\d\s().-]+$")
+
+def normalize(text: str):
+    """Lower-case text and strip accents, so 'Zoë' and 'zoe' index the same."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+def digits(text: str):
+    return "".join(char for char in text if char.isdigit())
+
+def patient_tokens(full_name: str, phone_number: str = None, email: str = None):
+    """The set of tokens a patient is indexed under."""
+    tokens = set(_WORD.findall(normalize(full_name or "")))
+    if phone_number and digits(phone_number):
+        tokens.add(digits(phone_number))
+    if email:
+        tokens.add(normalize(email.strip()))
+    return {token[:MAX_TOKEN_LENGTH] for token in tokens}
+
+def query_terms(query: str):
+    """Split a search string into prefix terms: phone numbers become digits, emails stay whole, names split into words."""
+    if _PHONE.match(query.strip()) and digits(query):
+        return [digits(query)[:MAX_TOKEN_LENGTH]]  # "+254 712 345" is one number, not three terms
+    terms = []
+    for part in query.split():
+        if "@" in part:
+            terms.append(normalize(part))
+        elif _PHONE.match(part) and digits(part):
+            terms.append(digits(part))
+        else:
+            terms.extend(_WORD.findall(normalize(part)))
+    # Drop duplicates but keep the order, so the first terms are the ones kept
+    return list(dict.fromkeys(term[:MAX_TOKEN_LENGTH] for term in terms))[:MAX_QUERY_TERMS]
+
+def prefix_end(term: str):
+    """Smallest string greater than every string starting with `term`, for a `token < end` range bound."""
+    return term[:-1] + chr(ord(term[-1]) + 1)
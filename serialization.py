@@ -0,0 +1,29 @@
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+import orjson
+
+# Fast path for list responses.
+# Returning ORM objects makes FastAPI validate every row against the response_model, dump it to
+# Python primitives and encode the result with the stdlib json module. List routes skip all three:
+# rows read as dicts from core SELECTs (see crud.py) are encoded by orjson in one call, and lists of
+# schema objects (the cached catalogs) are encoded by a precompiled TypeAdapter in pydantic-core.
+# The routes keep their response_model, which still documents the payload in OpenAPI.
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with orjson (dates, datetimes and UUIDs natively, no whitespace)."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+def _headers(response: Response):
+    """Headers already set on the route's injected Response (cursor, ETag), which a returned response would drop."""
+    return {name: value for name, value in response.headers.items() if name != "content-length"}
+
+def rows(response: Response, content):
+    """Respond with dicts (or a list of them) built from database rows."""
+    return FastJSONResponse(content, headers=_headers(response))
+
+def models(response: Response, adapter: TypeAdapter, content):
+    """Respond with schema objects, serialized straight to JSON bytes by `adapter`."""
+    return Response(adapter.dump_json(content), media_type="application/json", headers=_headers(response))
@@ -0,0 +1,88 @@
+import itertools
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event
+
+# Shared fixtures for the API tests: the app runs against a fresh SQLite database in a temporary
+# directory, and `statements` counts the SQL statements a block of requests sends to it.
+# DATABASE_URL has to be set before main (and with it database.py) is first imported.
+_db_dir = tempfile.mkdtemp(prefix="clinic-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("DATABASE_REPLICA_URLS", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+import database
+import main
+
+_unique = itertools.count(1)
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+@pytest.fixture
+def statements():
+    """Context manager counting the statements executed on the primary engine inside its block."""
+    @contextmanager
+    def count():
+        counter = {"n": 0}
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            counter["n"] += 1
+
+        event.listen(database.engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield counter
+        finally:
+            event.remove(database.engine, "before_cursor_execute", before_cursor_execute)
+    return count
+
+@pytest.fixture
+def create_patient(client):
+    def create():
+        n = next(_unique)
+        response = client.post("/patients/", json={
+            "FullName": f"Patient {n}", "DateOfBirth": "1990-01-01", "PhoneNumber": f"555{n:07d}",
+            "Email": f"patient{n}@example.com", "Gender": "F"
+        })
+        assert response.status_code == 200, response.text
+        return response.json()
+    return create
+
+@pytest.fixture
+def create_doctor(client):
+    def create():
+        n = next(_unique)
+        response = client.post("/doctors/", json={
+            "FullName": f"Doctor {n}", "Specialty": "General", "PhoneNumber": f"777{n:07d}", "Email": f"doctor{n}@example.com"
+        })
+        assert response.status_code == 200, response.text
+        return response.json()
+    return create
+
+@pytest.fixture
+def create_treatment(client):
+    def create():
+        response = client.post("/treatments/", json={"Name": f"Treatment {next(_unique)}", "Description": None})
+        assert response.status_code == 200, response.text
+        return response.json()
+    return create
+
+@pytest.fixture
+def create_appointment(client):
+    def create(patient_id, doctor_id):
+        # A day apart from every other booking in the run, so tests never double-book each other
+        when = datetime(2100, 1, 1, 9) + timedelta(days=next(_unique))
+        response = client.post("/appointments/", json={
+            "PatientID": patient_id, "DoctorID": doctor_id, "AppointmentDate": when.isoformat(), "Reason": "Checkup"
+        })
+        assert response.status_code == 200, response.text
+        return response.json()
+    return create
@@ -0,0 +1,16 @@
+import cache
+
+# A value loaded before a write was committed must not be cached after the write invalidated the cache.
+
+def test_value_loaded_across_an_invalidation_is_not_stored():
+    catalog = cache.ReadThroughCache("test", cache.MemoryBackend(max_entries=10, ttl=60))
+
+    def stale_load():
+        # A writer commits and invalidates while this reader is still loading the old value
+        catalog.invalidate()
+        return "old"
+
+    assert catalog.get_or_load("doctor", stale_load) == "old"
+    assert len(catalog.backend) == 0
+    assert catalog.get_or_load("doctor", lambda: "new") == "new"
+    assert catalog.get_or_load("doctor", lambda: "unused") == "new"
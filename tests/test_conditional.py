@@ -0,0 +1,49 @@
+import pytest
+
+# Appointment ETags follow their treatments without the treatment writes touching the appointments,
+# and list pages only look their versions up ahead of the fetch for a conditional GET.
+
+@pytest.fixture
+def appointment(client, create_patient, create_doctor, create_treatment, create_appointment):
+    treatment = create_treatment()
+    appointment = create_appointment(create_patient()["PatientID"], create_doctor()["DoctorID"])
+    client.put(f"/appointments/{appointment['AppointmentID']}/treatments/", json=[treatment["TreatmentID"]])
+    return client.get(f"/appointments/{appointment['AppointmentID']}").json(), treatment
+
+def test_treatment_rename_changes_appointment_etag(client, appointment):
+    appointment, treatment = appointment
+    path = f"/appointments/{appointment['AppointmentID']}"
+    etag = client.get(path).headers["ETag"]
+    assert client.get(path, headers={"If-None-Match": etag}).status_code == 304
+
+    client.put(f"/treatments/{treatment['TreatmentID']}", json=dict(treatment, Name="Renamed"))
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["treatments"][0]["Name"] == "Renamed"
+    assert response.json()["UpdatedAt"] == appointment["UpdatedAt"]
+
+    client.delete(f"/treatments/{treatment['TreatmentID']}")
+    assert client.get(path, headers={"If-None-Match": response.headers["ETag"]}).json()["treatments"] == []
+
+def test_list_probes_versions_only_for_if_none_match(client, statements, appointment):
+    appointment, treatment = appointment
+    params = {"from": appointment["AppointmentDate"], "limit": 5}
+    with statements() as plain:
+        first = client.get("/appointments/", params=params)
+    with statements() as conditional:
+        assert client.get("/appointments/", params=params, headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+    client.put(f"/treatments/{treatment['TreatmentID']}", json=dict(treatment, Name="Renamed again"))
+    with statements() as changed:
+        assert client.get("/appointments/", params=params, headers={"If-None-Match": first.headers["ETag"]}).status_code == 200
+    # A stale If-None-Match pays for the probe and the fetch; a plain GET only for the fetch
+    assert changed["n"] > plain["n"]
+
+def test_projected_list_is_tagged_from_one_query(client, statements, create_patient):
+    create_patient()
+    params = {"fields": "FullName", "limit": 5}
+    with statements() as counter:
+        response = client.get("/patients/", params=params)
+    assert counter["n"] == 1
+    assert all(set(patient) == {"PatientID", "FullName"} for patient in response.json())
+    assert client.get("/patients/", params=params, headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
@@ -0,0 +1,48 @@
+import asyncio
+from datetime import datetime, timedelta
+import anyio.to_thread
+import httpx
+import config
+import group_commit
+import main
+
+# With APPOINTMENT_GROUP_COMMIT, concurrent bookings are committed in one batch, and waiting for it
+# takes no threadpool worker, so other routes keep being served in the meantime.
+
+def test_concurrent_bookings_share_a_batch_without_blocking(monkeypatch, create_patient, create_doctor):
+    doctor_id = create_doctor()["DoctorID"]
+    patients = [create_patient()["PatientID"] for _ in range(4)]
+
+    batches = []
+    write = group_commit.appointments.write
+
+    def recording_write(db, items):
+        batches.append(len(items))
+        return write(db, items)
+
+    monkeypatch.setattr(config, "APPOINTMENT_GROUP_COMMIT", True)
+    monkeypatch.setattr(group_commit.appointments, "write", recording_write)
+    monkeypatch.setattr(group_commit.appointments, "window", 0.5)
+
+    async def run():
+        # Fewer workers than bookings: bookings blocking a worker each would stall everything
+        anyio.to_thread.current_default_thread_limiter().total_tokens = 2
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+            bookings = [
+                asyncio.create_task(client.post("/appointments/", json={
+                    "PatientID": patient_id, "DoctorID": doctor_id,
+                    "AppointmentDate": (datetime(2200, 1, 1, 9) + timedelta(days=n)).isoformat(), "Reason": "Checkup"
+                }))
+                for n, patient_id in enumerate(patients)
+            ]
+            await asyncio.sleep(0.1)
+            other = await client.get(f"/doctors/{doctor_id}")
+            waiting = not any(booking.done() for booking in bookings)
+            return other, waiting, await asyncio.gather(*bookings)
+
+    other, waiting, bookings = asyncio.run(run())
+    assert other.status_code == 200
+    assert waiting  # served while every booking was still waiting for its batch
+    assert all(response.status_code == 200 for response in bookings)
+    assert len({response.json()["AppointmentID"] for response in bookings}) == len(patients)
+    assert batches == [len(patients)]
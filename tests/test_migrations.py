@@ -0,0 +1,29 @@
+from sqlalchemy import create_engine, inspect, text
+import migrations
+
+# Databases created before a column or index was added to the models get it at startup.
+
+def test_upgrade_schema_adds_missing_columns_and_indexes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        # Patients and Doctors as the first version of the models created them
+        conn.execute(text(
+            'CREATE TABLE "Patients" ("PatientID" INTEGER NOT NULL PRIMARY KEY, "FullName" VARCHAR(100) NOT NULL, '
+            '"DateOfBirth" DATE NOT NULL, "PhoneNumber" VARCHAR(15) NOT NULL UNIQUE, "Email" VARCHAR(100) UNIQUE, '
+            '"CreatedAt" DATETIME DEFAULT CURRENT_TIMESTAMP, "UpdatedAt" DATETIME DEFAULT CURRENT_TIMESTAMP)'
+        ))
+        conn.execute(text(
+            'CREATE TABLE "Doctors" ("DoctorID" INTEGER NOT NULL PRIMARY KEY, "FullName" VARCHAR(100) NOT NULL, '
+            '"Specialty" VARCHAR(100) NOT NULL, "PhoneNumber" VARCHAR(15) UNIQUE, "Email" VARCHAR(100) UNIQUE, '
+            '"CreatedAt" DATETIME DEFAULT CURRENT_TIMESTAMP, "UpdatedAt" DATETIME DEFAULT CURRENT_TIMESTAMP)'
+        ))
+        conn.execute(text('INSERT INTO "Patients" ("FullName", "DateOfBirth", "PhoneNumber") VALUES (\'Old\', \'1990-01-01\', \'5550000000\')'))
+
+    added = migrations.upgrade_schema(engine)
+    assert {"Patients.Gender", "Doctors.AvailabilityHours", "ix_Doctors_Specialty"} <= set(added)
+    with engine.connect() as conn:
+        assert conn.scalar(text('SELECT "Gender" FROM "Patients"')) == ""
+    assert "ix_Doctors_Specialty" in {index["name"] for index in inspect(engine).get_indexes("Doctors")}
+
+    # Nothing left to add on the next start
+    assert migrations.upgrade_schema(engine) == []
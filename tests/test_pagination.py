@@ -0,0 +1,42 @@
+import pytest
+
+# Listing a page costs a fixed number of statements: the rows, then one SELECT ... IN for the
+# treatments of the whole page, never one query per row.
+
+@pytest.fixture
+def schedule(create_patient, create_doctor, create_treatment, create_appointment, client):
+    """60 appointments of one new doctor, each linked to one treatment, and list filters matching only them."""
+    patient, doctor, treatment = create_patient(), create_doctor(), create_treatment()
+    appointments = [create_appointment(patient["PatientID"], doctor["DoctorID"]) for _ in range(60)]
+    for appointment in appointments:
+        client.post(f"/appointments/{appointment['AppointmentID']}/treatments/", json=[treatment["TreatmentID"]])
+    return {
+        "/appointments/": {"from": appointments[0]["AppointmentDate"]},
+        "/appointments/upcoming": {"doctor_id": doctor["DoctorID"]},
+    }
+
+def count_list_statements(client, statements, path, params):
+    with statements() as counter:
+        response = client.get(path, params=params)
+    assert response.status_code == 200
+    assert len(response.json()) == params["limit"]
+    return counter["n"]
+
+@pytest.mark.parametrize("path", ["/appointments/", "/appointments/upcoming"])
+def test_statement_count_does_not_grow_with_page_size(client, statements, schedule, path):
+    small = count_list_statements(client, statements, path, dict(schedule[path], limit=5))
+    large = count_list_statements(client, statements, path, dict(schedule[path], limit=50))
+    assert small == large
+
+def test_treatments_are_loaded_with_the_page(client, schedule):
+    page = client.get("/appointments/", params=dict(schedule["/appointments/"], limit=50)).json()
+    assert all(len(appointment["treatments"]) == 1 for appointment in page)
+
+def test_cursor_pages_do_not_overlap(client, schedule):
+    params = dict(schedule["/appointments/"], limit=20)
+    first = client.get("/appointments/", params=params)
+    second = client.get("/appointments/", params=dict(params, cursor=first.headers["X-Next-Cursor"]))
+    assert second.status_code == 200
+    first_ids = {appointment["AppointmentID"] for appointment in first.json()}
+    second_ids = {appointment["AppointmentID"] for appointment in second.json()}
+    assert len(second_ids) == 20 and not first_ids & second_ids
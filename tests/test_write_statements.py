@@ -0,0 +1,50 @@
+import pytest
+
+# Each PUT/DELETE writes its row in a single statement (UPDATE ... RETURNING or DELETE, whose
+# rowcount drives the 404) with no SELECT of the record first. The extra statements keep the
+# derived tables in step: the upcoming summary, the patient search index, the analytics dirty
+# days and the change feed outbox. A count going up means a write went back to read-then-write.
+
+@pytest.fixture
+def records(create_patient, create_doctor, create_treatment, create_appointment, client):
+    patient, doctor, treatment = create_patient(), create_doctor(), create_treatment()
+    appointment = create_appointment(patient["PatientID"], doctor["DoctorID"])
+    client.post(f"/appointments/{appointment['AppointmentID']}/treatments/", json=[treatment["TreatmentID"]])
+    return {"patient": patient, "doctor": doctor, "treatment": treatment, "appointment": appointment}
+
+def appointment_body(appointment):
+    return {name: appointment[name] for name in ("PatientID", "DoctorID", "AppointmentDate", "Reason")}
+
+# (method, path, body, expected status, expected statements)
+WRITES = {
+    # UPDATE, rename in the upcoming summary, re-index search tokens (DELETE + INSERT)
+    "update patient": lambda r: ("PUT", f"/patients/{r['patient']['PatientID']}", dict(r["patient"], FullName="Renamed Patient"), 200, 4),
+    # UPDATE, rename in the upcoming summary
+    "update doctor": lambda r: ("PUT", f"/doctors/{r['doctor']['DoctorID']}", dict(r["doctor"], FullName="Renamed Doctor"), 200, 2),
+    # UPDATE ... RETURNING alone; the linked appointments are versioned by their treatments instead
+    "update treatment": lambda r: ("PUT", f"/treatments/{r['treatment']['TreatmentID']}", dict(r["treatment"], Name="Renamed"), 200, 1),
+    # Current doctor/patient/time, two FK locks and two overlap probes, dirty day, "moved" event, UPDATE,
+    # "updated" event, summary rewrite (DELETE + INSERT), dirty day, treatments of the response
+    "update appointment": lambda r: ("PUT", f"/appointments/{r['appointment']['AppointmentID']}", appointment_body(r["appointment"]), 200, 13),
+    # Existence check, DELETE of the dropped links (nothing to INSERT), dirty day, bump and publish the appointment
+    "replace treatments": lambda r: ("PUT", f"/appointments/{r['appointment']['AppointmentID']}/treatments/", [], 200, 5),
+    # Dirty days and "deleted" events for hot and archived appointments, DELETE
+    "delete patient": lambda r: ("DELETE", f"/patients/{r['patient']['PatientID']}", None, 200, 5),
+    # "moved" events for hot and archived appointments, DELETE
+    "delete doctor": lambda r: ("DELETE", f"/doctors/{r['doctor']['DoctorID']}", None, 200, 3),
+    # DELETE alone (the links cascade)
+    "delete treatment": lambda r: ("DELETE", f"/treatments/{r['treatment']['TreatmentID']}", None, 200, 1),
+    # Dirty day, "deleted" event, DELETE
+    "delete appointment": lambda r: ("DELETE", f"/appointments/{r['appointment']['AppointmentID']}", None, 200, 3),
+    # A missing row costs the UPDATE alone
+    "update missing patient": lambda r: ("PUT", "/patients/999999", dict(r["patient"], FullName="Nobody"), 404, 1),
+    "delete missing appointment": lambda r: ("DELETE", "/appointments/999999", None, 404, 3),
+}
+
+@pytest.mark.parametrize("write", WRITES)
+def test_write_statement_count(client, statements, records, write):
+    method, path, body, status, expected = WRITES[write](records)
+    with statements() as counter:
+        response = client.request(method, path, json=body)
+    assert response.status_code == status, response.text
+    assert counter["n"] == expected